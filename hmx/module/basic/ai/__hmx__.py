@@ -2,7 +2,7 @@
     "name": "AI",
     "category": "Hidden",
     "version": "1.0",
-    "depends": ["base", "webx"],
+    "depends": ["base", "webx", "document_store"],
     "data": [
         "data/hashy_config.xml",
         "data/base_cron_data.xml",
@@ -18,10 +18,7 @@
     ],
     "assets": {
         "webx.assets_backend": [
-            "static/libs/marked/marked.min.js",
-            "static/libs/dompurify/purify.min.js",
-            "static/libs/highlightjs/highlight.min.js",
-            "static/libs/highlightjs/atom-one-dark.min.css",
+            "static/js/utils/hashy-asset-loader.js",
             "static/js/class/hashy-auth-helper.js",
             "static/js/store/hashy-ai-store.js",
             "static/js/class/hashy-api-client.js",
@@ -1,21 +1,28 @@
+import hmac
 import json
 import os
 import re
 import traceback
 from typing import List
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.files.storage import default_storage
-from django.http import FileResponse, HttpRequest
+from django.http import FileResponse, HttpRequest, HttpResponse
 from hmx_api.registry import register_routers
 from ninja import Router, Schema
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .services import APIError, HashyAPIService, TokenRefreshFailedError
+from .services import APIError, CircuitOpenError, HashyAPIService, TokenRefreshFailedError
+from .services import metrics
+from .services.concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded
+from .services.metrics import instrument_route
 
 
 router = Router(tags=["ai"])
 
+chat_limiter = ConcurrencyLimiter('hashy_chat', **getattr(settings, 'HASHY_CHAT_LIMITS', {}))
+
 
 class HashyLoginSchema(Schema):
     phone: str
@@ -81,6 +88,19 @@ class SessionDetailSchema(Schema):
     messages: List[MessageDetailSchema]
 
 
+class RetrieveResponseSchema(Schema):
+    success: bool
+    query: str
+    results: list = []
+
+
+class SearchResponseSchema(Schema):
+    success: bool
+    query: str
+    knowledge: list = []
+    messages: list = []
+
+
 def normalize_phone(phone):
     if not phone:
         return None
@@ -98,6 +118,7 @@ def normalize_phone(phone):
 
 
 @router.api_operation(["POST"], "/hashy_login", response={200: HashyTokenSchema, 403: HashyErrorSchema})
+@instrument_route('hashy_login')
 def hashy_login(request: HttpRequest, data: HashyLoginSchema):
     try:
         config_param = request.env['baseconfigparameter'].sudo().search([('key', '=', 'hashy_secret_key')], limit=1)
@@ -153,9 +174,27 @@ def hashy_login(request: HttpRequest, data: HashyLoginSchema):
 @router.api_operation(
     ["POST"],
     "/chat",
-    response={200: ChatResponseSchema, 400: HashyErrorSchema, 401: HashyErrorSchema, 403: HashyErrorSchema},
+    response={
+        200: ChatResponseSchema,
+        400: HashyErrorSchema,
+        401: HashyErrorSchema,
+        403: HashyErrorSchema,
+        429: HashyErrorSchema,
+        503: HashyErrorSchema,
+    },
 )
-def chat_request(request: HttpRequest):
+@instrument_route('chat')
+def chat_request(request: HttpRequest, response: HttpResponse):
+    try:
+        with chat_limiter.acquire(request.user.id):
+            return _handle_chat_request(request, response)
+    except ConcurrencyLimitExceeded as e:
+        metrics.chat_rejections.inc(reason='concurrency')
+        response['Retry-After'] = str(e.retry_after)
+        return 429, {"detail": str(e)}
+
+
+def _handle_chat_request(request, response):
     try:
         user_id = request.user.id
 
@@ -201,6 +240,13 @@ def chat_request(request: HttpRequest):
                 .sudo()
                 .search([('external_session_id', '=', session_id), ('user_id', '=', user_id)], limit=1)
             )
+            if not session and str(session_id).isdigit():
+                # Sessions answered locally are addressed by their local id, also after they got a remote one.
+                session = (
+                    request.env['aisession']
+                    .sudo()
+                    .search([('id', '=', int(session_id)), ('user_id', '=', user_id)], limit=1)
+                )
 
         user = request.env['user'].sudo().browse(user_id)
         user_name = user.name or "HMX User"
@@ -221,7 +267,28 @@ def chat_request(request: HttpRequest):
                     }
                 )
 
-        if not session:
+        local_answer = None
+        if not file_attachments:
+            local_answer = request.env['aiknowledge'].sudo().answer_locally(message_text)
+
+        if local_answer is not None:
+            if not session:
+                session = (
+                    request.env['aisession']
+                    .sudo()
+                    .create(
+                        {
+                            'name': f"{message_text[:30]}{'...' if len(message_text) > 30 else ''}",
+                            'config_id': config.id,
+                            'status': 'active',
+                            'user_id': user_id,
+                        }
+                    )
+                )
+
+            current_external_session_id = session.external_session_id
+            response_text = local_answer
+        elif not session or not session.external_session_id:
             session_data = hashy_service.send_message(
                 message_text,
                 name=user_name,
@@ -235,15 +302,23 @@ def chat_request(request: HttpRequest):
             response_external_employee_id = session_data.get('data', {}).get('employee_id')
             new_external_session_id = session_data.get('data', {}).get('session_id')
 
-            session_vals = {
-                'name': f"{message_text[:30]}{'...' if len(message_text) > 30 else ''}",
-                'config_id': config.id,
-                'status': 'active',
-                'user_id': user_id,
-                'external_employee_id': response_external_employee_id,
-                'external_session_id': new_external_session_id,
-            }
-            session = request.env['aisession'].sudo().create(session_vals)
+            if session:
+                session.write(
+                    {
+                        'external_employee_id': response_external_employee_id,
+                        'external_session_id': new_external_session_id,
+                    }
+                )
+            else:
+                session_vals = {
+                    'name': f"{message_text[:30]}{'...' if len(message_text) > 30 else ''}",
+                    'config_id': config.id,
+                    'status': 'active',
+                    'user_id': user_id,
+                    'external_employee_id': response_external_employee_id,
+                    'external_session_id': new_external_session_id,
+                }
+                session = request.env['aisession'].sudo().create(session_vals)
 
             current_external_session_id = new_external_session_id
             response_text = session_data.get('data', {}).get('message', '')
@@ -315,6 +390,9 @@ def chat_request(request: HttpRequest):
 
     except TokenRefreshFailedError as e:
         return 401, {"detail": str(e)}
+    except CircuitOpenError as e:
+        response['Retry-After'] = str(e.retry_after)
+        return 503, {"detail": str(e)}
     except APIError as e:
         return 400, {"detail": str(e)}
     except Exception as e:
@@ -324,6 +402,7 @@ def chat_request(request: HttpRequest):
 @router.api_operation(
     ["GET"], "/sessions", response={200: SessionListSchema, 400: HashyErrorSchema, 401: HashyErrorSchema}
 )
+@instrument_route('sessions')
 def get_sessions(request: HttpRequest, external_employee_id: int = None, status: str = "active"):
     try:
         user_id = request.user.id
@@ -361,6 +440,7 @@ def get_sessions(request: HttpRequest, external_employee_id: int = None, status:
 @router.api_operation(
     ["GET"], "/sessions/{session_id}", response={200: SessionDetailSchema, 400: HashyErrorSchema, 404: HashyErrorSchema}
 )
+@instrument_route('session_detail')
 def get_session_detail(request: HttpRequest, session_id: int):
     try:
         user_id = request.user.id
@@ -421,6 +501,7 @@ def get_session_detail(request: HttpRequest, session_id: int):
 @router.api_operation(
     ["POST"], "/sessions/{session_id}/delete", response={200: dict, 404: HashyErrorSchema, 403: HashyErrorSchema}
 )
+@instrument_route('delete_session')
 def delete_session(request: HttpRequest, session_id: int):
     try:
         user_id = request.user.id
@@ -441,6 +522,7 @@ def delete_session(request: HttpRequest, session_id: int):
 @router.api_operation(
     ["POST"], "/sessions/{session_id}/rename", response={200: dict, 404: HashyErrorSchema, 403: HashyErrorSchema}
 )
+@instrument_route('rename_session')
 def rename_session(request: HttpRequest, session_id: int, payload: RenameSessionSchema):
     try:
         user_id = request.user.id
@@ -462,7 +544,46 @@ def rename_session(request: HttpRequest, session_id: int, payload: RenameSession
         return 400, {"detail": f"Error renaming session: {str(e)}"}
 
 
+@router.api_operation(["GET"], "/search", response={200: SearchResponseSchema, 400: HashyErrorSchema})
+@instrument_route('search')
+def search(request: HttpRequest, q: str, scope: str = "all", limit: int = 20, offset: int = 0):
+    try:
+        if scope not in ('all', 'knowledge', 'messages'):
+            return 400, {"detail": "Scope must be one of: all, knowledge, messages"}
+
+        limit = max(1, min(limit, 100))
+        offset = max(offset, 0)
+
+        knowledge = []
+        messages = []
+        if scope in ('all', 'knowledge'):
+            knowledge = request.env['aiknowledge'].sudo().search_fulltext(q, limit=limit, offset=offset)
+        if scope in ('all', 'messages'):
+            messages = (
+                request.env['aimessage']
+                .sudo()
+                .search_fulltext(q, user_id=request.user.id, limit=limit, offset=offset)
+            )
+
+        return 200, {"success": True, "query": q, "knowledge": knowledge, "messages": messages}
+
+    except Exception as e:
+        return 400, {"detail": f"Error searching: {str(e)}"}
+
+
+@router.api_operation(["GET"], "/knowledge/retrieve", response={200: RetrieveResponseSchema, 400: HashyErrorSchema})
+@instrument_route('knowledge_retrieve')
+def retrieve_knowledge(request: HttpRequest, q: str, limit: int = 5):
+    try:
+        results = request.env['aiknowledge'].sudo().retrieve_local(q, limit=max(1, min(limit, 50)))
+        return 200, {"success": True, "query": q, "results": results}
+
+    except Exception as e:
+        return 400, {"detail": f"Error retrieving knowledge: {str(e)}"}
+
+
 @router.get("/attachments/{message_id}/{filename}")
+@instrument_route('download_attachment')
 def download_attachment(request: HttpRequest, message_id: int, filename: str):
     try:
         user_id = request.user.id
@@ -496,4 +617,19 @@ def download_attachment(request: HttpRequest, message_id: int, filename: str):
         return 400, {"detail": f"Error downloading attachment: {str(e)}"}
 
 
+# The counters live in the serving process's memory: with several workers each scrape only sees
+# the worker that answered it, so scrape every worker or run a single one.
+# Scrapers authenticate with "Authorization: Bearer <HASHY_METRICS_TOKEN>"; without a configured
+# token only superusers can read the metrics.
+@router.get("/metrics")
+def get_metrics(request: HttpRequest):
+    token = getattr(settings, 'HASHY_METRICS_TOKEN', None)
+    scheme, _sep, credentials = request.headers.get('Authorization', '').partition(' ')
+    authorized = bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip(), token)
+    if not authorized and not getattr(request.user, 'is_superuser', False):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+
+    return HttpResponse(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
 register_routers([("ai/", router)])
@@ -8,4 +8,5 @@ class AIConfig(AppConfig):
 
     def ready(self):
         import ai.api
+        import ai.assets
         import ai.reports
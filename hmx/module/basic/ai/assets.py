@@ -0,0 +1,115 @@
+import gzip
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from hmx_api.registry import register_routers
+from ninja import Router
+
+
+router = Router(tags=["ai"])
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Assets only the Hashy chat needs. They are served as one fingerprinted file per kind and fetched
+# by static/js/utils/hashy-asset-loader.js the first time the chat is used, instead of being part
+# of webx.assets_backend on every page.
+LAZY_BUNDLES = {
+    'hashy-libs': {
+        'js': [
+            'static/libs/marked/marked.min.js',
+            'static/libs/dompurify/purify.min.js',
+            'static/libs/highlightjs/highlight.min.js',
+        ],
+        'css': [
+            'static/libs/highlightjs/atom-one-dark.min.css',
+        ],
+    },
+}
+
+CONTENT_TYPES = {
+    'js': 'application/javascript; charset=utf-8',
+    'css': 'text/css; charset=utf-8',
+}
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_bundles = {}
+_bundles_lock = threading.Lock()
+
+
+class Bundle:
+    def __init__(self, content, mtimes):
+        self.content = content
+        self.mtimes = mtimes
+        self.fingerprint = hashlib.sha256(content).hexdigest()[:16]
+        self.gzipped = gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def _paths(name, kind):
+    return [os.path.join(MODULE_DIR, path) for path in LAZY_BUNDLES[name][kind]]
+
+
+def _build(name, kind):
+    paths = _paths(name, kind)
+    parts = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            parts.append(f.read().strip())
+    separator = b';\n' if kind == 'js' else b'\n'
+    return Bundle(separator.join(parts) + b'\n', [os.path.getmtime(path) for path in paths])
+
+
+def get_bundle(name, kind):
+    """Return the concatenated bundle, rebuilding it only when a source file changed (in DEBUG)."""
+    key = (name, kind)
+    with _bundles_lock:
+        bundle = _bundles.get(key)
+        if bundle is not None and not settings.DEBUG:
+            return bundle
+        if bundle is None or bundle.mtimes != [os.path.getmtime(path) for path in _paths(name, kind)]:
+            bundle = _bundles[key] = _build(name, kind)
+        return bundle
+
+
+def bundle_url(name, kind):
+    return f"/hmx_api/ai/assets/{name}/{get_bundle(name, kind).fingerprint}/{kind}"
+
+
+@router.get("/assets/manifest")
+def get_asset_manifest(request: HttpRequest):
+    manifest = {
+        name: {kind: [bundle_url(name, kind)] for kind in kinds if kinds[kind]} for name, kinds in LAZY_BUNDLES.items()
+    }
+    response = JsonResponse({"success": True, "bundles": manifest})
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@router.get("/assets/{name}/{fingerprint}/{kind}")
+def get_asset_bundle(request: HttpRequest, name: str, fingerprint: str, kind: str):
+    if name not in LAZY_BUNDLES or kind not in CONTENT_TYPES or not LAZY_BUNDLES[name].get(kind):
+        return HttpResponse("Not found", status=404, content_type="text/plain")
+
+    bundle = get_bundle(name, kind)
+    if fingerprint != bundle.fingerprint:
+        return HttpResponse("Not found", status=404, content_type="text/plain")
+
+    etag = f'"{bundle.fingerprint}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=304)
+    elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(bundle.gzipped, content_type=CONTENT_TYPES[kind])
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(bundle.content, content_type=CONTENT_TYPES[kind])
+
+    response['ETag'] = etag
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+register_routers([("ai/", router)])
@@ -0,0 +1,14 @@
+from .fake_hashy import FakeHashyServer
+from .runner import BenchResult, bench_callable, bench_endpoint, format_report, percentile
+from .suite import run_chat_suite
+
+
+__all__ = [
+    'FakeHashyServer',
+    'BenchResult',
+    'bench_callable',
+    'bench_endpoint',
+    'format_report',
+    'percentile',
+    'run_chat_suite',
+]
@@ -0,0 +1,193 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from ..services.metrics import endpoint_label
+
+
+class FakeHashyServer:
+    """Local stand-in for the Hashy API used by the benchmark suite.
+
+    ``latency`` is the base delay per request and ``jitter`` adds a uniform random delay on top;
+    ``path_latency`` overrides the base delay per endpoint prefix (e.g. ``{'/meta/odoo/chat': 1.5}``).
+    ``error_rate`` is the fraction of requests answered with a 500. With ``stream_chunks`` > 1 chat
+    replies are sent with chunked transfer encoding, spread evenly over the configured latency.
+    """
+
+    def __init__(
+        self,
+        latency=0.05,
+        jitter=0.0,
+        path_latency=None,
+        error_rate=0.0,
+        stream_chunks=0,
+        documents=50,
+        host='127.0.0.1',
+        port=0,
+        seed=None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.path_latency = path_latency or {}
+        self.error_rate = error_rate
+        self.stream_chunks = stream_chunks
+        self.documents = documents
+        self.random = random.Random(seed)
+
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._session_seq = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-hashy', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def delay_for(self, path):
+        delay = self.latency
+        for prefix, value in self.path_latency.items():
+            if path.startswith(prefix):
+                delay = value
+                break
+        if self.jitter:
+            delay += self.random.uniform(0, self.jitter)
+        return delay
+
+    def should_fail(self):
+        return self.error_rate > 0 and self.random.random() < self.error_rate
+
+    def _record(self, method, path):
+        key = f"{method} {endpoint_label(path)}"
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def _next_session_id(self):
+        with self._lock:
+            self._session_seq += 1
+            return f"fake-session-{self._session_seq}"
+
+    def route(self, method, path, body):
+        if method == 'POST' and path == '/meta/odoo/chat':
+            session_id = body.get('sessionId') or self._next_session_id()
+            text = body.get('text', '')
+            return {
+                'status': True,
+                'data': {'session_id': session_id, 'employee_id': 1, 'message': f"Echo: {text}"},
+            }
+        if method == 'POST' and path in ('/auth/login', '/auth/refresh'):
+            return {'status': True, 'data': {'token': 'fake-token', 'accessToken': 'fake-token', 'refreshToken': 'r'}}
+        if method == 'GET' and path == '/auth/validate':
+            return {'status': True}
+        if method == 'GET' and path == '/session':
+            return {'status': True, 'data': [{'id': i, 'name': f"Session {i}"} for i in range(1, 11)]}
+        if method == 'GET' and path.startswith('/session/'):
+            return {'status': True, 'data': {'id': path.rsplit('/', 1)[-1], 'name': 'Session'}}
+        if method == 'GET' and path == '/message':
+            return {'status': True, 'data': [{'id': i, 'text': f"Message {i}"} for i in range(1, 21)]}
+        if method == 'GET' and path == '/ai/knowledge/documents':
+            return {'status': True, 'data': [self._document(i) for i in range(1, self.documents + 1)]}
+        if method == 'POST' and path in ('/ai/knowledge/documents', '/ai/knowledge/upload'):
+            return {'status': True, 'data': self._document(self.documents + 1)}
+        if method == 'DELETE' and path.startswith('/ai/knowledge/documents/'):
+            return {'status': True}
+        if method == 'PUT' and path == '/odoo-service/my-ai-rules':
+            return {'status': True, 'data': {'ai_rules': body.get('ai_rules', '')}}
+        return None
+
+    @staticmethod
+    def _document(index):
+        return {
+            'id': index,
+            'title': f"Document {index}",
+            'content': f"Question {index}?\nAnswer for question {index}.",
+            'document_type': 'text',
+            'status': 'active',
+            'metadata': {},
+            'vector_ids': [],
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                path = urlparse(self.path).path
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw and 'json' in (self.headers.get('Content-Type') or '') else {}
+                except ValueError:
+                    body = {}
+
+                server._record(self.command, path)
+                delay = server.delay_for(path)
+
+                if server.should_fail():
+                    time.sleep(delay)
+                    return self._send_json(500, {'status': False, 'message': 'Injected failure'})
+
+                payload = server.route(self.command, path, body)
+                if payload is None:
+                    time.sleep(delay)
+                    return self._send_json(404, {'status': False, 'message': f"No fake route for {path}"})
+
+                if server.stream_chunks > 1 and path == '/meta/odoo/chat':
+                    return self._send_stream(payload, delay)
+
+                time.sleep(delay)
+                return self._send_json(200, payload)
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, payload, delay):
+                data = json.dumps(payload).encode()
+                chunks = server.stream_chunks
+                size = max(1, -(-len(data) // chunks))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for start in range(0, len(data), size):
+                    time.sleep(delay / chunks)
+                    chunk = data[start : start + size]
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        return Handler
@@ -0,0 +1,139 @@
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+API_PREFIX = '/hmx_api/ai'
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class BenchResult:
+    def __init__(self, name, concurrency):
+        self.name = name
+        self.concurrency = concurrency
+        self.latencies = []
+        self.queries = []
+        self.statuses = {}
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, latency, status, queries):
+        with self._lock:
+            self.latencies.append(latency)
+            self.queries.append(queries)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            'name': self.name,
+            'requests': count,
+            'concurrency': self.concurrency,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            'throughput_rps': round(count / self.elapsed, 2) if self.elapsed else 0.0,
+            'queries_per_request': round(sum(self.queries) / count, 2) if count else 0.0,
+            'statuses': dict(sorted(self.statuses.items(), key=lambda item: str(item[0]))),
+        }
+
+
+def auth_headers(user_id):
+    """Bearer token for ``user_id``, issued the same way ``/hashy_login`` does."""
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    django_user = User.objects.get(id=user_id)  # hmx-ignore: django-orm
+    return {'HTTP_AUTHORIZATION': f"Bearer {RefreshToken.for_user(django_user).access_token}"}
+
+
+def _run(name, call, requests, concurrency):
+    """Run ``call`` ``requests`` times across ``concurrency`` threads.
+
+    ``call`` returns a status label. With ``concurrency=1`` calls run inline on the current
+    thread, which keeps them inside the caller's transaction (e.g. a test case). Threaded runs
+    use their own database connections and only see committed data.
+    """
+    result = BenchResult(name, concurrency)
+
+    def timed():
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            try:
+                status = call()
+            except Exception as e:
+                status = type(e).__name__
+            latency = time.perf_counter() - start
+        result.add(latency, status, len(captured.captured_queries))
+
+    def worker(count):
+        try:
+            for _i in range(count):
+                timed()
+        finally:
+            if concurrency > 1:
+                connection.close()
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        worker(requests)
+    else:
+        shares = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ai-bench') as executor:
+            list(executor.map(worker, shares))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def bench_endpoint(method, path, headers, payload=None, requests=100, concurrency=4, name=None, prefix=API_PREFIX):
+    """Drive an ``ai/`` router endpoint through the Django test client."""
+    url = f"{prefix}{path}"
+
+    def call():
+        client = Client()
+        if method == 'GET':
+            response = client.get(url, payload or {}, **headers)
+        else:
+            body = payload() if callable(payload) else payload
+            response = client.generic(
+                method, url, json.dumps(body or {}), content_type='application/json', **headers
+            )
+        return response.status_code
+
+    return _run(name or f"{method} {path}", call, requests, concurrency)
+
+
+def bench_callable(name, func, requests=10, concurrency=1):
+    """Time a plain callable, e.g. ``env['aiknowledge'].sync_from_hashy``."""
+
+    def call():
+        func()
+        return 'ok'
+
+    return _run(name, call, requests, concurrency)
+
+
+def format_report(results):
+    columns = ('name', 'requests', 'concurrency', 'p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request')
+    rows = [[str(summary[column]) for column in columns] for summary in (r.summary() for r in results)]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+
+    lines = ['  '.join(column.ljust(widths[i]) for i, column in enumerate(columns))]
+    lines.extend('  '.join(value.ljust(widths[i]) for i, value in enumerate(row)) for row in rows)
+    for result in results:
+        lines.append(f"{result.name}: statuses {result.summary()['statuses']}")
+    return '\n'.join(lines)
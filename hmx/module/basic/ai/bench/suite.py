@@ -0,0 +1,48 @@
+import itertools
+
+from .fake_hashy import FakeHashyServer
+from .runner import auth_headers, bench_callable, bench_endpoint
+
+
+def run_chat_suite(env, user_id, requests=100, concurrency=4, sync_iterations=5, **server_options):
+    """Benchmark ``/chat``, ``/sessions`` and knowledge sync against a local fake Hashy server.
+
+    The active AI configuration is pointed at the fake server for the duration of the run and
+    restored afterwards. With ``concurrency > 1`` both changes are committed, because worker
+    threads use their own connections and would otherwise still call the real Hashy host.
+    ``server_options`` are passed to :class:`FakeHashyServer`.
+    """
+    config = env['aiagentconfig'].sudo().search([('use_config', '=', True)], limit=1)
+    if not config:
+        raise ValueError("An active AI configuration is required to run the benchmark")
+
+    headers = auth_headers(user_id)
+    counter = itertools.count()
+    original = {'base_url': config.base_url, 'token': config.token}
+    threaded = concurrency > 1
+
+    with FakeHashyServer(**server_options) as server:
+        config.sudo().write({'base_url': server.url, 'token': 'fake-token'})
+        if threaded:
+            env.cr.commit()
+        try:
+            results = [
+                bench_endpoint(
+                    'POST',
+                    '/chat',
+                    headers,
+                    payload=lambda: {'message': f"Benchmark message {next(counter)}"},
+                    requests=requests,
+                    concurrency=concurrency,
+                ),
+                bench_endpoint('GET', '/sessions', headers, requests=requests, concurrency=concurrency),
+                bench_callable(
+                    'knowledge sync', env['aiknowledge'].sudo().sync_from_hashy, requests=sync_iterations
+                ),
+            ]
+        finally:
+            config.sudo().write(original)
+            if threaded:
+                env.cr.commit()
+
+    return results, dict(server.requests)
@@ -1 +1 @@
-from . import ai_agent_config, ai_knowledge, ai_message, ai_session, base_config_parameter, base_report
+from . import ai_agent_config, ai_knowledge, ai_message, ai_outbox, ai_session, base_config_parameter, base_report
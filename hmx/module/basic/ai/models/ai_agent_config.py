@@ -4,6 +4,8 @@ from django.db import models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from document_store.services.file_store import document_storage, release_unreferenced, stored_names
+
 
 class AIAgentConfig(models.Model):
     class Meta:
@@ -28,7 +30,9 @@ class AIAgentConfig(models.Model):
     state = models.CharField(max_length=10, choices=AI_STATE, default='draft', tracking=True)
     response = models.TextField(_("Response"), null=True, blank=True)
     status = models.CharField(max_length=10, choices=AI_STATE, default='draft', tracking=True)
-    documents = models.FileField(_("Documents"), upload_to='documents/', null=True, blank=True, multi=True)
+    documents = models.FileField(
+        _("Documents"), upload_to='documents/', storage=document_storage, null=True, blank=True, multi=True
+    )
     rules = models.TextField(_("AI Rules"), null=True, blank=True)
     use_config = models.BooleanField(_("Main Config"), null=True, blank=True)
     token_expires_at = models.DateTimeField(_("Token Expires At"), null=True, blank=True)
@@ -140,17 +144,19 @@ class AIAgentConfig(models.Model):
         }
 
     def write(self, vals):
+        replaced = stored_names(self, 'documents') if 'documents' in vals else set()
         res = super().write(vals)
+        if replaced:
+            release_unreferenced(self.browse(), 'documents', replaced)
 
         if 'rules' in vals:
             for record in self:
-                try:
-                    from ..services import HashyAPIService
+                self.env['aioutbox'].enqueue('sync_rules', record, dedup_key=f'sync_rules:{record.id}')
 
-                    service = HashyAPIService(record)
-                    api_response = service.sync_ai_rules(record.rules)
-                    super(AIAgentConfig, record).write({'response': api_response})
-                except Exception as e:
-                    raise Exception(f'Error syncing AI Rules: {str(e)}')
+        return res
 
+    def unlink(self):
+        files = stored_names(self, 'documents')
+        res = super().unlink()
+        release_unreferenced(self.browse(), 'documents', files)
         return res
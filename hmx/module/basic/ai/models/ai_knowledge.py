@@ -1,7 +1,10 @@
 import ast
 import logging
+import os
+import tempfile
 
-from django.db import models
+from django.conf import settings
+from django.db import connection, models
 from django.utils.translation import gettext_lazy as _
 
 from hmx import api
@@ -118,6 +121,39 @@ class AIKnowledge(models.Model):
             else:
                 rec.answer = ''
 
+    def init(self):
+        from ..services.fulltext import ensure_search_vector, weighted_vector
+
+        ensure_search_vector(
+            self._cr, self._table, f"{weighted_vector('title', 'A')} || {weighted_vector('content', 'B')}"
+        )
+
+    @api.model
+    def search_fulltext(self, query, limit=20, offset=0):
+        from ..services.fulltext import search_ranked
+
+        hits = search_ranked(
+            self._cr, self._table, query, 'content', limit=limit, offset=offset, where="t.status = 'active'"
+        )
+        records = {rec.id: rec for rec in self.browse([hit['id'] for hit in hits])}
+
+        results = []
+        for hit in hits:
+            rec = records.get(hit['id'])
+            if not rec:
+                continue
+            results.append(
+                {
+                    'id': rec.id,
+                    'external_id': rec.external_id,
+                    'title': rec.title,
+                    'document_type': rec.document_type,
+                    'rank': hit['rank'],
+                    'snippet': hit['snippet'],
+                }
+            )
+        return results
+
     @api.model
     def sync_from_hashy(self):
         config = self.env['aiagentconfig'].sudo().search([('use_config', '=', True)], limit=1)
@@ -166,11 +202,76 @@ class AIKnowledge(models.Model):
             for remaining_rec in existing_ids.values():
                 remaining_rec.sudo().unlink()
 
+            try:
+                self.rebuild_local_index()
+            except Exception as e:
+                _logger.warning(f"Failed to rebuild local knowledge index: {str(e)}")
+
             return True
 
         except Exception as e:
             raise ValidationError(_(f"Error syncing knowledge: {str(e)}"))
 
+    @api.model
+    def _local_index_root(self):
+        base_dir = getattr(settings, 'HASHY_KNOWLEDGE_INDEX_DIR', None) or os.path.join(
+            tempfile.gettempdir(), 'hmx_ai_knowledge_index'
+        )
+        return os.path.join(base_dir, str(connection.settings_dict.get('NAME') or 'default'))
+
+    @api.model
+    def rebuild_local_index(self):
+        from ..services.knowledge_index import KnowledgeIndex
+
+        documents = [
+            {
+                'id': rec.id,
+                'title': rec.title,
+                'content': rec.content,
+                'answer': rec.answer if rec.document_type == 'qa' else None,
+            }
+            for rec in self.sudo().search([('status', '=', 'active')])
+        ]
+        index = KnowledgeIndex.build(self._local_index_root(), documents)
+        _logger.info(f"Rebuilt local knowledge index: {len(documents)} documents, {index.meta['n_chunks']} chunks")
+        return True
+
+    @api.model
+    def _load_local_index(self):
+        from ..services.knowledge_index import KnowledgeIndex
+
+        try:
+            return KnowledgeIndex.load(self._local_index_root())
+        except (OSError, ValueError) as e:
+            _logger.warning(f"Local knowledge index unavailable: {str(e)}")
+            return None
+
+    @api.model
+    def retrieve_local(self, query, limit=5):
+        index = self._load_local_index()
+        if not index:
+            return []
+        # The index only changes on sync, so drop hits on entries deleted or archived since.
+        hits = index.search(query, limit=limit)
+        active_ids = set(self.sudo().search([('id', 'in', [hit['id'] for hit in hits]), ('status', '=', 'active')]).ids)
+        return [hit for hit in hits if hit['id'] in active_ids]
+
+    @api.model
+    def answer_locally(self, question):
+        from ..services.knowledge_index import normalize_question
+
+        index = self._load_local_index()
+        match = index.answer(question) if index else None
+        if not match:
+            return None
+
+        # Answer from the current record, so edits, archiving and deletes since the last sync apply.
+        rec = self.sudo().search([('id', '=', match['id']), ('status', '=', 'active'), ('document_type', '=', 'qa')])
+        key = normalize_question(question)
+        if not rec or key not in (normalize_question(rec.content), normalize_question(rec.title)):
+            return None
+        return rec.answer or None
+
     def action_preview_file(self):
         self.ensure_one()
 
@@ -192,17 +293,13 @@ class AIKnowledge(models.Model):
         config = self.env['aiagentconfig'].sudo().search([('use_config', '=', True)], limit=1)
 
         if config:
-            from ..services import HashyAPIService
-
-            service = HashyAPIService(config)
-
             for record in self:
                 if record.external_id:
-                    try:
-                        service.delete_knowledge_document(record.external_id)
-                    except Exception as e:
-                        _logger.warning(
-                            f"Failed to delete knowledge document {record.external_id} from server: {str(e)}"
-                        )
+                    self.env['aioutbox'].enqueue(
+                        'delete_document',
+                        config,
+                        payload={'external_id': record.external_id},
+                        dedup_key=f'delete_document:{record.external_id}',
+                    )
 
         return super(AIKnowledge, self).unlink()
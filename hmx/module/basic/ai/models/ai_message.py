@@ -1,6 +1,9 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from document_store.services.file_store import document_storage, release_unreferenced, stored_names
+from hmx import api
+
 
 class AIMessage(models.Model):
     class Meta:
@@ -18,10 +21,25 @@ class AIMessage(models.Model):
     session_id = models.ForeignKey(
         "ai.AISession", verbose_name=_("AI Session"), on_delete=models.CASCADE, related_name="messages"
     )
-    attachment = models.FileField(_("Attachment"), upload_to='documents/', null=True, blank=True, multi=True)
+    attachment = models.FileField(
+        _("Attachment"), upload_to='documents/', storage=document_storage, null=True, blank=True, multi=True
+    )
     external_message_id = models.CharField(_("External Message ID"), max_length=255, null=True, blank=True)
     context_mentioned = models.TextField(_("Context Mentioned"), null=True, blank=True)
 
+    def write(self, vals):
+        replaced = stored_names(self, 'attachment') if 'attachment' in vals else set()
+        res = super().write(vals)
+        if replaced:
+            release_unreferenced(self.browse(), 'attachment', replaced)
+        return res
+
+    def unlink(self):
+        files = stored_names(self, 'attachment')
+        res = super().unlink()
+        release_unreferenced(self.browse(), 'attachment', files)
+        return res
+
     def action_view_quick(self):
         return {
             "name": "AI Message Quick",
@@ -32,3 +50,44 @@ class AIMessage(models.Model):
             "target": "new",
             "context": {"create": False, "edit": False},
         }
+
+    def init(self):
+        from ..services.fulltext import ensure_search_vector, weighted_vector
+
+        ensure_search_vector(self._cr, self._table, weighted_vector('text', 'A'))
+
+    @api.model
+    def search_fulltext(self, query, user_id, limit=20, offset=0):
+        from ..services.fulltext import search_ranked
+
+        session_table = self.env['aisession']._table
+        hits = search_ranked(
+            self._cr,
+            self._table,
+            query,
+            'text',
+            limit=limit,
+            offset=offset,
+            joins=f"JOIN {session_table} s ON s.id = t.session_id_id",
+            where="s.user_id_id = %s",
+            params=[user_id],
+        )
+        records = {rec.id: rec for rec in self.browse([hit['id'] for hit in hits])}
+
+        results = []
+        for hit in hits:
+            rec = records.get(hit['id'])
+            if not rec:
+                continue
+            results.append(
+                {
+                    'id': rec.id,
+                    'session_id': rec.session_id.id,
+                    'session_name': rec.session_id.name,
+                    'message_type': rec.message_type,
+                    'created_at': rec.created_at.isoformat() if rec.created_at else None,
+                    'rank': hit['rank'],
+                    'snippet': hit['snippet'],
+                }
+            )
+        return results
@@ -0,0 +1,207 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from hmx import api
+
+
+_logger = logging.getLogger(__name__)
+
+
+class _ConfigSnapshot:
+    """Detached copy of a config's credentials for remote calls in worker threads.
+
+    An expired token is refreshed in place with the refresh token; :meth:`AIOutbox.dispatch`
+    writes the new tokens back to the config once the calls are done.
+    """
+
+    def __init__(self, config):
+        self.config_id = config.id
+        self.base_url = config.base_url
+        self.token = config.token
+        self.refreshtoken = config.refreshtoken
+        self.refreshed = None
+        self._lock = threading.Lock()
+
+    def refresh_token(self):
+        from ..services import HashyAPIService
+
+        with self._lock:
+            response = HashyAPIService(self).refresh_token(self.refreshtoken)
+            data = response.get('data') or {}
+            if not data.get('accessToken'):
+                return {'success': False, 'message': 'Refresh failed', 'data': response}
+            self.token = data['accessToken']
+            self.refreshtoken = data.get('refreshToken') or self.refreshtoken
+            self.refreshed = response
+            return {'success': True, 'message': 'Refresh success', 'data': response}
+
+
+class AIOutbox(models.Model):
+    class Meta:
+        name = "aioutbox"
+        ordering = ["id"]
+        verbose_name = _("AI Outbox")
+
+    OPERATION_CHOICES = [
+        ('sync_rules', 'Sync AI Rules'),
+        ('delete_document', 'Delete Knowledge Document'),
+    ]
+
+    STATE_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    MAX_ATTEMPTS = 8
+    BACKOFF_BASE_SECONDS = 30
+    BACKOFF_MAX_SECONDS = 3600
+    # A claimed entry whose dispatcher died is picked up again after this long.
+    CLAIM_TIMEOUT_SECONDS = 600
+
+    operation = models.CharField(_("Operation"), max_length=20, choices=OPERATION_CHOICES)
+    config_id = models.ForeignKey("ai.AIAgentConfig", verbose_name=_("AI Config"), on_delete=models.CASCADE)
+    payload = models.JSONField(_("Payload"), null=True, blank=True)
+    dedup_key = models.CharField(_("Deduplication Key"), max_length=100, null=True, blank=True, db_index=True)
+    state = models.CharField(_("State"), max_length=10, choices=STATE_CHOICES, default='pending')
+    attempts = models.IntegerField(_("Attempts"), default=0)
+    next_attempt_at = models.DateTimeField(_("Next Attempt At"), null=True, blank=True)
+    last_error = models.TextField(_("Last Error"), null=True, blank=True)
+
+    @api.model
+    def enqueue(self, operation, config, payload=None, dedup_key=None):
+        if dedup_key:
+            pending = self.sudo().search([('dedup_key', '=', dedup_key), ('state', '=', 'pending')], limit=1)
+            if pending:
+                pending.write(
+                    {'payload': payload, 'state': 'pending', 'attempts': 0, 'next_attempt_at': timezone.now()}
+                )
+                return pending
+
+        return self.sudo().create(
+            {
+                'operation': operation,
+                'config_id': config.id,
+                'payload': payload,
+                'dedup_key': dedup_key,
+                'state': 'pending',
+                'next_attempt_at': timezone.now(),
+            }
+        )
+
+    @api.model
+    def dispatch(self, batch_size=50, max_workers=4, auto_commit=True):
+        """Send due entries to Hashy.
+
+        Entries are claimed as ``sending`` and committed before any remote call, so their row
+        locks are not held while Hashy answers and ``enqueue`` never waits on it.
+        """
+        now = timezone.now()
+        self._cr.execute(
+            f"""
+            UPDATE {self._table} SET state = 'sending', next_attempt_at = %s
+            WHERE id IN (
+                SELECT id FROM {self._table}
+                WHERE state IN ('pending', 'sending') AND (next_attempt_at IS NULL OR next_attempt_at <= %s)
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id
+            """,
+            (now + timedelta(seconds=self.CLAIM_TIMEOUT_SECONDS), now, batch_size),
+        )
+        entries = self.sudo().browse(sorted(row[0] for row in self._cr.fetchall()))
+        if not entries:
+            return True
+        entries.invalidate_cache()
+
+        snapshots = {}
+        jobs = [(entry, self._prepare_call(entry, snapshots)) for entry in entries]
+        if auto_commit:
+            self._cr.commit()
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-outbox') as executor:
+            futures = [(entry, executor.submit(self._call_remote, *call)) for entry, call in jobs]
+
+        for snapshot in snapshots.values():
+            if snapshot.refreshed:
+                self._store_refreshed_token(snapshot)
+        for entry, future in futures:
+            error = future.exception()
+            if error:
+                entry._schedule_retry(error)
+            else:
+                entry._mark_done(future.result())
+
+        if auto_commit:
+            self._cr.commit()
+
+        return True
+
+    def _store_refreshed_token(self, snapshot):
+        self.env['aiagentconfig'].sudo().browse(snapshot.config_id).write(
+            {
+                'state': 'connected',
+                'status': 'connected',
+                'token': snapshot.token,
+                'refreshtoken': snapshot.refreshtoken,
+                'response': snapshot.refreshed,
+                'token_expires_at': timezone.now() + timedelta(hours=1),
+            }
+        )
+
+    def _prepare_call(self, entry, snapshots):
+        config = entry.config_id
+        # Remote calls run in worker threads, so they only get a detached copy of the credentials,
+        # shared by the entries of one config.
+        snapshot = snapshots.get(config.id)
+        if snapshot is None:
+            snapshot = snapshots[config.id] = _ConfigSnapshot(config)
+        payload = entry.payload or {}
+
+        if entry.operation == 'sync_rules':
+            return snapshot, 'sync_ai_rules', (config.rules,)
+        return snapshot, 'delete_knowledge_document', (payload.get('external_id'),)
+
+    @staticmethod
+    def _call_remote(snapshot, method, args):
+        from ..services import HashyAPIService
+
+        service = HashyAPIService(snapshot)
+        return getattr(service, method)(*args)
+
+    def _mark_done(self, response):
+        self.write({'state': 'done', 'attempts': self.attempts + 1, 'last_error': None})
+        if self.operation == 'sync_rules':
+            self.config_id.sudo().write({'response': response})
+
+    def _schedule_retry(self, error):
+        attempts = self.attempts + 1
+        if attempts >= self.MAX_ATTEMPTS:
+            _logger.warning(f"Outbox entry {self.id} ({self.operation}) failed after {attempts} attempts: {error}")
+            self.write({'state': 'failed', 'attempts': attempts, 'last_error': str(error)})
+            return
+
+        delay = min(self.BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), self.BACKOFF_MAX_SECONDS)
+        self.write(
+            {
+                'state': 'pending',
+                'attempts': attempts,
+                'last_error': str(error),
+                'next_attempt_at': timezone.now() + timedelta(seconds=delay),
+            }
+        )
+
+    @api.model
+    def cleanup_done(self, days=7):
+        cutoff_date = timezone.now() - timedelta(days=days)
+        self.sudo().search([('state', '=', 'done'), ('updated_at', '<', cutoff_date)]).unlink()
+        return True
@@ -1,9 +1,39 @@
+import copy
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
 from django.db import models
+from django.template import engines
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from hmx import api
 
 
+_logger = logging.getLogger(__name__)
+
+TEMPLATE_CACHE_SIZE = 256
+
+_template_cache = OrderedDict()
+_template_cache_lock = threading.Lock()
+
+
+def report_version(report):
+    return report.updated_at.isoformat() if report.updated_at else ''
+
+
+def _detached(compiled):
+    return copy.deepcopy(compiled) if isinstance(compiled, (dict, list)) else compiled
+
+
+def clear_template_cache():
+    with _template_cache_lock:
+        _template_cache.clear()
+
+
 class BaseReport(models.Model):
     class Meta:
         inherit = 'basereport'
@@ -16,24 +46,123 @@ class BaseReport(models.Model):
         help_text=_("Reports created via API endpoint for automatic cleanup"),
     )
 
-    @api.model
-    def cleanup_hashy_reports(self, days=3):
-        import logging
-        from datetime import timedelta
+    def init(self):
+        # Only expired hashy reports are ever scanned by this index, so keep it partial.
+        self._cr.execute(
+            f"CREATE INDEX IF NOT EXISTS {self._table}_hashy_created_at_idx "
+            f"ON {self._table} (created_at) WHERE is_hashy"
+        )
+
+    def get_compiled_template(self):
+        """Parsed ``template_json`` (xlsx) or compiled ``template_html`` (pdf), cached per report version.
+
+        Entries are keyed by id and ``updated_at``, so any write to the report yields a new key and
+        stale versions simply age out of the LRU. Parsed JSON is returned as a deep copy, so callers
+        may modify it without corrupting the cached entry; compiled templates are not modified by
+        rendering and are shared.
+        """
+        key = (self.id, report_version(self), self.report_type)
+        with _template_cache_lock:
+            if key in _template_cache:
+                _template_cache.move_to_end(key)
+                return _detached(_template_cache[key])
 
-        from django.utils import timezone
+        if self.report_type == 'xlsx':
+            compiled = self.template_json
+            if isinstance(compiled, str):
+                try:
+                    compiled = json.loads(compiled)
+                except ValueError:
+                    compiled = None
+        elif self.template_html:
+            compiled = engines['django'].from_string(self.template_html)
+        else:
+            compiled = None
+
+        with _template_cache_lock:
+            _template_cache[key] = compiled
+            _template_cache.move_to_end(key)
+            while len(_template_cache) > TEMPLATE_CACHE_SIZE:
+                _template_cache.popitem(last=False)
+        return _detached(compiled)
+
+    def get_template_json(self):
+        if self.report_type == 'xlsx':
+            return self.get_compiled_template()
+        template_json = self.template_json
+        if isinstance(template_json, str):
+            try:
+                return json.loads(template_json)
+            except ValueError:
+                return None
+        return template_json
+
+    def render_template_html(self, context=None):
+        template = self.get_compiled_template()
+        if template is None or self.report_type == 'xlsx':
+            return self.template_html or ''
+        return template.render(context or {})
 
-        _logger = logging.getLogger(__name__)
+    def action_pdf_data(self, records):
+        # Render through the compiled template cache and hand the HTML to the core renderer, so it
+        # does not parse template_html again for every print.
+        if self.report_type != 'pdf' or not self.template_html:
+            return super().action_pdf_data(records)
+        html = self.render_template_html({'docs': records, 'records': records, 'report': self})
+        return super(BaseReport, self.with_context(report_html=html)).action_pdf_data(records)
 
+    @api.model
+    def cleanup_hashy_reports(self, days=3, batch_size=500, max_batches=None, auto_commit=False, log=None):
         cutoff_date = timezone.now() - timedelta(days=days)
-        old_reports = self.search([('is_hashy', '=', True), ('created_at', '<', cutoff_date)])
 
-        if old_reports:
-            count = len(old_reports)
-            _logger.info(f"Cleaning up {count} hashy reports older than {days} days")
-            old_reports.unlink()
-            _logger.info(f"Successfully deleted {count} hashy reports")
-        else:
+        self._cr.execute(
+            f"SELECT count(*) FROM {self._table} WHERE is_hashy AND created_at < %s",
+            (cutoff_date,),
+        )
+        total = self._cr.fetchone()[0]
+
+        if not total:
             _logger.info("No hashy reports to cleanup")
+            return True
+
+        _logger.info(f"Cleaning up {total} hashy reports older than {days} days in batches of {batch_size}")
+
+        deleted = 0
+        # Keyset on (created_at, id), so each batch is a range scan of the partial index.
+        last_key = None
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            after = "AND (created_at, id) > (%s, %s)" if last_key else ""
+            self._cr.execute(
+                f"""
+                SELECT created_at, id FROM {self._table}
+                WHERE is_hashy AND created_at < %s {after}
+                ORDER BY created_at, id
+                LIMIT %s
+                """,
+                (cutoff_date, *(last_key or ()), batch_size),
+            )
+            rows = self._cr.fetchall()
+            if not rows:
+                break
+            ids = [row[1] for row in rows]
+
+            self.browse(ids).unlink()
+            if auto_commit:
+                self._cr.commit()
+
+            deleted += len(ids)
+            last_key = rows[-1]
+            batches += 1
+
+            progress = min(100, deleted * 100 // total)
+            _logger.info(f"Deleted {deleted}/{total} hashy reports ({progress}%), last id {last_key[1]}")
+            if log:
+                log(progress=progress, text=f"Deleted {deleted:,} of {total:,} hashy reports")
+
+        if deleted < total:
+            _logger.info(f"Stopped after {deleted}/{total} hashy reports; the next run resumes from the oldest report")
+        else:
+            _logger.info(f"Successfully deleted {deleted} hashy reports")
 
         return True
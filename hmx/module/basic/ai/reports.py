@@ -1,8 +1,11 @@
+import hashlib
 import json
 import logging
 from datetime import datetime
 
-from django.http import HttpRequest
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse
 from hmx_api.api import auth
 from hmx_api.registry import register_routers
 from hmx_api.rpc import clean_save_values, make_json_safe
@@ -11,6 +14,8 @@ from ninja import Router, Schema
 
 _logger = logging.getLogger(__name__)
 
+MAX_BATCH_SIZE = 200
+
 router = Router(tags=["reports"])
 
 
@@ -67,9 +72,15 @@ class ReportResponseSchema(Schema):
     data: ReportDetailSchema
 
 
+class ReportListItemSchema(ReportDetailSchema):
+    report_type: str | None = None
+    is_template: bool | None = None
+    is_hashy: bool | None = None
+
+
 class ReportListResponseSchema(Schema):
     success: bool
-    data: list[ReportDetailSchema]
+    data: list[ReportListItemSchema]
     total: int
     limit: int
     offset: int
@@ -80,21 +91,76 @@ class ErrorSchema(Schema):
     error: str
 
 
-def serialize_report(report, include_related=True):
-    filter_domain = report.filter_domain or []
-    if isinstance(filter_domain, str):
-        try:
-            filter_domain = json.loads(filter_domain)
-        except Exception:
-            filter_domain = []
+class ReportBatchCreateSchema(Schema):
+    reports: list[ReportCreateSchema]
+
+
+class ReportBatchUpdateItemSchema(ReportUpdateSchema):
+    id: int
+
+
+class ReportBatchUpdateSchema(Schema):
+    reports: list[ReportBatchUpdateItemSchema]
+
 
-    template_json = report.template_json
-    if isinstance(template_json, str):
+class ReportBatchDeleteSchema(Schema):
+    ids: list[int]
+
+
+class ReportBatchResponseSchema(Schema):
+    success: bool
+    ids: list[int]
+    data: list[ReportListItemSchema] = []
+
+
+REPORT_COLUMNS = (
+    'name',
+    'report_type',
+    'is_template',
+    'template_html',
+    'template_json',
+    'print_report_name',
+    'print_report_preview',
+    'filter_domain',
+    'created_at',
+    'updated_at',
+    'is_hashy',
+)
+
+# response key -> (relation field, response key of the related name, name field on the related model)
+REPORT_RELATIONS = {
+    'model_id': ('model', 'model_name', 'model_name'),
+    'template_id': ('template_id', None, None),
+    'paper_format_id': ('paper_format', 'paper_format_name', 'name'),
+    'created_by': ('created_by', 'created_by_name', 'name'),
+    'action_id': ('action_id', 'action_name', 'name'),
+}
+
+REPORT_FIELDS = ('id',) + REPORT_COLUMNS + tuple(
+    key for relation_key, (_f, name_key, _n) in REPORT_RELATIONS.items() for key in (relation_key, name_key) if key
+)
+
+
+def _parse_json(value, default):
+    if isinstance(value, str):
         try:
-            template_json = json.loads(template_json)
+            return json.loads(value)
         except Exception:
-            template_json = None
+            return default
+    return value if value is not None else default
+
+
+def parse_report_fields(fields):
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = requested - set(REPORT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown report fields: {', '.join(sorted(unknown))}")
+    return requested | {'id'}
 
+
+def serialize_report(report, include_related=True):
     data = {
         'id': report.id,
         'name': report.name,
@@ -103,10 +169,10 @@ def serialize_report(report, include_related=True):
         'is_template': report.is_template,
         'template_id': report.template_id.id if report.template_id else None,
         'template_html': report.template_html,
-        'template_json': template_json,
+        'template_json': report.get_template_json(),
         'paper_format_id': report.paper_format.id if report.paper_format else None,
         'print_report_name': report.print_report_name,
-        'filter_domain': filter_domain,
+        'filter_domain': _parse_json(report.filter_domain, []) or [],
         'created_at': report.created_at.isoformat() if hasattr(report, 'created_at') and report.created_at else None,
         'updated_at': report.updated_at.isoformat() if hasattr(report, 'updated_at') and report.updated_at else None,
         'created_by': report.created_by.id if hasattr(report, 'created_by') and report.created_by else None,
@@ -125,6 +191,158 @@ def serialize_report(report, include_related=True):
     return make_json_safe(data)
 
 
+# Related records whose names are serialized with a report; renaming one must change the ETag.
+ETAG_RELATED_FIELDS = ('model', 'paper_format', 'action_id')
+
+
+def related_versions(reports):
+    parts = []
+    for field_name in ETAG_RELATED_FIELDS:
+        stamps = [record.updated_at for record in reports.mapped(field_name) if record.updated_at]
+        parts.append(f"{field_name}:{max(stamps).timestamp() if stamps else 0}")
+    return parts
+
+
+def report_etag(report):
+    version = int(report.updated_at.timestamp() * 1_000_000) if report.updated_at else 0
+    related = hashlib.sha1("|".join(related_versions(report)).encode()).hexdigest()[:16]
+    return f'"report-{report.id}-{version}-{related}"'
+
+
+def page_etag(reports, total, fields=None):
+    """Strong ETag for a listing page, from the ids and ``updated_at`` of its rows and their related records."""
+    if reports:
+        reports._cr.execute(
+            f"SELECT id, updated_at FROM {reports._table} WHERE id = ANY(%s)",
+            (reports.ids,),
+        )
+        versions = dict(reports._cr.fetchall())
+    else:
+        versions = {}
+    parts = [
+        f"{report_id}:{versions[report_id].timestamp() if versions.get(report_id) else 0}" for report_id in reports.ids
+    ]
+    parts.extend(related_versions(reports))
+    parts.append(f"total:{total}")
+    parts.append(f"fields:{','.join(sorted(fields)) if fields else '*'}")
+    return f'"reports-{hashlib.sha1("|".join(parts).encode()).hexdigest()}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = {candidate.strip() for candidate in header.split(',')}
+    return '*' in candidates or etag in candidates
+
+
+def _load_related_names(reports, field_name, name_field, related_ids):
+    """Map related record ids to their display field with one query for the whole page.
+
+    Falls back to dereferencing one report per distinct related record when the name is not a
+    stored column (e.g. a property on the related model).
+    """
+    field = reports._meta.get_field(field_name)
+    related_meta = field.related_model._meta
+    try:
+        column = related_meta.get_field(name_field).column
+    except FieldDoesNotExist:
+        column = None
+
+    if column:
+        reports._cr.execute(
+            f'SELECT id, "{column}" FROM "{related_meta.db_table}" WHERE id = ANY(%s)', (list(related_ids),)
+        )
+        return dict(reports._cr.fetchall())
+
+    names = {}
+    for report in reports:
+        related = getattr(report, field_name)
+        if related and related.id in related_ids and related.id not in names:
+            names[related.id] = getattr(related, name_field)
+    return names
+
+
+def serialize_report_page(reports, fields=None):
+    """Serialize a page of reports without per-row relation lookups.
+
+    The requested columns and foreign keys are read in a single query and each requested
+    relation name in one more, instead of dereferencing six relations on every row.
+    ``fields`` limits the output (and the columns read), so list views can leave out the
+    ``template_html``/``template_json`` bodies.
+    """
+    if not reports:
+        return []
+
+    wanted = set(fields) if fields else set(REPORT_FIELDS)
+    meta = reports._meta
+    columns = [name for name in REPORT_COLUMNS if name in wanted]
+    relations = {
+        key: spec for key, spec in REPORT_RELATIONS.items() if key in wanted or (spec[1] and spec[1] in wanted)
+    }
+    select = [meta.get_field(name).column for name in columns]
+    select += [meta.get_field(field_name).column for field_name, _k, _n in relations.values()]
+    select_sql = ''.join(f', "{column}"' for column in select)
+
+    reports._cr.execute(f"SELECT id{select_sql} FROM {reports._table} WHERE id = ANY(%s)", (reports.ids,))
+    rows = {row[0]: row[1:] for row in reports._cr.fetchall()}
+
+    relation_ids = {}
+    for index, key in enumerate(relations, start=len(columns)):
+        relation_ids[key] = {report_id: row[index] for report_id, row in rows.items()}
+
+    related_names = {}
+    for key, (field_name, name_key, name_field) in relations.items():
+        if name_key and name_key in wanted:
+            ids = {value for value in relation_ids[key].values() if value}
+            related_names[key] = _load_related_names(reports, field_name, name_field, ids) if ids else {}
+
+    preview_storage = meta.get_field('print_report_preview').storage if 'print_report_preview' in wanted else None
+
+    data = []
+    for report_id in reports.ids:
+        row = rows.get(report_id)
+        if row is None:
+            continue
+        values = dict(zip(columns, row))
+        item = {'id': report_id}
+        for name, value in values.items():
+            if name == 'template_json':
+                value = _parse_json(value, None)
+            elif name == 'filter_domain':
+                value = _parse_json(value, []) or []
+            elif name == 'print_report_preview':
+                value = preview_storage.url(value) if value else None
+            elif name in ('created_at', 'updated_at'):
+                value = value.isoformat() if value else None
+            elif name == 'is_hashy':
+                value = bool(value)
+            item[name] = value
+
+        for key, (_field_name, name_key, _name_field) in relations.items():
+            related_id = relation_ids[key][report_id]
+            if key in wanted:
+                item[key] = related_id
+            if name_key and name_key in wanted:
+                item[name_key] = related_names[key].get(related_id) if related_id else None
+
+        data.append(make_json_safe(item))
+
+    return data
+
+
+def _merged_report_values(report, values):
+    merged_values = {
+        'report_type': report.report_type,
+        'model': report.model.id if report.model else None,
+        'is_template': report.is_template,
+        'template_html': report.template_html,
+        'template_json': report.template_json,
+    }
+    merged_values.update(values)
+    return merged_values
+
+
 def validate_report_data(data, is_update=False):
     errors = []
 
@@ -181,15 +399,23 @@ def build_report_domain(
     return domain
 
 
-def _create_report_action(env, report):
-    if not report.model:
-        _logger.warning(f"Cannot create action for report {report.id}: no model assigned")
-        return None
+def _report_values(data):
+    values = data.dict(exclude_unset=True)
+    values.pop('id', None)
+
+    if 'model_id' in values:
+        values['model'] = values.pop('model_id')
+    if 'paper_format_id' in values:
+        values['paper_format'] = values.pop('paper_format_id')
 
+    return clean_save_values(values)
+
+
+def _report_action_values(report):
     action_name = f"Generate {report.name}" if report.name else "Generate PDF Report"
     action_code = f"env['basereport'].browse({report.id}).action_pdf_data(records)"
 
-    action_vals = {
+    return {
         'name': action_name,
         'binding_type': 'report',
         'binding_model': report.model.id,
@@ -198,8 +424,14 @@ def _create_report_action(env, report):
         'code': action_code,
     }
 
+
+def _create_report_action(env, report):
+    if not report.model:
+        _logger.warning(f"Cannot create action for report {report.id}: no model assigned")
+        return None
+
     try:
-        action = env['baseactionreport'].sudo().create(action_vals)
+        action = env['baseactionreport'].sudo().create(_report_action_values(report))
         report.sudo().write({'action_id': action.id})
         _logger.info(f"Created action {action.id} for report {report.id}")
         return action
@@ -208,20 +440,34 @@ def _create_report_action(env, report):
         return None
 
 
-@router.post("/reports", auth=auth, response={200: ReportResponseSchema, 400: ErrorSchema})
-def create_report(request: HttpRequest, data: ReportCreateSchema):
-    try:
-        values = data.dict(exclude_unset=True)
+def _create_report_actions(env, reports):
+    """Create the binding actions of several reports with one multi-create and link them with one UPDATE.
+
+    Unlike ``_create_report_action`` errors propagate, so a batch is rolled back as a whole.
+    """
+    reports = [report for report in reports if report.model and not report.is_template]
+    if not reports:
+        return env['baseactionreport']
 
-        if 'model_id' in values:
-            values['model'] = values.pop('model_id')
-        if 'paper_format_id' in values:
-            values['paper_format'] = values.pop('paper_format_id')
-        if 'template_id' in values:
-            values['template_id'] = values['template_id']
+    actions = env['baseactionreport'].sudo().create([_report_action_values(report) for report in reports])
+    linked = env['basereport'].sudo().browse([report.id for report in reports])
+    linked._cr.execute(
+        f"""
+        UPDATE {linked._table} r SET {linked._meta.get_field('action_id').column} = d.action_id
+        FROM unnest(%s::integer[], %s::integer[]) AS d(id, action_id)
+        WHERE r.id = d.id
+        """,
+        (linked.ids, actions.ids),
+    )
+    linked.invalidate_cache()
+    _logger.info(f"Created {len(actions)} actions for reports {linked.ids}")
+    return actions
 
-        values = clean_save_values(values)
 
+@router.post("/reports", auth=auth, response={200: ReportResponseSchema, 400: ErrorSchema})
+def create_report(request: HttpRequest, data: ReportCreateSchema):
+    try:
+        values = _report_values(data)
         values['is_hashy'] = True
 
         errors = validate_report_data(values)
@@ -239,9 +485,10 @@ def create_report(request: HttpRequest, data: ReportCreateSchema):
         return 400, {"success": False, "error": str(e)}
 
 
-@router.get("/reports", auth=auth, response={200: ReportListResponseSchema, 400: ErrorSchema})
+@router.get("/reports", auth=auth, response={200: ReportListResponseSchema, 304: None, 400: ErrorSchema})
 def list_reports(
     request: HttpRequest,
+    response: HttpResponse,
     model_id: int | None = None,
     report_type: str | None = None,
     is_template: bool | None = None,
@@ -250,10 +497,16 @@ def list_reports(
     date_from: str | None = None,
     date_to: str | None = None,
     domain: str | None = None,
+    fields: str | None = None,
     limit: int = 10,
     offset: int = 0,
 ):
     try:
+        try:
+            requested_fields = parse_report_fields(fields)
+        except ValueError as e:
+            return 400, {"success": False, "error": str(e)}
+
         custom_domain = []
         if domain:
             try:
@@ -265,10 +518,21 @@ def list_reports(
             model_id, report_type, is_template, name, created_by, date_from, date_to, custom_domain
         )
 
-        reports = request.env['basereport'].sudo().search(search_domain, limit=limit, offset=offset)
-        total = request.env['basereport'].sudo().search_count(search_domain)
+        Report = request.env['basereport'].sudo()
+        reports = Report.search(search_domain, limit=limit, offset=offset)
+
+        # A short page is the last one, so the total is known without counting again.
+        if len(reports) < limit and (reports or not offset):
+            total = offset + len(reports)
+        else:
+            total = Report.search_count(search_domain)
 
-        data = [serialize_report(report) for report in reports]
+        etag = page_etag(reports, total, requested_fields)
+        response['ETag'] = etag
+        if etag_matches(request, etag):
+            return 304, None
+
+        data = serialize_report_page(reports, requested_fields)
 
         return 200, {"success": True, "data": data, "total": total, "limit": limit, "offset": offset}
     except Exception as e:
@@ -276,14 +540,23 @@ def list_reports(
         return 400, {"success": False, "error": str(e)}
 
 
-@router.get("/reports/{report_id}", auth=auth, response={200: ReportResponseSchema, 400: ErrorSchema, 404: ErrorSchema})
-def get_report(request: HttpRequest, report_id: int):
+@router.get(
+    "/reports/{report_id}",
+    auth=auth,
+    response={200: ReportResponseSchema, 304: None, 400: ErrorSchema, 404: ErrorSchema},
+)
+def get_report(request: HttpRequest, response: HttpResponse, report_id: int):
     try:
         report = request.env['basereport'].sudo().browse(report_id)
 
         if not report.exists():
             return 404, {"success": False, "error": "Report not found"}
 
+        etag = report_etag(report)
+        response['ETag'] = etag
+        if etag_matches(request, etag):
+            return 304, None
+
         return 200, {"success": True, "data": serialize_report(report)}
     except Exception as e:
         _logger.exception(f"Failed to get report {report_id}")
@@ -291,40 +564,23 @@ def get_report(request: HttpRequest, report_id: int):
 
 
 @router.put("/reports/{report_id}", auth=auth, response={200: ReportResponseSchema, 400: ErrorSchema, 404: ErrorSchema})
-def update_report(request: HttpRequest, report_id: int, data: ReportUpdateSchema):
+def update_report(request: HttpRequest, response: HttpResponse, report_id: int, data: ReportUpdateSchema):
     try:
         report = request.env['basereport'].sudo().browse(report_id)
 
         if not report.exists():
             return 404, {"success": False, "error": "Report not found"}
 
-        values = data.dict(exclude_unset=True)
-
-        if 'model_id' in values:
-            values['model'] = values.pop('model_id')
-        if 'paper_format_id' in values:
-            values['paper_format'] = values.pop('paper_format_id')
-        if 'template_id' in values:
-            values['template_id'] = values['template_id']
-
-        values = clean_save_values(values)
+        values = _report_values(data)
 
         if values:
-            merged_values = {
-                'report_type': report.report_type,
-                'model': report.model.id if report.model else None,
-                'is_template': report.is_template,
-                'template_html': report.template_html,
-                'template_json': report.template_json,
-            }
-            merged_values.update(values)
-
-            errors = validate_report_data(merged_values, is_update=True)
+            errors = validate_report_data(_merged_report_values(report, values), is_update=True)
             if errors:
                 return 400, {"success": False, "error": "; ".join(errors)}
 
             report.write(values)
 
+        response['ETag'] = report_etag(report)
         return 200, {"success": True, "data": serialize_report(report)}
     except Exception as e:
         _logger.exception(f"Failed to update report {report_id}")
@@ -347,4 +603,104 @@ def delete_report(request: HttpRequest, report_id: int):
         return 400, {"success": False, "error": str(e)}
 
 
+def _batch_size_error(items):
+    if not items:
+        return "At least one report is required"
+    if len(items) > MAX_BATCH_SIZE:
+        return f"At most {MAX_BATCH_SIZE} reports can be processed per batch"
+    return None
+
+
+def _batch_errors(errors_by_index):
+    return "; ".join(f"reports[{index}]: {', '.join(errors)}" for index, errors in errors_by_index if errors)
+
+
+@router.post("/reports/batch", auth=auth, response={200: ReportBatchResponseSchema, 400: ErrorSchema})
+def create_reports_batch(request: HttpRequest, data: ReportBatchCreateSchema):
+    size_error = _batch_size_error(data.reports)
+    if size_error:
+        return 400, {"success": False, "error": size_error}
+
+    try:
+        vals_list = []
+        for item in data.reports:
+            values = _report_values(item)
+            values['is_hashy'] = True
+            vals_list.append(values)
+
+        errors = _batch_errors((index, validate_report_data(values)) for index, values in enumerate(vals_list))
+        if errors:
+            return 400, {"success": False, "error": errors}
+
+        with transaction.atomic():
+            reports = request.env['basereport'].sudo().create(vals_list)
+            _create_report_actions(request.env, reports)
+
+        return 200, {"success": True, "ids": reports.ids, "data": serialize_report_page(reports)}
+    except Exception as e:
+        _logger.exception("Failed to create report batch")
+        return 400, {"success": False, "error": str(e)}
+
+
+@router.put("/reports/batch", auth=auth, response={200: ReportBatchResponseSchema, 400: ErrorSchema, 404: ErrorSchema})
+def update_reports_batch(request: HttpRequest, data: ReportBatchUpdateSchema):
+    size_error = _batch_size_error(data.reports)
+    if size_error:
+        return 400, {"success": False, "error": size_error}
+
+    try:
+        ids = [item.id for item in data.reports]
+        if len(set(ids)) != len(ids):
+            return 400, {"success": False, "error": "Each report can only appear once per batch"}
+
+        reports = request.env['basereport'].sudo().browse(ids)
+        existing = reports.exists()
+        missing = set(ids) - set(existing.ids)
+        if missing:
+            return 404, {"success": False, "error": f"Reports not found: {sorted(missing)}"}
+
+        updates = [(report, _report_values(item)) for report, item in zip(reports, data.reports)]
+        errors = _batch_errors(
+            (index, validate_report_data(_merged_report_values(report, values), is_update=True) if values else [])
+            for index, (report, values) in enumerate(updates)
+        )
+        if errors:
+            return 400, {"success": False, "error": errors}
+
+        with transaction.atomic():
+            for report, values in updates:
+                if values:
+                    report.write(values)
+
+        return 200, {"success": True, "ids": ids, "data": serialize_report_page(reports)}
+    except Exception as e:
+        _logger.exception("Failed to update report batch")
+        return 400, {"success": False, "error": str(e)}
+
+
+@router.post(
+    "/reports/batch/delete",
+    auth=auth,
+    response={200: ReportBatchResponseSchema, 400: ErrorSchema, 404: ErrorSchema},
+)
+def delete_reports_batch(request: HttpRequest, data: ReportBatchDeleteSchema):
+    size_error = _batch_size_error(data.ids)
+    if size_error:
+        return 400, {"success": False, "error": size_error}
+
+    try:
+        reports = request.env['basereport'].sudo().browse(data.ids).exists()
+        missing = set(data.ids) - set(reports.ids)
+        if missing:
+            return 404, {"success": False, "error": f"Reports not found: {sorted(missing)}"}
+
+        with transaction.atomic():
+            reports.unlink()
+
+        return 200, {"success": True, "ids": data.ids}
+    except Exception as e:
+        _logger.exception("Failed to delete report batch")
+        return 400, {"success": False, "error": str(e)}
+
+
 register_routers([('ai/', router)])
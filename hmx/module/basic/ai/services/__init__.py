@@ -1,4 +1,4 @@
-from .hashy_api_service import APIError, HashyAPIService, TokenRefreshFailedError
+from .hashy_api_service import APIError, CircuitOpenError, HashyAPIService, TokenRefreshFailedError
 
 
-__all__ = ['HashyAPIService', 'APIError', 'TokenRefreshFailedError']
+__all__ = ['HashyAPIService', 'APIError', 'CircuitOpenError', 'TokenRefreshFailedError']
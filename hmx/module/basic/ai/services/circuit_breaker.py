@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import deque
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_rate=0.5, min_calls=10, window_seconds=60, open_seconds=30, probe_seconds=30):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        # How long a half-open probe may take before callers are told to retry; the default read timeout.
+        self.probe_seconds = probe_seconds
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.probe_started_at = 0.0
+        self._outcomes = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            self.probe_started_at = time.monotonic()
+            return True
+
+    def retry_after(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return 0
+            if self.state == HALF_OPEN:
+                deadline = self.probe_started_at + self.probe_seconds
+            else:
+                deadline = self.opened_at + self.open_seconds
+            return max(1, int(deadline - time.monotonic()) + 1)
+
+    def state_value(self):
+        return {CLOSED: 0, HALF_OPEN: 0.5, OPEN: 1}[self.state]
+
+    def record_success(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.probe_in_flight = False
+                self._outcomes.clear()
+                return
+            now = time.monotonic()
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                self._open(now)
+                return
+
+            self._outcomes.append((now, False))
+            self._trim(now)
+
+            failures = sum(1 for _ts, ok in self._outcomes if not ok)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open(now)
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.probe_in_flight = False
+        self._outcomes.clear()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
@@ -0,0 +1,128 @@
+import random
+import time
+from contextlib import contextmanager
+
+from django.core.cache import caches
+
+
+class ConcurrencyLimitExceeded(Exception):
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """In-flight request caps shared through a Django cache backend.
+
+    With a backend whose ``incr`` is atomic (Redis, Memcached) the caps hold across all worker
+    processes. The database backend's ``incr`` is a read followed by a write, so concurrent
+    workers can lose updates and overshoot the caps; the local-memory backend applies them per
+    process. The backend is looked up on every call, so the limiter can be built at import time
+    and still follow later ``CACHES`` changes. Every acquire and release
+    refreshes a counter's expiry, so it only lapses after ``slot_ttl`` without any traffic, which
+    eventually releases slots leaked by a killed worker.
+    """
+
+    def __init__(
+        self,
+        name,
+        per_user=2,
+        global_limit=20,
+        queue_size=20,
+        queue_timeout=5.0,
+        poll_interval=0.1,
+        max_poll_interval=1.0,
+        slot_ttl=330,
+        cache_alias='default',
+        store=None,
+    ):
+        self.name = name
+        self.per_user = per_user
+        self.global_limit = global_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.slot_ttl = slot_ttl
+        self.cache_alias = cache_alias
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else caches[self.cache_alias]
+
+    def _key(self, *parts):
+        return ':'.join(('concurrency', self.name) + tuple(str(part) for part in parts))
+
+    def _incr(self, key):
+        self.store.add(key, 0, self.slot_ttl)
+        try:
+            value = self.store.incr(key)
+        except ValueError:
+            self.store.add(key, 1, self.slot_ttl)
+            return 1
+        self.store.touch(key, self.slot_ttl)
+        return value
+
+    def _decr(self, key):
+        try:
+            value = self.store.decr(key)
+        except ValueError:
+            return
+        if value < 0:
+            # The counter lapsed and was recreated while this slot was held; don't go below zero.
+            self.store.incr(key, -value)
+        self.store.touch(key, self.slot_ttl)
+
+    def _try_acquire_global(self):
+        if self._incr(self._key('global')) > self.global_limit:
+            self._decr(self._key('global'))
+            return False
+        return True
+
+    def in_flight(self, user_id=None):
+        key = self._key('user', user_id) if user_id is not None else self._key('global')
+        return self.store.get(key) or 0
+
+    @contextmanager
+    def acquire(self, user_id):
+        user_key = self._key('user', user_id)
+        if self._incr(user_key) > self.per_user:
+            self._decr(user_key)
+            raise ConcurrencyLimitExceeded(
+                f"Too many concurrent requests, at most {self.per_user} per user", retry_after=5
+            )
+
+        try:
+            if not self._try_acquire_global():
+                self._wait_in_queue()
+        except ConcurrencyLimitExceeded:
+            self._decr(user_key)
+            raise
+
+        try:
+            yield
+        finally:
+            self._decr(self._key('global'))
+            self._decr(user_key)
+
+    def _wait_in_queue(self):
+        queue_key = self._key('queue')
+        retry_after = max(1, int(self.queue_timeout))
+        try:
+            if self._incr(queue_key) > self.queue_size:
+                raise ConcurrencyLimitExceeded("Server is busy, request queue is full", retry_after=retry_after)
+
+            deadline = time.monotonic() + self.queue_timeout
+            delay = self.poll_interval
+            while not self._try_acquire_global():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ConcurrencyLimitExceeded(
+                        "Server is busy, timed out waiting for a slot", retry_after=retry_after
+                    )
+                # Exponential backoff with jitter, so queued requests don't poll the cache in lockstep.
+                time.sleep(min(remaining, delay * random.uniform(0.5, 1)))
+                delay = min(delay * 2, self.max_poll_interval)
+        finally:
+            self._decr(queue_key)
@@ -0,0 +1,44 @@
+FTS_CONFIG = 'simple'
+FTS_COLUMN = 'search_vector'
+HEADLINE_OPTIONS = 'MaxFragments=2, MaxWords=30, MinWords=10, FragmentDelimiter=" ... "'
+
+
+def weighted_vector(column, weight):
+    return f"setweight(to_tsvector('{FTS_CONFIG}'::regconfig, coalesce({column}, '')), '{weight}')"
+
+
+def ensure_search_vector(cr, table, expression):
+    cr.execute(
+        f"""
+        ALTER TABLE {table}
+        ADD COLUMN IF NOT EXISTS {FTS_COLUMN} tsvector
+        GENERATED ALWAYS AS ({expression}) STORED
+        """
+    )
+    cr.execute(f"CREATE INDEX IF NOT EXISTS {table}_{FTS_COLUMN}_idx ON {table} USING GIN ({FTS_COLUMN})")
+
+
+def search_ranked(cr, table, query, headline_column, limit=20, offset=0, joins='', where='', params=None):
+    if not query or not query.strip():
+        return []
+
+    where_clause = f"AND {where}" if where else ''
+    cr.execute(
+        f"""
+        WITH q AS (SELECT websearch_to_tsquery('{FTS_CONFIG}', %s) AS query),
+        hits AS (
+            SELECT t.id, ts_rank_cd(t.{FTS_COLUMN}, q.query) AS rank
+            FROM {table} t {joins}, q
+            WHERE t.{FTS_COLUMN} @@ q.query {where_clause}
+            ORDER BY rank DESC, t.id DESC
+            LIMIT %s OFFSET %s
+        )
+        SELECT hits.id, hits.rank,
+               ts_headline('{FTS_CONFIG}', t.{headline_column}, q.query, %s) AS snippet
+        FROM hits
+        JOIN {table} t ON t.id = hits.id, q
+        ORDER BY hits.rank DESC, hits.id DESC
+        """,
+        [query.strip(), *(params or []), limit, offset, HEADLINE_OPTIONS],
+    )
+    return [{'id': row[0], 'rank': float(row[1]), 'snippet': row[2]} for row in cr.fetchall()]
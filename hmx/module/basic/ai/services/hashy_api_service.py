@@ -1,8 +1,49 @@
 import base64
 import json
 import mimetypes
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import requests
+from django.conf import settings
+
+from . import metrics
+from .circuit_breaker import get_breaker
+
+
+DEFAULT_TIMEOUT = (5, 30)
+
+# (connect, read) timeouts in seconds, matched by endpoint prefix. Chat and uploads wait on the LLM.
+ENDPOINT_TIMEOUTS = [
+    ("/meta/odoo/chat", (5, 120)),
+    ("/ai/knowledge/upload", (5, 120)),
+    ("/auth/", (5, 15)),
+    ("/session", (5, 15)),
+    ("/message", (5, 15)),
+    ("/ai/knowledge/documents", (5, 30)),
+    ("/odoo-service/", (5, 30)),
+]
+
+HEDGE_DELAY = 2.0
+HEDGE_WORKERS = getattr(settings, 'HASHY_HEDGE_WORKERS', 8)
+
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hashy-hedge')
+# One slot per pool thread; hedging is skipped rather than queued behind busy threads.
+_hedge_slots = threading.BoundedSemaphore(HEDGE_WORKERS)
+
+
+def _submit_hedged(fn, *args):
+    """Run ``fn`` on the hedge pool, or return None when all its threads are busy."""
+    if not _hedge_slots.acquire(blocking=False):
+        return None
+    try:
+        future = _hedge_executor.submit(fn, *args)
+    except BaseException:
+        _hedge_slots.release()
+        raise
+    future.add_done_callback(lambda _future: _hedge_slots.release())
+    return future
 
 
 class HashyAPIService:
@@ -54,45 +95,130 @@ class HashyAPIService:
                 refresh_result = self.config.refresh_token()
                 if refresh_result.get('success'):
                     self.token = self.config.token
+                    metrics.token_refreshes.inc(result='success')
                     return True
+                metrics.token_refreshes.inc(result='failed')
             return False
         except Exception:
+            metrics.token_refreshes.inc(result='error')
             return False
 
-    def _make_request(self, method, endpoint, data=None, timeout=300, retry_count=0):
+    def _timeout_for(self, endpoint):
+        for prefix, timeout in ENDPOINT_TIMEOUTS:
+            if endpoint.startswith(prefix):
+                return timeout
+        return DEFAULT_TIMEOUT
+
+    def _acquire_breaker(self, endpoint_label=None):
+        breaker = get_breaker(self.base_url)
+        allowed = breaker.allow_request()
+        metrics.circuit_state.set(breaker.state_value(), base_url=self.base_url)
+        if not allowed:
+            metrics.upstream_errors.inc(endpoint=endpoint_label or 'unknown', error='circuit_open')
+            raise CircuitOpenError(
+                f"Hashy API is unavailable, retry in {breaker.retry_after()}s",
+                retry_after=breaker.retry_after(),
+            )
+        return breaker
+
+    def _send(self, method, url, headers, data, timeout):
+        if method == 'GET':
+            return requests.get(url, headers=headers, params=data, timeout=timeout)
+        elif method == 'PUT':
+            return requests.put(url, headers=headers, json=data, timeout=timeout)
+        elif method == 'DELETE':
+            return requests.delete(url, headers=headers, timeout=timeout)
+        return requests.post(url, headers=headers, json=data, timeout=timeout)
+
+    def _send_hedged(self, url, headers, data, timeout, endpoint_label=None):
+        primary = _submit_hedged(self._send, 'GET', url, headers, data, timeout)
+        if primary is None:
+            return self._send('GET', url, headers, data, timeout)
+        done, _pending = wait([primary], timeout=HEDGE_DELAY)
+        if done:
+            return primary.result()
+
+        hedge = _submit_hedged(self._send, 'GET', url, headers, data, timeout)
+        if hedge is None:
+            return primary.result()
+        metrics.hedged_requests.inc(endpoint=endpoint_label or 'unknown')
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _record_response(self, breaker, method, label, response, elapsed):
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        metrics.circuit_state.set(breaker.state_value(), base_url=self.base_url)
+
+        metrics.upstream_latency.observe(elapsed, endpoint=label, method=method, status=response.status_code)
+        metrics.upstream_payload.observe(len(response.content or b''), endpoint=label, direction='response')
+        if response.status_code >= 400:
+            metrics.upstream_errors.inc(endpoint=label, error=f'http_{response.status_code // 100}xx')
+
+    def _record_exception(self, breaker, method, label, error, elapsed):
+        breaker.record_failure()
+        metrics.circuit_state.set(breaker.state_value(), base_url=self.base_url)
+
+        if isinstance(error, requests.exceptions.Timeout):
+            error_class = 'timeout'
+        elif isinstance(error, requests.exceptions.ConnectionError):
+            error_class = 'connection'
+        else:
+            error_class = 'request'
+        metrics.upstream_latency.observe(elapsed, endpoint=label, method=method, status=error_class)
+        metrics.upstream_errors.inc(endpoint=label, error=error_class)
+
+    def _make_request(self, method, endpoint, data=None, timeout=None, retry_count=0, hedge=False):
         url = f"{self.base_url}{endpoint}"
         headers = self._get_headers()
+        method = method.upper()
+        timeout = timeout or self._timeout_for(endpoint)
+        label = metrics.endpoint_label(endpoint)
+        breaker = self._acquire_breaker(label)
+
+        if data is not None and method in ('POST', 'PUT'):
+            metrics.upstream_payload.observe(len(json.dumps(data)), endpoint=label, direction='request')
 
+        start = time.perf_counter()
         try:
-            if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, params=data, timeout=timeout)
-            elif method.upper() == 'PUT':
-                response = requests.put(url, headers=headers, json=data, timeout=timeout)
-            elif method.upper() == 'DELETE':
-                response = requests.delete(url, headers=headers, timeout=timeout)
+            if hedge and method == 'GET':
+                response = self._send_hedged(url, headers, data, timeout, label)
             else:
-                response = requests.post(url, headers=headers, json=data, timeout=timeout)
-
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code in [401, 403] and retry_count == 0:
-                error_msg = self._parse_error_response(response)
-                if self._is_token_expired_error(error_msg):
-                    if self._try_refresh_token():
-                        return self._make_request(method, endpoint, data, timeout, retry_count + 1)
-                    else:
-                        raise TokenRefreshFailedError("Token refresh failed. Please update your token manually.")
-                raise APIError(f"API error ({response.status_code}): {error_msg}")
-            else:
-                error_msg = self._parse_error_response(response)
-                raise APIError(f"API error ({response.status_code}): {error_msg}")
-
+                response = self._send(method, url, headers, data, timeout)
         except requests.exceptions.RequestException as e:
+            self._record_exception(breaker, method, label, e, time.perf_counter() - start)
             if hasattr(e, 'response') and e.response is not None:
                 error_msg = self._parse_error_response(e.response)
                 raise APIError(f"Request failed: {error_msg}")
             raise APIError(f"Request failed: {str(e)}")
 
+        self._record_response(breaker, method, label, response, time.perf_counter() - start)
+
+        if response.status_code == 200:
+            return response.json()
+        elif response.status_code in [401, 403] and retry_count == 0:
+            error_msg = self._parse_error_response(response)
+            if self._is_token_expired_error(error_msg):
+                if self._try_refresh_token():
+                    metrics.auth_retries.inc(endpoint=label)
+                    return self._make_request(method, endpoint, data, timeout, retry_count + 1, hedge)
+                else:
+                    metrics.upstream_errors.inc(endpoint=label, error='token_refresh_failed')
+                    raise TokenRefreshFailedError("Token refresh failed. Please update your token manually.")
+            raise APIError(f"API error ({response.status_code}): {error_msg}")
+        else:
+            error_msg = self._parse_error_response(response)
+            raise APIError(f"API error ({response.status_code}): {error_msg}")
+
     def send_message(
         self,
         prompt,
@@ -148,18 +274,19 @@ class HashyAPIService:
             model_name = view_data['model']
             view_type = view_data.get('view_type', 'unknown')
 
-            if view_type == 'list':
-                enriched['active_page_context']['view_data'].update(
-                    self._get_list_summary(request_env, model_name, view_data)
-                )
-            elif view_type == 'form':
-                enriched['active_page_context']['view_data'].update(
-                    self._get_form_summary(request_env, model_name, view_data)
-                )
-            elif view_type == 'kanban':
-                enriched['active_page_context']['view_data'].update(
-                    self._get_kanban_summary(request_env, model_name, view_data)
-                )
+            with metrics.enrich_context_latency.time(view_type=view_type):
+                if view_type == 'list':
+                    enriched['active_page_context']['view_data'].update(
+                        self._get_list_summary(request_env, model_name, view_data)
+                    )
+                elif view_type == 'form':
+                    enriched['active_page_context']['view_data'].update(
+                        self._get_form_summary(request_env, model_name, view_data)
+                    )
+                elif view_type == 'kanban':
+                    enriched['active_page_context']['view_data'].update(
+                        self._get_kanban_summary(request_env, model_name, view_data)
+                    )
 
             return enriched
         except Exception:
@@ -279,7 +406,7 @@ class HashyAPIService:
         endpoint = "/session"
         params = {"employee_id": external_employee_id, "status": status}
 
-        response = self._make_request("GET", endpoint, params)
+        response = self._make_request("GET", endpoint, params, hedge=True)
         return response
 
     def authenticate(self, email, password):
@@ -316,14 +443,14 @@ class HashyAPIService:
     def get_session_detail(self, session_id):
         endpoint = f"/session/{session_id}"
 
-        response = self._make_request("GET", endpoint)
+        response = self._make_request("GET", endpoint, hedge=True)
         return response
 
     def get_message_history(self, session_id, page=1, limit=50):
         endpoint = "/message"
         params = {"session_id": session_id, "page": page, "limit": limit, "sort_by": "id", "order": "ASC"}
 
-        response = self._make_request("GET", endpoint, params)
+        response = self._make_request("GET", endpoint, params, hedge=True)
         return response
 
     def sync_ai_rules(self, rules_content):
@@ -335,7 +462,7 @@ class HashyAPIService:
 
     def get_knowledge_documents(self):
         endpoint = "/ai/knowledge/documents"
-        response = self._make_request("GET", endpoint)
+        response = self._make_request("GET", endpoint, hedge=True)
         return response
 
     def create_knowledge_text(self, title, content, document_type='text', metadata=None):
@@ -363,28 +490,36 @@ class HashyAPIService:
         if metadata:
             data['metadata'] = json.dumps(metadata)
 
-        try:
-            response = requests.post(url, headers=headers, files=files, data=data, timeout=300)
+        timeout = self._timeout_for(endpoint)
+        label = metrics.endpoint_label(endpoint)
+        breaker = self._acquire_breaker(label)
+        metrics.upstream_payload.observe(len(file_content or b''), endpoint=label, direction='request')
 
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code in [401, 403]:
-                if self._try_refresh_token():
-                    headers["Authorization"] = f"Bearer {self.token}"
-                    response = requests.post(url, headers=headers, files=files, data=data, timeout=300)
-                    if response.status_code == 200:
-                        return response.json()
-                raise TokenRefreshFailedError("Token refresh failed")
-            else:
-                error_msg = self._parse_error_response(response)
-                raise APIError(f"API error ({response.status_code}): {error_msg}")
+        start = time.perf_counter()
+        try:
+            response = requests.post(url, headers=headers, files=files, data=data, timeout=timeout)
 
+            if response.status_code in [401, 403] and self._try_refresh_token():
+                metrics.auth_retries.inc(endpoint=label)
+                headers["Authorization"] = f"Bearer {self.token}"
+                response = requests.post(url, headers=headers, files=files, data=data, timeout=timeout)
         except requests.exceptions.RequestException as e:
+            self._record_exception(breaker, 'POST', label, e, time.perf_counter() - start)
             if hasattr(e, 'response') and e.response is not None:
                 error_msg = self._parse_error_response(e.response)
                 raise APIError(f"Request failed: {error_msg}")
             raise APIError(f"Request failed: {str(e)}")
 
+        self._record_response(breaker, 'POST', label, response, time.perf_counter() - start)
+
+        if response.status_code == 200:
+            return response.json()
+        elif response.status_code in [401, 403]:
+            raise TokenRefreshFailedError("Token refresh failed")
+
+        error_msg = self._parse_error_response(response)
+        raise APIError(f"API error ({response.status_code}): {error_msg}")
+
     def delete_knowledge_document(self, document_id):
         endpoint = f"/ai/knowledge/documents/{document_id}"
         response = self._make_request("DELETE", endpoint)
@@ -397,3 +532,9 @@ class APIError(Exception):
 
 class TokenRefreshFailedError(APIError):
     pass
+
+
+class CircuitOpenError(APIError):
+    def __init__(self, message, retry_after=0):
+        super().__init__(message)
+        self.retry_after = retry_after
@@ -0,0 +1,212 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+N_BUCKETS = 1 << 18
+CHUNK_WORDS = 200
+CHUNK_OVERLAP = 40
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_ARRAYS = ('term_ptr', 'post_chunk', 'post_tf', 'chunk_len', 'chunk_doc', 'chunk_offsets')
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def normalize_question(text):
+    return ' '.join(tokenize(text))
+
+
+def bucket(token):
+    return zlib.crc32(token.encode('utf-8')) & (N_BUCKETS - 1)
+
+
+def chunk_text(text, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    words = (text or '').split()
+    if not words:
+        return []
+    if len(words) <= size:
+        return [' '.join(words)]
+
+    step = size - overlap
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(' '.join(words[start : start + size]))
+        if start + size >= len(words):
+            break
+    return chunks
+
+
+class KnowledgeIndex:
+    def __init__(self, path, arrays, meta):
+        self.path = path
+        self.meta = meta
+        self.term_ptr = arrays['term_ptr']
+        self.post_chunk = arrays['post_chunk']
+        self.post_tf = arrays['post_tf']
+        self.chunk_len = arrays['chunk_len']
+        self.chunk_doc = arrays['chunk_doc']
+        self.chunk_offsets = arrays['chunk_offsets']
+        self.texts = np.memmap(os.path.join(path, 'chunks.bin'), dtype=np.uint8, mode='r') if meta['n_chunks'] else None
+        self.qa = meta.get('qa', {})
+
+    @classmethod
+    def build(cls, root, documents):
+        """Build a new index version under ``root`` from ``documents`` and make it current.
+
+        Each document is a dict with ``id``, ``title``, ``content`` and, for Q&A documents, ``answer``.
+        """
+        postings = []
+        chunk_len = []
+        chunk_doc = []
+        offsets = [0]
+        qa = {}
+
+        version = f"v{time.time_ns()}"
+        path = os.path.join(root, version)
+        os.makedirs(path, exist_ok=True)
+
+        with open(os.path.join(path, 'chunks.bin'), 'wb') as blob:
+            for doc in documents:
+                title = doc.get('title') or ''
+                if doc.get('answer'):
+                    for question in (doc.get('content'), title):
+                        key = normalize_question(question)
+                        if key:
+                            qa.setdefault(key, {'id': doc['id'], 'answer': doc['answer']})
+
+                body = doc.get('content') or ''
+                if doc.get('answer'):
+                    body = f"{body}\n{doc['answer']}"
+
+                for chunk in chunk_text(f"{title}\n{body}"):
+                    chunk_id = len(chunk_len)
+                    tokens = tokenize(chunk)
+                    for token_bucket, tf in Counter(bucket(token) for token in tokens).items():
+                        postings.append((token_bucket, chunk_id, tf))
+                    chunk_len.append(len(tokens))
+                    chunk_doc.append(doc['id'])
+
+                    encoded = chunk.encode('utf-8')
+                    blob.write(encoded)
+                    offsets.append(offsets[-1] + len(encoded))
+
+        if postings:
+            data = np.array(postings, dtype=np.int64)
+            data = data[np.argsort(data[:, 0], kind='stable')]
+            buckets, post_chunk, post_tf = data[:, 0], data[:, 1], data[:, 2]
+        else:
+            buckets = post_chunk = post_tf = np.zeros(0, dtype=np.int64)
+
+        arrays = {
+            'term_ptr': np.concatenate(([0], np.cumsum(np.bincount(buckets, minlength=N_BUCKETS)))).astype(np.int64),
+            'post_chunk': post_chunk.astype(np.int32),
+            'post_tf': post_tf.astype(np.float32),
+            'chunk_len': np.array(chunk_len, dtype=np.float32),
+            'chunk_doc': np.array(chunk_doc, dtype=np.int64),
+            'chunk_offsets': np.array(offsets, dtype=np.int64),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+
+        meta = {
+            'version': version,
+            'n_chunks': len(chunk_len),
+            'avgdl': float(np.mean(chunk_len)) if chunk_len else 0.0,
+            'qa': qa,
+        }
+        with open(os.path.join(path, 'meta.json'), 'w') as fp:
+            json.dump(meta, fp)
+
+        current_tmp = os.path.join(root, 'CURRENT.tmp')
+        with open(current_tmp, 'w') as fp:
+            fp.write(version)
+        os.replace(current_tmp, os.path.join(root, 'CURRENT'))
+
+        for name in os.listdir(root):
+            if name.startswith('v') and name != version:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+        return cls.load(root)
+
+    @classmethod
+    def load(cls, root):
+        """Return the current index under ``root``, or None if none was built yet."""
+        try:
+            return cls._load(root)
+        except FileNotFoundError:
+            # A concurrent build removed the version CURRENT pointed to; it replaced CURRENT first.
+            return cls._load(root)
+
+    @classmethod
+    def _load(cls, root):
+        try:
+            with open(os.path.join(root, 'CURRENT')) as fp:
+                version = fp.read().strip()
+        except FileNotFoundError:
+            return None
+
+        with _cache_lock:
+            cached = _cache.get(root)
+            if cached and cached.meta['version'] == version:
+                return cached
+
+            path = os.path.join(root, version)
+            with open(os.path.join(path, 'meta.json')) as fp:
+                meta = json.load(fp)
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in _ARRAYS}
+            index = cls(path, arrays, meta)
+            _cache[root] = index
+            return index
+
+    def chunk(self, chunk_id):
+        start, end = self.chunk_offsets[chunk_id], self.chunk_offsets[chunk_id + 1]
+        return bytes(self.texts[start:end]).decode('utf-8')
+
+    def search(self, query, limit=5):
+        n_chunks = self.meta['n_chunks']
+        query_buckets = sorted({bucket(token) for token in tokenize(query)})
+        if not n_chunks or not query_buckets:
+            return []
+
+        scores = np.zeros(n_chunks, dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.chunk_len / (self.meta['avgdl'] or 1.0))
+
+        for query_bucket in query_buckets:
+            start, end = self.term_ptr[query_bucket], self.term_ptr[query_bucket + 1]
+            df = end - start
+            if not df:
+                continue
+            idf = np.log(1 + (n_chunks - df + 0.5) / (df + 0.5))
+            chunks = self.post_chunk[start:end]
+            tf = self.post_tf[start:end]
+            scores[chunks] += idf * tf * (BM25_K1 + 1) / (tf + norm[chunks])
+
+        candidates = np.flatnonzero(scores)
+        if not len(candidates):
+            return []
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        return [
+            {'id': int(self.chunk_doc[chunk_id]), 'score': float(scores[chunk_id]), 'text': self.chunk(chunk_id)}
+            for chunk_id in candidates
+        ]
+
+    def answer(self, question):
+        return self.qa.get(normalize_question(question))
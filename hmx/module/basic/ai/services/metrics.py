@@ -0,0 +1,222 @@
+import bisect
+import functools
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, math.inf)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, math.inf)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_ID_SEGMENT_RE = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_label(endpoint):
+    return _ID_SEGMENT_RE.sub('/{id}', endpoint.split('?', 1)[0])
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_sample(self, key, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.label_names, key, [('le', _format_value(bound))])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.label_names, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labels, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+upstream_latency = registry.histogram(
+    'hashy_upstream_request_duration_seconds',
+    'Latency of Hashy API calls by endpoint, method and HTTP status',
+    labels=('endpoint', 'method', 'status'),
+)
+upstream_payload = registry.histogram(
+    'hashy_upstream_payload_bytes',
+    'Size of Hashy API request and response bodies',
+    labels=('endpoint', 'direction'),
+    buckets=SIZE_BUCKETS,
+)
+upstream_errors = registry.counter(
+    'hashy_upstream_errors_total',
+    'Failed Hashy API calls by endpoint and error class',
+    labels=('endpoint', 'error'),
+)
+auth_retries = registry.counter(
+    'hashy_auth_retries_total',
+    'Hashy API calls retried after a 401/403 token refresh',
+    labels=('endpoint',),
+)
+token_refreshes = registry.counter(
+    'hashy_token_refreshes_total',
+    'Hashy token refresh attempts by result',
+    labels=('result',),
+)
+hedged_requests = registry.counter(
+    'hashy_hedged_requests_total',
+    'Hedged GET requests sent to the Hashy API',
+    labels=('endpoint',),
+)
+circuit_state = registry.gauge(
+    'hashy_circuit_open',
+    'Whether the Hashy circuit breaker is open (1), half open (0.5) or closed (0)',
+    labels=('base_url',),
+)
+enrich_context_latency = registry.histogram(
+    'hashy_enrich_context_duration_seconds',
+    'Time spent enriching chat context before calling Hashy',
+    labels=('view_type',),
+)
+route_latency = registry.histogram(
+    'hashy_route_duration_seconds',
+    'Latency of ai/ API routes by route and response status',
+    labels=('route', 'status'),
+)
+chat_rejections = registry.counter(
+    'hashy_chat_rejected_total',
+    'Chat requests rejected by admission control',
+    labels=('reason',),
+)
+
+
+def instrument_route(route):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                result = func(*args, **kwargs)
+                status = result[0] if isinstance(result, tuple) else getattr(result, 'status_code', 200)
+                return result
+            finally:
+                route_latency.observe(time.perf_counter() - start, route=route, status=status)
+
+        return wrapper
+
+    return decorator
@@ -83,6 +83,9 @@ VueComponent.push({
 
       const togglePanel = () => {
         showPanel.value = !showPanel.value;
+        if (showPanel.value) {
+          window.HashyAssetLoader.load().catch(() => {});
+        }
       };
 
       const closePanel = () => {
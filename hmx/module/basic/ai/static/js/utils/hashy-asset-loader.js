@@ -0,0 +1,89 @@
+const hashyAssetLoader = {
+  manifestUrl: '/hmx_api/ai/assets/manifest',
+  bundleName: 'hashy-libs',
+
+  state: Vue.reactive({
+    ready: false,
+    loading: false,
+    error: null,
+  }),
+
+  _promise: null,
+
+  _loadScript: function (url) {
+    return new Promise(function (resolve, reject) {
+      var script = document.createElement('script');
+      script.src = url;
+      script.async = false;
+      script.onload = resolve;
+      script.onerror = function () {
+        reject(new Error('Failed to load ' + url));
+      };
+      document.head.appendChild(script);
+    });
+  },
+
+  _loadStyle: function (url) {
+    return new Promise(function (resolve, reject) {
+      var link = document.createElement('link');
+      link.rel = 'stylesheet';
+      link.href = url;
+      link.onload = resolve;
+      link.onerror = function () {
+        reject(new Error('Failed to load ' + url));
+      };
+      document.head.appendChild(link);
+    });
+  },
+
+  load: function () {
+    var self = this;
+
+    if (self.state.ready) {
+      return Promise.resolve();
+    }
+    if (self._promise) {
+      return self._promise;
+    }
+
+    self.state.loading = true;
+    self.state.error = null;
+
+    self._promise = fetch(self.manifestUrl, { credentials: 'same-origin' })
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error('Failed to load asset manifest: HTTP ' + response.status);
+        }
+        return response.json();
+      })
+      .then(function (manifest) {
+        var bundle = manifest.bundles[self.bundleName] || {};
+        var styles = (bundle.css || []).map(function (url) {
+          return self._loadStyle(url);
+        });
+        var scripts = (bundle.js || []).map(function (url) {
+          return self._loadScript(url);
+        });
+        return Promise.all(styles.concat(scripts));
+      })
+      .then(function () {
+        self.state.ready = true;
+        self.state.loading = false;
+      })
+      .catch(function (error) {
+        console.error('Hashy asset loading error:', error);
+        self.state.loading = false;
+        self.state.error = error.message;
+        self._promise = null;
+        throw error;
+      });
+
+    return self._promise;
+  },
+
+  isReady: function () {
+    return this.state.ready;
+  },
+};
+
+window.HashyAssetLoader = hashyAssetLoader;
@@ -31,11 +31,27 @@ const hashyMarkdownUtils = {
     }
   },
 
+  escapeHtml: function (text) {
+    return text
+      .replace(/&/g, '&amp;')
+      .replace(/</g, '&lt;')
+      .replace(/>/g, '&gt;')
+      .replace(/"/g, '&quot;')
+      .replace(/'/g, '&#039;');
+  },
+
   renderMarkdown: function (markdown) {
     if (!markdown || typeof markdown !== 'string') {
       return '';
     }
 
+    // marked, DOMPurify and highlight.js are loaded lazily. Reading the reactive ready flag makes
+    // computed renderers run again once the bundle has arrived.
+    if (!window.HashyAssetLoader.state.ready) {
+      window.HashyAssetLoader.load().catch(function () {});
+      return this.escapeHtml(markdown).replace(/\n/g, '<br>');
+    }
+
     this.configureMarked();
 
     try {
@@ -93,12 +109,7 @@ const hashyMarkdownUtils = {
       return cleanHtml;
     } catch (error) {
       console.error('Markdown rendering error:', error);
-      return markdown
-        .replace(/&/g, '&amp;')
-        .replace(/</g, '&lt;')
-        .replace(/>/g, '&gt;')
-        .replace(/"/g, '&quot;')
-        .replace(/'/g, '&#039;');
+      return this.escapeHtml(markdown);
     }
   },
 
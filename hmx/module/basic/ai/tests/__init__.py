@@ -1 +1,12 @@
-from . import test_ai_agent_config_crud, test_ai_knowledge_crud, test_ai_message_crud, test_ai_session_crud
+from . import (
+    test_ai_agent_config_crud,
+    test_ai_knowledge_crud,
+    test_ai_message_crud,
+    test_ai_outbox,
+    test_ai_session_crud,
+    test_base_report,
+    test_hashy_bench,
+    test_hashy_circuit_breaker,
+    test_hashy_concurrency,
+    test_hashy_metrics,
+)
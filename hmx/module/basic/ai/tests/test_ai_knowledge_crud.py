@@ -1,3 +1,9 @@
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.test import override_settings
+
 from hmx.tests.common import SingleTransactionCase
 
 
@@ -7,6 +13,15 @@ class TestAIKnowledgeCRUD(SingleTransactionCase):
         super().setUpClass()
         cls.env = cls.env(context={'no_track': 1})
 
+    def setUp(self):
+        super().setUp()
+        # Local index tests build into a throwaway directory, never the configured index root.
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir, ignore_errors=True)
+        index_settings = override_settings(HASHY_KNOWLEDGE_INDEX_DIR=index_dir)
+        index_settings.enable()
+        self.addCleanup(index_settings.disable)
+
     def test_create_knowledge_text(self):
         knowledge = self.env['aiknowledge'].create(
             {
@@ -256,3 +271,115 @@ class TestAIKnowledgeCRUD(SingleTransactionCase):
         )
 
         self.assertEqual(knowledge.answer, '')
+
+    def test_search_fulltext(self):
+        title_match = self.env['aiknowledge'].create(
+            {
+                'name': 'Warehouse Transfer',
+                'title': 'Warehouse transfer procedure',
+                'content': 'Steps for moving stock between locations',
+                'document_type': 'text',
+                'status': 'active',
+            }
+        )
+        content_match = self.env['aiknowledge'].create(
+            {
+                'name': 'Stock Count',
+                'title': 'Stock count',
+                'content': 'Every warehouse transfer must be approved before the stock count',
+                'document_type': 'text',
+                'status': 'active',
+            }
+        )
+
+        results = self.env['aiknowledge'].search_fulltext('warehouse transfer')
+        result_ids = [result['id'] for result in results]
+
+        self.assertIn(title_match.id, result_ids)
+        self.assertIn(content_match.id, result_ids)
+        self.assertLess(result_ids.index(title_match.id), result_ids.index(content_match.id))
+        self.assertEqual(self.env['aiknowledge'].search_fulltext('   '), [])
+
+    def test_local_index_retrieve_and_answer(self):
+        qa = self.env['aiknowledge'].create(
+            {
+                'name': 'Office Hours',
+                'title': 'Office hours',
+                'content': 'What are the office hours?',
+                'document_type': 'qa',
+                'metadata': {'answer': 'Monday to Friday, 9am to 5pm'},
+                'status': 'active',
+            }
+        )
+        text = self.env['aiknowledge'].create(
+            {
+                'name': 'Reimbursement',
+                'title': 'Travel reimbursement',
+                'content': 'Submit travel reimbursement claims with receipts within fourteen days.',
+                'document_type': 'text',
+                'status': 'active',
+            }
+        )
+
+        self.env['aiknowledge'].rebuild_local_index()
+
+        results = self.env['aiknowledge'].retrieve_local('reimbursement receipts', limit=3)
+        self.assertEqual(results[0]['id'], text.id)
+        self.assertIn('receipts', results[0]['text'])
+
+        answer = self.env['aiknowledge'].answer_locally('what are the OFFICE hours')
+        self.assertEqual(answer, qa.answer)
+        self.assertIsNone(self.env['aiknowledge'].answer_locally('what are the holidays'))
+
+    def test_local_index_skips_entries_changed_since_build(self):
+        qa = self.env['aiknowledge'].create(
+            {
+                'name': 'Parking',
+                'title': 'Parking',
+                'content': 'Where can I park?',
+                'document_type': 'qa',
+                'metadata': {'answer': 'Level B2'},
+                'status': 'active',
+            }
+        )
+        text = self.env['aiknowledge'].create(
+            {
+                'name': 'Badges',
+                'title': 'Visitor badges',
+                'content': 'Visitor badges are handed out at the front desk.',
+                'document_type': 'text',
+                'status': 'active',
+            }
+        )
+        self.env['aiknowledge'].rebuild_local_index()
+
+        qa.write({'metadata': {'answer': 'Level B3'}})
+        self.assertEqual(self.env['aiknowledge'].answer_locally('where can i park'), 'Level B3')
+
+        qa.write({'status': 'archived'})
+        text.unlink()
+        self.assertIsNone(self.env['aiknowledge'].answer_locally('where can i park'))
+        self.assertEqual(self.env['aiknowledge'].retrieve_local('visitor badges'), [])
+
+    def test_local_index_load_survives_concurrent_rebuild(self):
+        from ..services.knowledge_index import KnowledgeIndex
+
+        root = self.env['aiknowledge']._local_index_root()
+        KnowledgeIndex.build(root, [{'id': 1, 'title': 'First', 'content': 'first build'}])
+
+        real_load = KnowledgeIndex._load
+        calls = []
+
+        def load_then_rebuild(root):
+            calls.append(root)
+            if len(calls) == 1:
+                # The version read from CURRENT disappears before its files are opened.
+                KnowledgeIndex.build(root, [{'id': 2, 'title': 'Second', 'content': 'second build'}])
+                raise FileNotFoundError(root)
+            return real_load(root)
+
+        with patch.object(KnowledgeIndex, '_load', side_effect=load_then_rebuild):
+            index = KnowledgeIndex.load(root)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(index.search('second')[0]['id'], 2)
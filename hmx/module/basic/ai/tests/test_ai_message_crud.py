@@ -185,3 +185,20 @@ class TestAIMessageCRUD(SingleTransactionCase):
 
         deleted_messages = self.env['aimessage'].search([('id', 'in', [message1_id, message2_id])])
         self.assertEqual(len(deleted_messages), 0)
+
+    def test_search_fulltext(self):
+        message = self.env['aimessage'].create(
+            {
+                'name': 'Invoice Question',
+                'text': 'How do I reconcile overdue invoices with partial payments?',
+                'message_type': 'user',
+                'session_id': self.session.id,
+            }
+        )
+
+        results = self.env['aimessage'].search_fulltext('overdue invoices', user_id=self.session.user_id.id)
+        self.assertIn(message.id, [result['id'] for result in results])
+        self.assertEqual(results[0]['session_id'], self.session.id)
+
+        other_user_results = self.env['aimessage'].search_fulltext('overdue invoices', user_id=0)
+        self.assertEqual(other_user_results, [])
@@ -0,0 +1,92 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.utils import timezone
+
+from hmx.tests.common import SingleTransactionCase
+
+
+class TestAIOutbox(SingleTransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context={'no_track': 1})
+
+        cls.config = cls.env['aiagentconfig'].create(
+            {
+                'name': 'Outbox Config',
+                'email': 'outbox@example.com',
+                'password': 'outboxpass',
+            }
+        )
+
+    def test_write_rules_enqueues_sync(self):
+        self.config.write({'rules': 'Always answer in English'})
+        self.config.write({'rules': 'Always answer in Indonesian'})
+
+        entries = self.env['aioutbox'].search(
+            [('dedup_key', '=', f'sync_rules:{self.config.id}'), ('state', '=', 'pending')]
+        )
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries.operation, 'sync_rules')
+        self.assertEqual(entries.config_id.id, self.config.id)
+
+    def test_unlink_knowledge_enqueues_delete(self):
+        self.config.write({'use_config': True})
+        knowledge = self.env['aiknowledge'].create(
+            {
+                'name': 'Remote Document',
+                'title': 'Remote Document',
+                'content': 'Synced from Hashy',
+                'document_type': 'text',
+                'external_id': 4242,
+            }
+        )
+
+        knowledge.unlink()
+
+        entry = self.env['aioutbox'].search([('dedup_key', '=', 'delete_document:4242')])
+        self.assertEqual(len(entry), 1)
+        self.assertEqual(entry.operation, 'delete_document')
+        self.assertEqual(entry.state, 'pending')
+
+    def test_schedule_retry_backoff(self):
+        entry = self.env['aioutbox'].enqueue('delete_document', self.config, payload={'external_id': 7})
+
+        before = timezone.now()
+        entry._schedule_retry(Exception('Hashy unavailable'))
+        self.assertEqual(entry.attempts, 1)
+        self.assertEqual(entry.state, 'pending')
+        self.assertEqual(entry.last_error, 'Hashy unavailable')
+        self.assertGreaterEqual(entry.next_attempt_at, before + timedelta(seconds=entry.BACKOFF_BASE_SECONDS))
+
+        entry.write({'attempts': entry.MAX_ATTEMPTS - 1})
+        entry._schedule_retry(Exception('Hashy unavailable'))
+        self.assertEqual(entry.state, 'failed')
+
+    def test_dispatch_passes_refresh_token_and_stores_refreshed_one(self):
+        self.config.write({'token': 'expired-token', 'refreshtoken': 'refresh-token'})
+        entry = self.env['aioutbox'].enqueue('delete_document', self.config, payload={'external_id': 9})
+        calls = []
+
+        def call_remote(snapshot, method, args):
+            calls.append((snapshot.refreshtoken, method, args))
+            snapshot.token, snapshot.refreshtoken = 'fresh-token', 'fresh-refresh-token'
+            snapshot.refreshed = {'status': True}
+            return {'status': True}
+
+        with patch.object(type(entry), '_call_remote', side_effect=call_remote):
+            self.env['aioutbox'].dispatch(auto_commit=False)
+
+        self.assertIn(('refresh-token', 'delete_knowledge_document', (9,)), calls)
+        self.assertEqual(entry.state, 'done')
+        self.assertEqual((self.config.token, self.config.refreshtoken), ('fresh-token', 'fresh-refresh-token'))
+
+    def test_claimed_entries_are_not_reused_by_enqueue(self):
+        entry = self.env['aioutbox'].enqueue('sync_rules', self.config, dedup_key='claim-test')
+        entry.write({'state': 'sending'})
+
+        queued = self.env['aioutbox'].enqueue('sync_rules', self.config, dedup_key='claim-test')
+
+        self.assertNotEqual(queued, entry)
+        self.assertEqual(queued.state, 'pending')
@@ -0,0 +1,107 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.utils import timezone
+
+from hmx.tests.common import SingleTransactionCase
+
+from ..models import base_report
+from ..models.base_report import clear_template_cache
+from ..reports import report_etag
+
+
+class TestBaseReportTemplateCache(SingleTransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context={'no_track': 1})
+        clear_template_cache()
+
+    def test_compiled_template_is_cached_per_version(self):
+        report = self.env['basereport'].create(
+            {
+                'name': 'Cached Template',
+                'report_type': 'pdf',
+                'is_template': True,
+                'template_html': '<p>{{ name }}</p>',
+            }
+        )
+
+        compiled = report.get_compiled_template()
+        self.assertIs(report.get_compiled_template(), compiled)
+        self.assertEqual(report.render_template_html({'name': 'Hashy'}), '<p>Hashy</p>')
+
+        report.write({'template_html': '<h1>{{ name }}</h1>'})
+        self.assertIsNot(report.get_compiled_template(), compiled)
+        self.assertEqual(report.render_template_html({'name': 'Hashy'}), '<h1>Hashy</h1>')
+
+    def test_xlsx_template_json_is_parsed_once(self):
+        report = self.env['basereport'].create(
+            {
+                'name': 'Cached Sheet',
+                'report_type': 'xlsx',
+                'is_template': True,
+                'template_json': '{"sheets": []}',
+            }
+        )
+
+        with mock.patch.object(base_report.json, 'loads', wraps=json.loads) as loads:
+            parsed = report.get_template_json()
+            parsed['sheets'].append('changed by caller')
+            self.assertEqual(report.get_template_json(), {'sheets': []})
+        self.assertEqual(loads.call_count, 1)
+
+    def test_paper_format_rename_changes_report_etag(self):
+        PaperFormat = self.env['basereport']._meta.get_field('paper_format').related_model
+        paper_format = self.env[PaperFormat._meta.model_name].search([], limit=1)
+        if not paper_format:
+            self.skipTest("No paper format available")
+        report = self.env['basereport'].create(
+            {'name': 'ETag Report', 'report_type': 'pdf', 'template_html': '<p/>', 'paper_format': paper_format.id}
+        )
+
+        etag = report_etag(report)
+        paper_format.write({'name': f'{paper_format.name} (renamed)'})
+        report.invalidate_cache()
+        self.assertNotEqual(report_etag(report), etag)
+
+
+class TestCleanupHashyReports(SingleTransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context={'no_track': 1})
+
+    def _create_reports(self, count, age_days, is_hashy=True):
+        reports = self.env['basereport'].create(
+            [{'name': f'Hashy {i}', 'report_type': 'pdf', 'is_hashy': is_hashy} for i in range(count)]
+        )
+        self.env.cr.execute(
+            f"UPDATE {reports._table} SET created_at = %s WHERE id = ANY(%s)",
+            (timezone.now() - timedelta(days=age_days), reports.ids),
+        )
+        return reports
+
+    def test_cleanup_deletes_expired_reports_in_batches(self):
+        expired = self._create_reports(5, age_days=10)
+        recent = self._create_reports(2, age_days=1)
+        regular = self._create_reports(2, age_days=10, is_hashy=False)
+        progress = []
+
+        self.env['basereport'].cleanup_hashy_reports(
+            days=3, batch_size=2, log=lambda **kwargs: progress.append(kwargs['progress'])
+        )
+
+        self.assertFalse(self.env['basereport'].search([('id', 'in', expired.ids)]))
+        self.assertEqual(len(self.env['basereport'].search([('id', 'in', recent.ids + regular.ids)])), 4)
+        self.assertEqual(progress[-1], 100)
+        self.assertGreaterEqual(len(progress), 3)
+
+    def test_cleanup_stops_after_max_batches_oldest_ids_first(self):
+        expired = self._create_reports(5, age_days=10)
+
+        self.env['basereport'].cleanup_hashy_reports(days=3, batch_size=2, max_batches=1)
+
+        remaining = self.env['basereport'].search([('id', 'in', expired.ids)])
+        self.assertEqual(sorted(remaining.ids), sorted(expired.ids)[2:])
@@ -0,0 +1,49 @@
+from hmx.tests.common import SingleTransactionCase, tagged
+
+from ..bench import FakeHashyServer, format_report, run_chat_suite
+from ..services import APIError, HashyAPIService
+
+
+@tagged('-standard', 'bench')
+class TestHashyBench(SingleTransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context={'no_track': 1})
+
+        cls.config = cls.env['aiagentconfig'].create(
+            {
+                'name': 'Bench Config',
+                'email': 'bench@example.com',
+                'password': 'benchpass',
+                'use_config': True,
+            }
+        )
+        cls.env.user.sudo().write({'phone': '+6281234567890'})
+
+    def test_fake_server_error_rate_and_latency(self):
+        with FakeHashyServer(latency=0, error_rate=1.0, seed=1) as server:
+            self.config.write({'base_url': server.url, 'token': 'fake-token'})
+            service = HashyAPIService(self.config)
+            with self.assertRaises(APIError):
+                service.sync_ai_rules('rules')
+            self.assertEqual(server.requests['PUT /odoo-service/my-ai-rules'], 1)
+
+        with FakeHashyServer(latency=0, stream_chunks=4) as server:
+            self.config.write({'base_url': server.url})
+            response = HashyAPIService(self.config).send_message('hello', phone_number='+6281234567890')
+            self.assertEqual(response['data']['message'], 'Echo: hello')
+
+    def test_chat_suite_reports_latency_and_queries(self):
+        results, upstream = run_chat_suite(
+            self.env, self.env.user.id, requests=5, concurrency=1, sync_iterations=1, latency=0.01
+        )
+
+        summaries = {result.name: result.summary() for result in results}
+        self.assertEqual(summaries['POST /chat']['requests'], 5)
+        self.assertEqual(summaries['POST /chat']['statuses'], {200: 5})
+        self.assertGreater(summaries['POST /chat']['queries_per_request'], 0)
+        self.assertLessEqual(summaries['GET /sessions']['p50_ms'], summaries['GET /sessions']['p99_ms'])
+        self.assertEqual(summaries['knowledge sync']['statuses'], {'ok': 1})
+        self.assertIn('GET /ai/knowledge/documents', upstream)
+        self.assertIn('p95_ms', format_report(results))
@@ -0,0 +1,72 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from hmx.tests.common import SingleTransactionCase
+
+from ..services import hashy_api_service
+from ..services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from ..services.hashy_api_service import HashyAPIService
+
+
+class TestHashyCircuitBreaker(SingleTransactionCase):
+    def test_opens_on_failure_rate(self):
+        breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=4)
+
+        for _i in range(2):
+            breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow_request())
+        self.assertGreater(breaker.retry_after(), 0)
+
+    def test_half_open_allows_single_probe(self):
+        breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=1, open_seconds=30)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+
+        with patch('time.monotonic', return_value=breaker.opened_at + 31):
+            self.assertTrue(breaker.allow_request())
+            self.assertEqual(breaker.state, HALF_OPEN)
+            self.assertFalse(breaker.allow_request())
+
+            breaker.record_success()
+            self.assertEqual(breaker.state, CLOSED)
+            self.assertTrue(breaker.allow_request())
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=1, open_seconds=30)
+        breaker.record_failure()
+
+        with patch('time.monotonic', return_value=breaker.opened_at + 31):
+            self.assertTrue(breaker.allow_request())
+            breaker.record_failure()
+            self.assertEqual(breaker.state, OPEN)
+            self.assertFalse(breaker.allow_request())
+
+    def test_retry_after_covers_probe_in_flight(self):
+        breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=1, open_seconds=30, probe_seconds=20)
+        breaker.record_failure()
+
+        with patch('time.monotonic', return_value=breaker.opened_at + 31):
+            self.assertTrue(breaker.allow_request())
+            self.assertFalse(breaker.allow_request())
+            self.assertEqual(breaker.retry_after(), 21)
+
+        with patch('time.monotonic', return_value=breaker.opened_at + 80):
+            self.assertEqual(breaker.retry_after(), 1)
+
+
+class TestHashyHedging(SingleTransactionCase):
+    def test_saturated_pool_sends_inline_without_hedging(self):
+        service = HashyAPIService(MagicMock(base_url='http://hashy.test', token='token'))
+        with patch.object(hashy_api_service, '_hedge_slots', threading.BoundedSemaphore(1)) as slots, patch.object(
+            service, '_send', return_value='response'
+        ) as send, patch.object(hashy_api_service.metrics.hedged_requests, 'inc') as hedged:
+            slots.acquire()
+            self.assertEqual(service._send_hedged('http://hashy.test/x', {}, None, 1), 'response')
+
+        send.assert_called_once()
+        hedged.assert_not_called()
@@ -0,0 +1,82 @@
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import override_settings
+
+from hmx.tests.common import SingleTransactionCase
+
+from ..services.concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded
+
+
+class TestHashyConcurrencyLimiter(SingleTransactionCase):
+    def _limiter(self, **kwargs):
+        store = LocMemCache('hashy-concurrency-test', {})
+        store.clear()
+        return ConcurrencyLimiter('test', store=store, poll_interval=0.01, **kwargs)
+
+    def test_per_user_limit(self):
+        limiter = self._limiter(per_user=1, global_limit=10)
+
+        with limiter.acquire(1):
+            with self.assertRaises(ConcurrencyLimitExceeded):
+                with limiter.acquire(1):
+                    pass
+
+            with limiter.acquire(2):
+                self.assertEqual(limiter.in_flight(), 2)
+
+        self.assertEqual(limiter.in_flight(1), 0)
+        self.assertEqual(limiter.in_flight(), 0)
+
+    def test_global_limit_queue_timeout(self):
+        limiter = self._limiter(per_user=5, global_limit=1, queue_size=5, queue_timeout=0.05)
+
+        with limiter.acquire(1):
+            with self.assertRaises(ConcurrencyLimitExceeded) as ctx:
+                with limiter.acquire(2):
+                    pass
+            self.assertGreaterEqual(ctx.exception.retry_after, 1)
+            self.assertEqual(limiter.in_flight(2), 0)
+
+        with limiter.acquire(2):
+            self.assertEqual(limiter.in_flight(), 1)
+
+    def test_queue_full_rejects_immediately(self):
+        limiter = self._limiter(per_user=5, global_limit=1, queue_size=0, queue_timeout=10)
+
+        with limiter.acquire(1):
+            with self.assertRaises(ConcurrencyLimitExceeded):
+                with limiter.acquire(2):
+                    pass
+
+    def test_counters_stay_alive_under_traffic(self):
+        limiter = self._limiter(per_user=5, global_limit=10, slot_ttl=1)
+
+        with limiter.acquire(1):
+            time.sleep(0.6)
+            with limiter.acquire(2):
+                time.sleep(0.6)
+                # Past the TTL of the first acquire, but every acquire refreshes the counter.
+                self.assertEqual(limiter.in_flight(), 2)
+
+        self.assertEqual(limiter.in_flight(), 0)
+
+    def test_release_after_lapse_never_goes_negative(self):
+        limiter = self._limiter(per_user=5, global_limit=10)
+
+        with limiter.acquire(1):
+            limiter.store.delete(limiter._key('global'))
+            with limiter.acquire(2):
+                pass
+            self.assertEqual(limiter.in_flight(), 0)
+
+        self.assertEqual(limiter.in_flight(), 0)
+
+    def test_cache_backend_is_resolved_per_call(self):
+        limiter = ConcurrencyLimiter('test', cache_alias='default')
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'hashy-late'}}
+
+        with override_settings(CACHES=locmem):
+            self.assertIsInstance(limiter.store, LocMemCache)
+            with limiter.acquire(1):
+                self.assertEqual(limiter.in_flight(1), 1)
@@ -0,0 +1,46 @@
+from hmx.tests.common import SingleTransactionCase
+
+from ..services.metrics import SIZE_BUCKETS, MetricsRegistry, endpoint_label
+
+
+class TestHashyMetrics(SingleTransactionCase):
+    def test_endpoint_label_collapses_ids(self):
+        self.assertEqual(endpoint_label("/session/123"), "/session/{id}")
+        self.assertEqual(endpoint_label("/ai/knowledge/documents/42?force=1"), "/ai/knowledge/documents/{id}")
+        self.assertEqual(endpoint_label("/meta/odoo/chat"), "/meta/odoo/chat")
+
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram(
+            'test_seconds', 'Test latency', labels=('endpoint',), buckets=(0.1, 1, float('inf'))
+        )
+        histogram.observe(0.05, endpoint='/session')
+        histogram.observe(0.5, endpoint='/session')
+        histogram.observe(5, endpoint='/session')
+
+        output = registry.render()
+        self.assertIn('# TYPE test_seconds histogram', output)
+        self.assertIn('test_seconds_bucket{endpoint="/session",le="0.1"} 1', output)
+        self.assertIn('test_seconds_bucket{endpoint="/session",le="1"} 2', output)
+        self.assertIn('test_seconds_bucket{endpoint="/session",le="+Inf"} 3', output)
+        self.assertIn('test_seconds_count{endpoint="/session"} 3', output)
+        self.assertIn('test_seconds_sum{endpoint="/session"} 5.55', output)
+
+    def test_counter_and_registry_reuse(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('test_total', 'Test counter', labels=('error',))
+        self.assertIs(registry.counter('test_total', 'Test counter', labels=('error',)), counter)
+
+        counter.inc(error='timeout')
+        counter.inc(2, error='timeout')
+        counter.inc(error='http_5xx')
+
+        output = registry.render()
+        self.assertIn('test_total{error="timeout"} 3', output)
+        self.assertIn('test_total{error="http_5xx"} 1', output)
+
+    def test_size_buckets_cover_large_payloads(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram('test_bytes', 'Test payload', buckets=SIZE_BUCKETS)
+        histogram.observe(50 * 1024 * 1024)
+        self.assertIn('test_bytes_bucket{le="+Inf"} 1', registry.render())
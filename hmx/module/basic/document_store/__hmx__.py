@@ -0,0 +1,10 @@
+{
+    "name": "Document Store",
+    "category": "Hidden",
+    "version": "1.0",
+    "depends": ["base"],
+    "data": [
+        "data/base_cron_data.xml",
+        "security/base.model.access.csv",
+    ],
+}
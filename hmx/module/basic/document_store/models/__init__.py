@@ -0,0 +1 @@
+from . import document_store
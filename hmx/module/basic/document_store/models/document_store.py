@@ -0,0 +1,27 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from hmx import api
+
+from ..services import file_store
+
+
+class DocumentStore(models.Model):
+    """One row per maintenance run of the content-addressed document storage."""
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = _("Document Store Maintenance")
+
+    blobs_removed = models.IntegerField(_("Blobs Removed"), default=0)
+    bytes_freed = models.BigIntegerField(_("Bytes Freed"), default=0)
+    bytes_deduplicated = models.BigIntegerField(_("Bytes Deduplicated"), default=0)
+
+    @api.model
+    def cron_maintenance(self):
+        """Fold pre-existing duplicate documents into the blob store, then drop unreferenced blobs."""
+        storage = file_store.document_storage()
+        deduplicated = file_store.dedupe_existing(storage, prefix='documents')
+        removed, freed = file_store.collect_garbage(storage)
+        self.create({'blobs_removed': removed, 'bytes_freed': freed, 'bytes_deduplicated': deduplicated})
+        return True
@@ -0,0 +1,227 @@
+"""Content-addressed, deduplicated file storage for document uploads.
+
+Every upload is hashed with SHA-256 while it is spooled to disk and its bytes are kept once, as a
+blob under ``.blobs/<2 hex>/<sha256>``. The path handed back to the model (``documents/foo.pdf``)
+is a hard link to that blob, so it is a regular file that ``default_storage``, ``os.path`` and
+the web server resolve exactly as before, and paths stored before this backend existed keep
+working untouched.
+
+The blob's link count is its reference count: one for the blob itself plus one per stored path.
+Deleting a path drops a reference; models release the paths of unlinked records and replaced
+files with :func:`release_unreferenced`, which keeps paths another record still stores (e.g.
+after ``copy()``). :func:`collect_garbage` removes blobs nobody links to
+anymore and :func:`dedupe_existing` folds files uploaded before deduplication into the blob
+store; both run from a daily cron. On filesystems without hard links uploads are stored as plain
+copies.
+
+Because linked paths share one inode, stored files must never be rewritten in place; Django
+storages only ever create new names, so this holds for every FileField using this backend.
+"""
+
+import errno
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+
+_logger = logging.getLogger(__name__)
+
+BLOB_DIR = '.blobs'
+CHUNK_SIZE = 1024 * 1024
+# Unreferenced blobs and stale spool files younger than this are left alone, so an upload that
+# is between writing its blob and linking its path is never collected.
+GC_GRACE_SECONDS = 3600
+# Hard links unsupported (EPERM, EOPNOTSUPP), across devices (EXDEV) or too many per inode (EMLINK).
+NO_LINK_ERRNOS = {errno.EPERM, errno.EXDEV, errno.EMLINK, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def blob_path(self, digest):
+        return self.path(os.path.join(BLOB_DIR, digest[:2], digest))
+
+    def _spool(self, content):
+        """Copy ``content`` to a temp file next to the blobs, returning ``(sha256, temp path)``."""
+        blob_root = self.path(BLOB_DIR)
+        os.makedirs(blob_root, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=blob_root, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(CHUNK_SIZE) if hasattr(content, 'chunks') else [content.read()]:
+                    digest.update(chunk)
+                    fp.write(chunk)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return digest.hexdigest(), tmp_path
+
+    def _link_blob(self, tmp_path, digest):
+        """Make the blob for ``digest`` exist, reusing a stored one when the content is known."""
+        blob_path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        try:
+            os.link(tmp_path, blob_path)
+        except FileExistsError:
+            # Refresh the mtime so the collector's grace period covers the link made next.
+            os.utime(blob_path)
+        return blob_path
+
+    def _save(self, name, content):
+        digest, tmp_path = self._spool(content)
+        try:
+            while True:
+                try:
+                    blob_path = self._link_blob(tmp_path, digest)
+                    full_path = self.path(name)
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    os.link(blob_path, full_path)
+                    break
+                except FileExistsError:
+                    name = self.get_available_name(name)
+                except FileNotFoundError:
+                    # The blob was collected between the two links, store it again.
+                    continue
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+        except OSError as e:
+            if e.errno not in NO_LINK_ERRNOS:
+                raise
+            _logger.warning(f"[ContentAddressedStorage] Storing {name} as a copy, cannot hard link: {e}")
+            with open(tmp_path, 'rb') as fp:
+                return super()._save(name, File(fp))
+        finally:
+            os.unlink(tmp_path)
+        return str(name).replace('\\', '/')
+
+    def refcount(self, name):
+        """Number of stored paths sharing the content of ``name``."""
+        return max(1, os.stat(self.path(name)).st_nlink - 1)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def collect_garbage(storage, grace_seconds=GC_GRACE_SECONDS):
+    """Delete blobs no stored path links to anymore, returning ``(blobs removed, bytes freed)``."""
+    blob_root = storage.path(BLOB_DIR)
+    cutoff = time.time() - grace_seconds
+    removed = freed = 0
+    for dirpath, _dirnames, filenames in os.walk(blob_root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_nlink > 1 or stat.st_mtime > cutoff:
+                continue
+            os.unlink(path)
+            removed += 1
+            freed += stat.st_size
+    if removed:
+        _logger.info(f"[file_store] Collected {removed} unreferenced blobs, {freed} bytes")
+    return removed, freed
+
+
+def dedupe_existing(storage, prefix='documents'):
+    """Fold files stored without deduplication into the blob store, returning the bytes saved.
+
+    Each file is atomically replaced by a hard link to the blob with the same content, so its
+    path keeps resolving. Files already linked to a blob are skipped without being read.
+    """
+    saved = 0
+    for dirpath, _dirnames, filenames in os.walk(storage.path(prefix)):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                if os.stat(path).st_nlink > 1:
+                    continue
+                digest = file_digest(path)
+                blob_path = storage.blob_path(digest)
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                try:
+                    os.link(path, blob_path)
+                    continue
+                except FileExistsError:
+                    pass
+                tmp_path = f"{path}.dedupe-{os.getpid()}"
+                os.link(blob_path, tmp_path)
+                size = os.stat(path).st_size
+                os.replace(tmp_path, path)
+                saved += size
+            except OSError as e:
+                _logger.warning(f"[file_store] Could not deduplicate {path}: {e}")
+    if saved:
+        _logger.info(f"[file_store] Deduplicated {saved} bytes under {prefix}/")
+    return saved
+
+
+_document_storage = None
+
+
+def document_storage():
+    """Storage for document FileFields; a callable so migrations reference it by name."""
+    global _document_storage
+    if _document_storage is None:
+        _document_storage = ContentAddressedStorage()
+    return _document_storage
+
+
+def stored_names(records, field_name):
+    """Paths stored in the (possibly multi) FileField ``field_name`` of ``records``."""
+    names = set()
+    for record in records:
+        value = record[field_name]
+        for item in value if isinstance(value, (list, tuple)) else [value]:
+            name = getattr(item, 'name', item)
+            if name:
+                names.add(str(name))
+    return names
+
+
+def release_on_commit(names):
+    """Delete the stored paths ``names`` once the transaction commits, dropping their blob references.
+
+    Nothing is deleted if the transaction rolls back, so the records keep their files.
+    """
+    names = sorted(names)
+    if not names:
+        return
+
+    def release():
+        storage = document_storage()
+        for name in names:
+            try:
+                storage.delete(name)
+            except OSError as e:
+                _logger.warning(f"[file_store] Could not delete {name}: {e}")
+
+    transaction.on_commit(release)
+
+
+def release_unreferenced(model, field_name, names):
+    """Release the ``names`` no record of ``model`` stores in ``field_name`` anymore.
+
+    Call it after the write or unlink, so the records' own new values count as references.
+    """
+    names = set(names)
+    if not names:
+        return
+    leaves = [(field_name, 'like', name) for name in sorted(names)]
+    records = model.sudo().with_context(active_test=False).search(['|'] * (len(leaves) - 1) + leaves)
+    release_on_commit(names - stored_names(records, field_name))
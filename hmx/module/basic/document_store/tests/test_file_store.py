@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+
+from hmx.tests.common import SingleTransactionCase
+
+from ..services import file_store
+
+
+class TestFileStore(SingleTransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.storage = file_store.ContentAddressedStorage(location=self.location)
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.storage.save('documents/invoice.pdf', ContentFile(b'%PDF same bytes'))
+        second = self.storage.save('documents/invoice.pdf', ContentFile(b'%PDF same bytes'))
+        other = self.storage.save('documents/other.pdf', ContentFile(b'%PDF other bytes'))
+
+        self.assertNotEqual(first, second)
+        self.assertTrue(os.path.samefile(self.storage.path(first), self.storage.path(second)))
+        self.assertEqual(self.storage.refcount(first), 2)
+        self.assertEqual(self.storage.refcount(other), 1)
+        with self.storage.open(second) as fp:
+            self.assertEqual(fp.read(), b'%PDF same bytes')
+
+    def test_garbage_collection_keeps_referenced_blobs(self):
+        kept = self.storage.save('documents/kept.pdf', ContentFile(b'kept'))
+        dropped = self.storage.save('documents/dropped.pdf', ContentFile(b'dropped'))
+        self.storage.delete(dropped)
+
+        removed, _freed = file_store.collect_garbage(self.storage, grace_seconds=0)
+
+        self.assertEqual(removed, 1)
+        self.assertTrue(os.path.exists(self.storage.blob_path(file_store.file_digest(self.storage.path(kept)))))
+
+    def test_existing_duplicates_are_folded_in_place(self):
+        os.makedirs(self.storage.path('documents'))
+        for name in ('a.pdf', 'b.pdf'):
+            with open(self.storage.path(f'documents/{name}'), 'wb') as fp:
+                fp.write(b'legacy upload')
+
+        saved = file_store.dedupe_existing(self.storage)
+
+        self.assertEqual(saved, len(b'legacy upload'))
+        self.assertTrue(os.path.samefile(self.storage.path('documents/a.pdf'), self.storage.path('documents/b.pdf')))
+        with self.storage.open('documents/b.pdf') as fp:
+            self.assertEqual(fp.read(), b'legacy upload')
+
+    def test_released_paths_are_deleted_on_commit(self):
+        shared = self.storage.save('documents/shared.pdf', ContentFile(b'shared'))
+        copy = self.storage.save('documents/shared.pdf', ContentFile(b'shared'))
+        records = [{'attachment': [shared, copy]}, {'attachment': None}]
+        self.assertEqual(file_store.stored_names(records, 'attachment'), {shared, copy})
+
+        with mock.patch.object(file_store, 'document_storage', return_value=self.storage):
+            with mock.patch.object(file_store.transaction, 'on_commit') as on_commit:
+                file_store.release_on_commit({shared})
+                self.assertTrue(self.storage.exists(shared))
+                on_commit.call_args.args[0]()
+
+        self.assertFalse(self.storage.exists(shared))
+        self.assertEqual(self.storage.refcount(copy), 1)
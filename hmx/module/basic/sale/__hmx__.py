@@ -2,7 +2,7 @@
     "name": "Sale",
     "category": "Sale",
     "version": "1.0",
-    "depends": ["partners", "product", "onboarding", "approval_workflow", "core_forecast"],
+    "depends": ["partners", "product", "onboarding", "approval_workflow", "core_forecast", "document_store"],
     "data": [
         "data/sequence.xml",
         "data/base_decimal_accuracy_data.xml",
@@ -16,6 +16,7 @@
         "reports/sale_report_views.xml",
         "data/base_report_data.xml",
         "data/forecast_data.xml",
+        "data/sale_cron_data.xml",
     ],
     "assets": {
         "onboarding": ["onboarding/sale_onboarding.json"],
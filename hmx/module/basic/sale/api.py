@@ -1,4 +1,7 @@
-from ninja import Router
+from django.http import StreamingHttpResponse
+from ninja import File, Router
+from ninja.errors import HttpError
+from ninja.files import UploadedFile
 from hmx_api.registry import register_routers
 
 
@@ -12,6 +15,34 @@ def get_sale_index(request):
 def get_sale_check(request):
     return {"message": "Sale API check successful", "endpoint": "check"}
 
+@sale_router.get("/export") # will available in '/hmx_api/sale/export?ids=1,2&lines=true&gzip=true'
+def export_sale_csv(request, ids: str = None, lines: bool = False, fields: str = None, gzip: bool = False):
+    try:
+        id_list = [int(i) for i in ids.split(',') if i.strip()] if ids else None
+    except ValueError:
+        raise HttpError(400, "ids must be a comma separated list of integers")
+    fields = fields.split(',') if fields else None
+    Sale = request.env['sale']
+    try:
+        if id_list is None:
+            # Unfiltered exports never load the ids into Python.
+            chunks = Sale.export_all_csv_chunks(lines=lines, fields=fields, compress=gzip)
+        else:
+            chunks = Sale.search([('id', 'in', id_list)]).export_csv_chunks(lines=lines, fields=fields, compress=gzip)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    filename = ('sale_order_lines' if lines else 'sales') + ('.csv.gz' if gzip else '.csv')
+    response = StreamingHttpResponse(chunks, content_type='application/gzip' if gzip else 'text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@sale_router.post("/import") # will available in '/hmx_api/sale/import', multipart upload of a CSV/XLSX file
+def import_sale_file(request, file: UploadedFile = File(...)):
+    try:
+        return request.env['sale'].import_sales(file.file, file.name)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
 
 register_routers([
     ('sale/', sale_router)
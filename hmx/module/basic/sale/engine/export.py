@@ -0,0 +1,173 @@
+"""Flat CSV export of sale data through ``COPY (SELECT ...) TO STDOUT``.
+
+Each dataset maps a column label to a field path on its model. Paths that cross a foreign key
+(``('partner_id', 'name')``) become LEFT JOINs, so related names are resolved by PostgreSQL
+instead of per-row ORM lookups. Rows never pass through Python: the CSV bytes produced by the
+server are streamed in chunks, optionally gzip-compressed on the fly.
+"""
+
+import tempfile
+import zlib
+from contextlib import nullcontext
+
+from sale.engine import replica
+
+
+CHUNK_SIZE = 64 * 1024
+# psycopg2 cannot iterate a COPY, its output is spooled to disk past this size.
+SPOOL_SIZE = 8 * 1024 * 1024
+
+DATASETS = {
+    'sale': (
+        'sale',
+        {
+            'id': ('id',),
+            'name': ('name',),
+            'company': ('company', 'name'),
+            'partner': ('partner_id', 'name'),
+            'status': ('status',),
+            'quantity': ('quantity',),
+            'price': ('price',),
+            'subtotal': ('subtotal',),
+            'date': ('date',),
+            'created_at': ('created_at',),
+        },
+    ),
+    'saleorderline': (
+        'saleorderline',
+        {
+            'id': ('id',),
+            'sale': ('sale_id', 'name'),
+            'partner': ('sale_id', 'partner_id', 'name'),
+            'product': ('product_id', 'name'),
+            'name': ('name',),
+            'quantity': ('quantity',),
+            'price': ('price',),
+            'subtotal': ('subtotal',),
+            'created_at': ('created_at',),
+        },
+    ),
+}
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _id_array(ids):
+    return f"ARRAY[{','.join(str(int(record_id)) for record_id in ids)}]::integer[]"
+
+
+def build_select(env, dataset, ids=None, fields=None, filter_field='id', company_ids=None):
+    """Return the SELECT for ``dataset`` restricted to rows whose ``filter_field`` is in ``ids``.
+
+    ``filter_field`` holds a sale id: ``'id'`` for orders, ``'sale_id'`` selects the lines of
+    given orders. ``company_ids`` keeps only the orders of those companies, in a subselect, so
+    the order ids never have to be listed; ``ids=None`` without it exports every row.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown export dataset '{dataset}'")
+    model_name, columns = DATASETS[dataset]
+    fields = list(fields or columns)
+    unknown = [name for name in fields if name not in columns]
+    if unknown:
+        raise ValueError(f"Unknown export fields for {dataset}: {', '.join(unknown)}")
+
+    meta = env[model_name]._meta
+    joins = []
+    aliases = {(): 't0'}
+    select = []
+    for label in fields:
+        path = columns[label]
+        current_meta = meta
+        for depth, field_name in enumerate(path[:-1], 1):
+            field = current_meta.get_field(field_name)
+            prefix = path[:depth]
+            if prefix not in aliases:
+                alias = aliases[prefix] = f"t{len(aliases)}"
+                parent = aliases[path[: depth - 1]]
+                related_meta = field.related_model._meta
+                joins.append(
+                    f"LEFT JOIN {_quote(related_meta.db_table)} {alias} "
+                    f"ON {alias}.{_quote(related_meta.pk.column)} = {parent}.{_quote(field.column)}"
+                )
+            current_meta = field.related_model._meta
+        column = current_meta.get_field(path[-1]).column
+        select.append(f"{aliases[path[:-1]]}.{_quote(column)} AS {_quote(label)}")
+
+    query = f"SELECT {', '.join(select)} FROM {_quote(meta.db_table)} t0 {' '.join(joins)}"
+    filter_column = f"t0.{_quote(meta.get_field(filter_field).column)}"
+    where = []
+    if ids is not None:
+        where.append(f"{filter_column} = ANY({_id_array(ids)})")
+    if company_ids is not None:
+        sale_meta = env['sale']._meta
+        company_column = _quote(sale_meta.get_field('company').column)
+        where.append(
+            f"{filter_column} IN (SELECT {_quote(sale_meta.pk.column)} FROM {_quote(sale_meta.db_table)} "
+            f"WHERE {company_column} = ANY({_id_array(company_ids)}))"
+        )
+    if where:
+        query += f" WHERE {' AND '.join(where)}"
+    return query + f" ORDER BY t0.{_quote(meta.pk.column)}"
+
+
+def copy_chunks(query, chunk_size=CHUNK_SIZE, use_replica=True):
+    """Yield the CSV output of ``query``, header included, as byte chunks.
+
+    With ``use_replica`` the COPY is a reporting read that may be served by the replica.
+    """
+    sql = f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+    with replica.reporting() if use_replica else nullcontext(), replica.read_cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy'):
+            # psycopg 3 streams COPY output directly.
+            buffer = bytearray()
+            with raw.copy(sql) as copy:
+                for data in copy:
+                    buffer += data
+                    if len(buffer) >= chunk_size:
+                        yield bytes(buffer)
+                        buffer.clear()
+            if buffer:
+                yield bytes(buffer)
+            return
+
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+            raw.copy_expert(sql, spool)
+            spool.seek(0)
+            while True:
+                data = spool.read(chunk_size)
+                if not data:
+                    break
+                yield data
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(env, dataset, ids=None, fields=None, compress=False, filter_field='id', company_ids=None):
+    query = build_select(env, dataset, ids=ids, fields=fields, filter_field=filter_field, company_ids=company_ids)
+    # Ids were picked on the primary, where rows the replica has not replayed yet already exist.
+    chunks = copy_chunks(query, use_replica=ids is None)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_to_file(
+    env, fileobj, dataset, ids=None, fields=None, compress=False, filter_field='id', company_ids=None
+):
+    """Write the export to a binary file object and return the number of bytes written."""
+    written = 0
+    chunks = export_chunks(
+        env, dataset, ids=ids, fields=fields, compress=compress, filter_field=filter_field, company_ids=company_ids
+    )
+    for chunk in chunks:
+        fileobj.write(chunk)
+        written += len(chunk)
+    return written
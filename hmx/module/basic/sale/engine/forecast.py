@@ -0,0 +1,301 @@
+"""Sale forecasts from SQL pre-aggregated time series fitted with NumPy.
+
+The history is aggregated by PostgreSQL with ``date_trunc`` at the requested grain, so only one
+row per period leaves the database. All measures are fitted at once with one least-squares solve:
+``linear`` fits an intercept and a trend, ``seasonal`` adds one dummy per position in the season
+(7 for daily data, 52 for weekly, 12 for monthly, 4 for quarterly), which captures the weekday
+and seasonal patterns of the sample data. Fitted results are cached until a sale or line is
+written, using the same generation counter as the pivot cache.
+
+Configurations are restricted to their ``domain`` and to the current company, both translated
+into the aggregation's WHERE clause by :func:`domain_sql`.
+"""
+
+import ast
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from django.core.exceptions import FieldDoesNotExist
+
+from sale.engine import pivot_cache, replica
+
+
+GRAINS = ('day', 'week', 'month', 'quarter', 'year')
+SEASON_LENGTHS = {'day': 7, 'week': 52, 'month': 12, 'quarter': 4, 'year': None}
+OPERATORS = {'sum': 'sum', 'avg': 'avg', 'count': 'count', 'min': 'min', 'max': 'max'}
+DOMAIN_OPERATORS = {
+    '=': '=',
+    '!=': '<>',
+    '<': '<',
+    '<=': '<=',
+    '>': '>',
+    '>=': '>=',
+    '=like': 'LIKE',
+    '=ilike': 'ILIKE',
+    'like': 'LIKE',
+    'ilike': 'ILIKE',
+    'not like': 'NOT LIKE',
+    'not ilike': 'NOT ILIKE',
+}
+# Path to the company of a forecast model's rows, for models without a ``company`` field.
+COMPANY_PATHS = {'saleorderline': 'sale_id.company'}
+
+forecast_cache = pivot_cache.PivotCache(max_entries=64, max_bytes=8 * 1024 * 1024)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def period_start(value, grain):
+    value = _as_date(value)
+    if grain == 'day':
+        return value
+    if grain == 'week':
+        return value - timedelta(days=value.weekday())
+    if grain == 'month':
+        return value.replace(day=1)
+    if grain == 'quarter':
+        return value.replace(month=(value.month - 1) // 3 * 3 + 1, day=1)
+    return value.replace(month=1, day=1)
+
+
+def add_periods(value, grain, count):
+    if grain == 'day':
+        return value + timedelta(days=count)
+    if grain == 'week':
+        return value + timedelta(weeks=count)
+    months = {'month': 1, 'quarter': 3, 'year': 12}[grain] * count
+    month_index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def period_range(start, end, grain):
+    periods = []
+    current = period_start(start, grain)
+    while current <= end:
+        periods.append(current)
+        current = add_periods(current, grain, 1)
+    return periods
+
+
+def _leaf_sql(model, leaf):
+    name, operator, value = leaf
+    field_name, _dot, rest = name.partition('.')
+    field = model._meta.get_field(field_name)
+    column = f'"{field.column}"'
+    if rest:
+        if not field.many_to_one:
+            raise ValueError(f"Cannot follow '{field_name}' in a forecast domain, it is not a many2one")
+        related = field.related_model
+        sql, params = _leaf_sql(related, (rest, operator, value))
+        return f'{column} IN (SELECT "{related._meta.pk.column}" FROM {related._meta.db_table} WHERE {sql})', params
+
+    operator = operator.lower()
+    if operator in ('in', 'not in'):
+        values = list(value)
+        if not values:
+            return ('FALSE' if operator == 'in' else 'TRUE'), []
+        return (f'{column} = ANY(%s)' if operator == 'in' else f'NOT ({column} = ANY(%s))'), [values]
+    if operator not in DOMAIN_OPERATORS:
+        raise ValueError(f"Unsupported operator '{operator}' in forecast domain")
+    if value is None and operator in ('=', '!='):
+        return f"{column} IS {'' if operator == '=' else 'NOT '}NULL", []
+    if operator in ('like', 'ilike', 'not like', 'not ilike'):
+        value = f'%{value}%'
+    return f'{column} {DOMAIN_OPERATORS[operator]} %s', [value]
+
+
+def domain_sql(model, domain):
+    """Translate a domain on ``model`` into ``(sql, params)`` for a WHERE clause.
+
+    Supports the comparison, ``in`` and ``like`` operators, ``&``, ``|`` and ``!`` in prefix
+    notation, and many2one paths such as ``sale_id.company``.
+    """
+    terms = list(domain or [])
+
+    def parse(position):
+        term = terms[position]
+        if term == '!':
+            sql, params, position = parse(position + 1)
+            return f'NOT ({sql})', params, position
+        if term in ('&', '|'):
+            left, left_params, position = parse(position + 1)
+            right, right_params, position = parse(position)
+            return f"({left} {'AND' if term == '&' else 'OR'} {right})", left_params + right_params, position
+        sql, params = _leaf_sql(model, term)
+        return sql, params, position + 1
+
+    clauses, params, position = [], [], 0
+    while position < len(terms):
+        sql, leaf_params, position = parse(position)
+        clauses.append(sql)
+        params.extend(leaf_params)
+    return ' AND '.join(clauses) or 'TRUE', params
+
+
+def aggregate_series(cr, table, date_column, measures, grain, start, end, where='TRUE', where_params=()):
+    """Return ``(periods, values)``: every period between ``start`` and ``end`` and a
+    ``len(periods) x len(measures)`` array of aggregates, zero where a period has no rows.
+
+    ``measures`` is a list of ``(column, operator)`` pairs, ``where`` an extra SQL condition.
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"Unsupported time grain '{grain}'")
+    start, end = _as_date(start), _as_date(end)
+    select = ', '.join(f'{OPERATORS[operator]}("{column}")' for column, operator in measures)
+    cr.execute(
+        f"""
+        SELECT date_trunc(%s, "{date_column}")::date AS period, {select}
+        FROM {table}
+        WHERE "{date_column}" >= %s AND "{date_column}" < %s AND ({where})
+        GROUP BY 1
+        ORDER BY 1
+        """,
+        (grain, start, end + timedelta(days=1), *where_params),
+    )
+    rows = cr.fetchall()
+
+    periods = period_range(start, end, grain)
+    position = {period: index for index, period in enumerate(periods)}
+    values = np.zeros((len(periods), len(measures)))
+    for row in rows:
+        index = position.get(_as_date(row[0]))
+        if index is not None:
+            values[index] = [value or 0 for value in row[1:]]
+    return periods, values
+
+
+def season_offset(period, grain):
+    """Position of ``period`` within its season, so season columns follow the calendar."""
+    if grain == 'day':
+        return period.weekday()
+    if grain == 'week':
+        return period.isocalendar()[1] - 1
+    if grain == 'month':
+        return period.month - 1
+    if grain == 'quarter':
+        return (period.month - 1) // 3
+    return 0
+
+
+def design_matrix(t, season_length=None, offset=0):
+    """Intercept and trend columns, plus one-hot season columns (the first dropped) if seasonal."""
+    t = np.asarray(t, dtype=float)
+    columns = [np.ones_like(t), t]
+    if season_length:
+        season = (t.astype(int) + offset) % season_length
+        columns.extend((season == position).astype(float) for position in range(1, season_length))
+    return np.column_stack(columns)
+
+
+def fit_predict(values, periods_ahead, model_type='linear', season_length=None, offset=0):
+    """Fit every column of ``values`` at once and return ``(fitted, forecast)`` arrays.
+
+    The seasonal model needs two full seasons of history and falls back to linear otherwise.
+    """
+    n = len(values)
+    if not season_length or model_type != 'seasonal' or n < 2 * season_length:
+        season_length = None
+    if n < 2:
+        last = values[-1] if n else np.zeros(values.shape[1])
+        return values.copy(), np.tile(last, (periods_ahead, 1))
+
+    t = np.arange(n + periods_ahead)
+    X = design_matrix(t, season_length, offset)
+    coefficients, *_ = np.linalg.lstsq(X[:n], values, rcond=None)
+    predicted = X @ coefficients
+    return predicted[:n], predicted[n:]
+
+
+def forecast(
+    env,
+    table,
+    date_column,
+    measures,
+    grain,
+    start,
+    end,
+    periods_ahead,
+    model_type='linear',
+    where='TRUE',
+    where_params=(),
+):
+    """Forecast ``measures`` of ``table`` over the rows matching ``where`` and return a JSON ready dict.
+
+    Results are cached per arguments until a sale or sale line is written.
+    """
+    # Replica reads may lag and uncommitted writes are private, neither goes into the cache.
+    use_cache = not pivot_cache.has_pending_writes() and not replica.replica_serving()
+    current = pivot_cache.generation()
+    key = pivot_cache.make_key(
+        table, date_column, measures, grain, start, end, periods_ahead, model_type, where, where_params
+    )
+    cached = forecast_cache.get(key, current) if use_cache else None
+    if cached is not None:
+        return cached
+
+    with nullcontext() if use_cache else replica.reporting(), replica.read_cursor() as cursor:
+        periods, values = aggregate_series(cursor, table, date_column, measures, grain, start, end, where, where_params)
+    offset = season_offset(periods[0], grain) if periods else 0
+    fitted, predicted = fit_predict(values, periods_ahead, model_type, SEASON_LENGTHS.get(grain), offset)
+
+    last = periods[-1] if periods else period_start(end, grain)
+    future = [add_periods(last, grain, step) for step in range(1, periods_ahead + 1)]
+    labels = [column for column, _operator in measures]
+    result = {
+        'grain': grain,
+        'model_type': model_type,
+        'periods': [period.isoformat() for period in periods],
+        'future_periods': [period.isoformat() for period in future],
+        'history': {label: values[:, i].tolist() for i, label in enumerate(labels)},
+        'fitted': {label: fitted[:, i].tolist() for i, label in enumerate(labels)},
+        'forecast': {label: predicted[:, i].tolist() for i, label in enumerate(labels)},
+    }
+    if use_cache:
+        forecast_cache.set(key, current, result)
+    return result
+
+
+def config_domain(env, config):
+    """The config's ``domain`` restricted to the current company."""
+    domain = config.domain or []
+    if isinstance(domain, str):
+        try:
+            domain = ast.literal_eval(domain.strip() or '[]')
+        except (ValueError, SyntaxError):
+            raise ValueError(f"Invalid domain on forecast '{config.name}': {config.domain}") from None
+    model_name = config.model.model
+    company_path = COMPANY_PATHS.get(model_name, 'company')
+    try:
+        env[model_name]._meta.get_field(company_path.split('.')[0])
+    except FieldDoesNotExist:
+        return list(domain)
+    return [(company_path, '=', env.company.id)] + list(domain)
+
+
+def forecast_from_config(env, config):
+    """Run :func:`forecast` for a ``forecast`` record such as ``sale.sale_forecast_data``."""
+    Model = env[config.model.model]
+    measures = [
+        (Model._meta.get_field(line.field.name).column, line.operator or 'sum') for line in config.field_configs
+    ]
+    where, where_params = domain_sql(Model, config_domain(env, config))
+    return forecast(
+        env,
+        Model._table,
+        Model._meta.get_field(config.date_field.name).column,
+        measures,
+        config.time_grain or 'year',
+        config.start_date,
+        config.end_date,
+        config.forecast_period or 1,
+        config.model_type or 'linear',
+        where,
+        where_params,
+    )
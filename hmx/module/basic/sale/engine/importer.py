@@ -0,0 +1,300 @@
+"""Bulk import of sale orders and lines from CSV or XLSX.
+
+Rows are parsed one at a time, partner and product names are resolved through in-memory lookup
+maps, and valid rows are loaded with ``COPY`` into a temporary staging table. Orders and lines
+are then merged with a handful of set-based statements: ``order`` values matching the name of a
+draft order of the current company receive the new lines, the others become new draft orders
+named after the reference. The statements bypass the ORM, so create and write access on orders
+and lines are checked before anything is staged.
+Line subtotals are computed by the merge itself. Invalid rows are reported and skipped, the rest
+of the batch is still imported.
+
+Expected columns (header names are case insensitive): ``order``, ``partner``, ``product``,
+``quantity``, ``price`` and optionally ``name`` and ``date``.
+"""
+
+import csv
+import io
+import logging
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from sale.engine import pivot_cache
+
+
+_logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ('order', 'partner', 'product', 'quantity', 'price')
+STAGING_TABLE = 'sale_import_staging'
+ORDERS_TABLE = 'sale_import_orders'
+# Flush the COPY buffer once it holds this many bytes, as the sample data generators do.
+COPY_BUFFER_SIZE = 10_000_000
+MAX_REPORTED_ERRORS = 1000
+
+
+def iter_rows(fileobj, filename):
+    """Yield ``(row_number, {column: value})`` from a CSV or XLSX file without loading it whole."""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(value or '').strip().lower() for value in next(rows, ())]
+            for row_number, values in enumerate(rows, 2):
+                if any(value not in (None, '') for value in values):
+                    yield row_number, dict(zip(header, values))
+        finally:
+            workbook.close()
+        return
+
+    if not isinstance(fileobj, io.TextIOBase):
+        fileobj = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    reader = csv.reader(fileobj)
+    header = [value.strip().lower() for value in next(reader, [])]
+    for row_number, values in enumerate(reader, 2):
+        if any(value.strip() for value in values):
+            yield row_number, dict(zip(header, values))
+
+
+def _name_map(cr, table):
+    cr.execute(
+        f"SELECT DISTINCT ON (lower(name)) lower(name), id FROM {table} WHERE name IS NOT NULL ORDER BY lower(name), id"
+    )
+    return dict(cr.fetchall())
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _number(value, label):
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(_text(value).replace(',', ''))
+    except ValueError:
+        raise ValueError(f"{label} '{_text(value)}' is not a number")
+
+
+def _timestamp(value):
+    if value in (None, ''):
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(_text(value))
+        except ValueError:
+            raise ValueError(f"Date '{_text(value)}' is not an ISO date")
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class SaleImporter:
+    """Stage and merge one import file. ``run()`` returns a summary including the rejected rows."""
+
+    def __init__(self, env, log=None):
+        self.env = env
+        self.cr = env.cr
+        self.log = log
+        self.errors = []
+        self.error_count = 0
+
+    def _error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': message})
+
+    def _create_staging(self):
+        self.cr.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+        self.cr.execute(
+            f"""
+            CREATE TEMP TABLE {STAGING_TABLE} (
+                row_number integer,
+                order_ref text,
+                partner_id integer,
+                product_id integer,
+                name text,
+                quantity double precision,
+                price double precision,
+                line_date timestamptz
+            )
+            """
+        )
+
+    def _flush(self, buffer):
+        buffer.seek(0)
+        self.cr.copy_from(
+            buffer,
+            STAGING_TABLE,
+            columns=['row_number', 'order_ref', 'partner_id', 'product_id', 'name', 'quantity', 'price', 'line_date'],
+        )
+        return io.StringIO()
+
+    def stage(self, rows):
+        """Validate ``rows`` and COPY the valid ones into the staging table, returning their count."""
+        partners = _name_map(self.cr, self.env['partner']._table)
+        products = _name_map(self.cr, self.env['products']._table)
+        order_partners = {}
+        staged = 0
+        buffer = io.StringIO()
+        checked_header = False
+
+        for row_number, row in rows:
+            if not checked_header:
+                missing = [column for column in REQUIRED_COLUMNS if column not in row]
+                if missing:
+                    raise ValueError(f"Missing import columns: {', '.join(missing)}")
+                checked_header = True
+
+            try:
+                order_ref = _text(row['order'])
+                if not order_ref:
+                    raise ValueError("Order reference is empty")
+                partner_id = partners.get(_text(row['partner']).lower())
+                if partner_id is None:
+                    raise ValueError(f"Unknown partner '{_text(row['partner'])}'")
+                if order_partners.setdefault(order_ref, partner_id) != partner_id:
+                    raise ValueError(f"Order '{order_ref}' already has a different partner")
+                product_id = products.get(_text(row['product']).lower())
+                if product_id is None:
+                    raise ValueError(f"Unknown product '{_text(row['product'])}'")
+                quantity = _number(row['quantity'], 'Quantity')
+                price = _number(row['price'], 'Price')
+                line_date = _timestamp(row.get('date'))
+            except ValueError as e:
+                self._error(row_number, str(e))
+                continue
+
+            name = _text(row.get('name')) or None
+            values = (row_number, order_ref, partner_id, product_id, name, quantity, price, line_date)
+            buffer.write('\t'.join(_copy_value(value) for value in values) + '\n')
+            staged += 1
+            if buffer.tell() > COPY_BUFFER_SIZE:
+                buffer = self._flush(buffer)
+                if self.log:
+                    self.log(progress=10, text=f"Staged {staged:,} rows")
+
+        self._flush(buffer)
+        return staged
+
+    def merge(self):
+        """Create missing orders and insert all staged lines, returning ``(orders_created, lines_created)``."""
+        Sale, Line = self.env['sale'], self.env['saleorderline']
+        sale_column = Sale._meta.get_field
+        line_column = Line._meta.get_field
+        user_id = self.env.user.id
+        now = timezone.now()
+
+        self.cr.execute(f"DROP TABLE IF EXISTS {ORDERS_TABLE}")
+        self.cr.execute(
+            f"""
+            CREATE TEMP TABLE {ORDERS_TABLE} AS
+            SELECT order_ref, min(partner_id) AS partner_id, NULL::integer AS sale_id
+            FROM {STAGING_TABLE}
+            GROUP BY order_ref
+            """
+        )
+        # Only draft orders of the current company are open to new lines.
+        self.cr.execute(
+            f"""
+            UPDATE {ORDERS_TABLE} o SET sale_id = s.id
+            FROM (
+                SELECT DISTINCT ON (name) name, id FROM {Sale._table}
+                WHERE {sale_column('company').column} = %s AND status = 'draft'
+                ORDER BY name, id
+            ) s
+            WHERE s.name = o.order_ref
+            """,
+            (self.env.company.id,),
+        )
+        self.cr.execute(
+            f"""
+            WITH created AS (
+                INSERT INTO {Sale._table} (
+                    name, {sale_column('company').column}, {sale_column('partner_id').column}, price, amount_total,
+                    status, created_at, updated_at, created_by, edited_by
+                )
+                SELECT order_ref, %s, partner_id, 0, 0, 'draft', %s, %s, %s, %s
+                FROM {ORDERS_TABLE}
+                WHERE sale_id IS NULL
+                RETURNING id, name
+            )
+            UPDATE {ORDERS_TABLE} o SET sale_id = created.id FROM created WHERE created.name = o.order_ref
+            """,
+            (self.env.company.id, now, now, user_id, user_id),
+        )
+        orders_created = self.cr.rowcount
+
+        self.cr.execute(
+            f"""
+            INSERT INTO {Line._table} (
+                {line_column('sale_id').column}, name, {line_column('product_id').column}, quantity, price, subtotal,
+                created_at, updated_at, created_by, edited_by
+            )
+            SELECT o.sale_id, COALESCE(s.name, o.order_ref), s.product_id, s.quantity, s.price, s.quantity * s.price,
+                   COALESCE(s.line_date, %s), %s, %s, %s
+            FROM {STAGING_TABLE} s
+            JOIN {ORDERS_TABLE} o ON o.order_ref = s.order_ref
+            ORDER BY s.row_number
+            """,
+            (now, now, user_id, user_id),
+        )
+        lines_created = self.cr.rowcount
+
+        # Add the staged subtotals to the order totals as one delta per order.
+        self.cr.execute(
+            f"""
+            UPDATE {Sale._table} sale SET amount_total = COALESCE(sale.amount_total, 0) + t.total
+            FROM (
+                SELECT o.sale_id, SUM(s.quantity * s.price) AS total
+                FROM {STAGING_TABLE} s
+                JOIN {ORDERS_TABLE} o ON o.order_ref = s.order_ref
+                GROUP BY o.sale_id
+            ) t
+            WHERE sale.id = t.sale_id
+            """
+        )
+        return orders_created, lines_created
+
+    def check_access(self):
+        for model_name in ('sale', 'saleorderline'):
+            Model = self.env[model_name]
+            Model.check_access_rights('create')
+            Model.check_access_rights('write')
+
+    def run(self, fileobj, filename):
+        self.check_access()
+        if self.log:
+            self.log(progress=0, text="Staging import rows")
+        try:
+            with transaction.atomic():
+                self._create_staging()
+                staged = self.stage(iter_rows(fileobj, filename))
+
+                if self.log:
+                    self.log(progress=60, text=f"Merging {staged:,} rows")
+                orders_created, lines_created = self.merge() if staged else (0, 0)
+        finally:
+            self.cr.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}, {ORDERS_TABLE}")
+        if lines_created:
+            pivot_cache.bump_generation()
+
+        _logger.info(
+            f"[SaleImporter] {filename}: {lines_created} lines, {orders_created} new orders, "
+            f"{self.error_count} rejected rows"
+        )
+        return {
+            'orders_created': orders_created,
+            'lines_created': lines_created,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
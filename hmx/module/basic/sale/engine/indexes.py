@@ -0,0 +1,83 @@
+"""Declared indexes for the sale analytics tables and a check for report joins they must cover.
+
+Indexes are declared with field names and resolved to columns through the model metadata, so
+``sale_id`` becomes ``sale_id_id``. BRIN suits ``created_at`` on these append-mostly tables: it
+is a few pages in size and still lets range filters skip most of the heap.
+"""
+
+import logging
+from collections import namedtuple
+
+
+_logger = logging.getLogger(__name__)
+
+IndexSpec = namedtuple('IndexSpec', ['suffix', 'method', 'fields'])
+
+SALE_INDEXES = {
+    'sale': [
+        IndexSpec('created_at_brin', 'brin', ('created_at',)),
+        IndexSpec('partner_created_at_idx', 'btree', ('partner_id', 'created_at')),
+    ],
+    'saleorderline': [
+        IndexSpec('created_at_brin', 'brin', ('created_at',)),
+        IndexSpec('sale_product_idx', 'btree', ('sale_id', 'product_id')),
+        IndexSpec('product_created_at_idx', 'btree', ('product_id', 'created_at')),
+        IndexSpec('parent_idx', 'btree', ('parent_id',)),
+    ],
+    'criteria': [
+        IndexSpec('sale_idx', 'btree', ('sale_id',)),
+    ],
+}
+
+# (model, field) pairs that salereport and the sale forecast join or filter on.
+REPORT_JOINS = [
+    ('saleorderline', 'sale_id'),
+    ('saleorderline', 'product_id'),
+    ('saleorderline', 'created_at'),
+    ('sale', 'partner_id'),
+]
+
+
+def _column(model, field_name):
+    return model._meta.get_field(field_name).column
+
+
+def ensure_indexes(model, model_name):
+    """Create the indexes declared for ``model_name`` that do not exist yet."""
+    table = model._table
+    for spec in SALE_INDEXES.get(model_name, []):
+        columns = ', '.join(_column(model, field_name) for field_name in spec.fields)
+        model._cr.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_{spec.suffix} ON {table} USING {spec.method} ({columns})"
+        )
+
+
+def leading_index_columns(cr, table):
+    """Columns that are the first key of at least one index on ``table``."""
+    cr.execute(
+        """
+        SELECT DISTINCT a.attname
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = %s::regclass
+        """,
+        (table,),
+    )
+    return {row[0] for row in cr.fetchall()}
+
+
+def missing_report_indexes(env):
+    """Report joins whose column does not lead any index, as ``(table, column)`` pairs."""
+    missing = []
+    leading = {}
+    for model_name, field_name in REPORT_JOINS:
+        model = env[model_name]
+        if model._table not in leading:
+            leading[model._table] = leading_index_columns(model._cr, model._table)
+        column = _column(model, field_name)
+        if column not in leading[model._table]:
+            missing.append((model._table, column))
+
+    for table, column in missing:
+        _logger.warning(f"No index leads with {table}.{column}, which sale reports join or filter on")
+    return missing
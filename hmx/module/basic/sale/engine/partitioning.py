@@ -0,0 +1,252 @@
+"""Opt-in range partitioning of sale tables by a timestamp column.
+
+Models declare ``_partition_by = ('created_at', 'year')`` and ``_partition_dependents()``.
+Nothing happens unless the model name is listed in the ``sale.partitioned_models`` config
+parameter (comma separated, e.g. ``saleorderline`` or ``sale,saleorderline``).
+
+Converting a table is a one-off migration that rewrites it under an exclusive lock, so it never
+runs from ``init()``: :func:`convert` is called explicitly, see ``Sale._partition_tables``, and
+``init()`` only warns about enabled tables that are not converted yet.
+
+The primary key becomes ``(id, <column>)`` and the partition column ``NOT NULL`` (rows without a
+value get the conversion time); unique indexes get the partition column added to their key.
+PostgreSQL can only reference a partitioned table through a unique key that contains the
+partition column, so foreign keys pointing *at* the table (including self references such as
+``parent_id``) are dropped and logged; ``Sale.unlink`` and ``SaleOrderLine.unlink`` perform the
+cascades they used to do. Only the referencing tables and views a model declares as dependents
+are touched, any other dependent object aborts the conversion before anything is changed.
+Foreign keys from the table to others are kept.
+"""
+
+import logging
+import re
+from datetime import date
+
+from django.utils import timezone
+
+
+_logger = logging.getLogger(__name__)
+
+CONFIG_KEY = 'sale.partitioned_models'
+YEARS_AHEAD = 2
+
+
+def enabled_models(env):
+    param = env['baseconfigparameter'].sudo().search([('key', '=', CONFIG_KEY)], limit=1)
+    if not param or not param.value:
+        return set()
+    return {name.strip() for name in param.value.split(',') if name.strip()}
+
+
+def is_partitioned(cr, table):
+    cr.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cr.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def partition_name(table, year):
+    return f"{table}_y{year}"
+
+
+def ensure_partitions(cr, table, years):
+    """Create yearly partitions that do not exist yet; returns the names created."""
+    created = []
+    for year in sorted(set(years)):
+        name = partition_name(table, year)
+        cr.execute("SELECT to_regclass(%s)", (name,))
+        if cr.fetchone()[0]:
+            continue
+        cr.execute("SAVEPOINT sale_partition")
+        try:
+            cr.execute(
+                f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+                (date(year, 1, 1), date(year + 1, 1, 1)),
+            )
+        except Exception as e:
+            # Rows for this year already sit in the default partition; they have to be moved first.
+            cr.execute("ROLLBACK TO SAVEPOINT sale_partition")
+            _logger.warning(f"Could not create partition {name}: {e}")
+            continue
+        cr.execute("RELEASE SAVEPOINT sale_partition")
+        created.append(name)
+    return created
+
+
+def ensure_future_partitions(cr, table, years_ahead=YEARS_AHEAD):
+    if not is_partitioned(cr, table):
+        return []
+    current = timezone.now().year
+    return ensure_partitions(cr, table, range(current, current + years_ahead + 1))
+
+
+def dependents(cr, table):
+    """Objects of other relations depending on ``table``: ``([(table, foreign key)], [view])``."""
+    cr.execute(
+        """
+        SELECT conrelid::regclass::text, conname
+        FROM pg_constraint
+        WHERE contype = 'f' AND confrelid = %s::regclass AND conrelid <> %s::regclass
+        """,
+        (table, table),
+    )
+    foreign_keys = cr.fetchall()
+    cr.execute(
+        """
+        SELECT DISTINCT v.oid::regclass::text
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        WHERE d.classid = 'pg_rewrite'::regclass AND d.refobjid = %s::regclass AND v.oid <> %s::regclass
+        """,
+        (table, table),
+    )
+    return foreign_keys, [row[0] for row in cr.fetchall()]
+
+
+def _retarget(definition, table):
+    return re.sub(r" ON (ONLY )?\S+ ", f" ON {table} ", definition, count=1)
+
+
+def _with_key_column(definition, column):
+    """Add ``column`` to the key of a ``CREATE UNIQUE INDEX`` definition unless it is part of it."""
+    start = definition.index('(', definition.index(' USING '))
+    depth = 0
+    for end in range(start, len(definition)):
+        if definition[end] == '(':
+            depth += 1
+        elif definition[end] == ')':
+            depth -= 1
+            if not depth:
+                break
+    key = [part.strip().strip('"') for part in definition[start + 1 : end].split(',')]
+    if column in key:
+        return definition
+    return f"{definition[:end]}, {column}{definition[end:]}"
+
+
+def detach_partition(cr, table, year):
+    """Detach one year so it can be archived, compressed or dropped without touching current data."""
+    name = partition_name(table, year)
+    cr.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+    _logger.info(f"Detached partition {name} from {table}")
+    return name
+
+
+def convert_to_partitioned(cr, table, column, years_ahead=YEARS_AHEAD, referenced_by=(), views=()):
+    """Rebuild ``table`` as a range-partitioned table on ``column`` and copy its rows over.
+
+    Foreign keys from the tables in ``referenced_by`` and the ``views`` are dropped, the caller
+    takes over their cascades and rebuilds the views. Any other object depending on ``table``
+    raises a ValueError before anything is changed.
+    """
+    if is_partitioned(cr, table):
+        return False
+
+    incoming, dependent_views = dependents(cr, table)
+    blocking = [f"foreign key {name} on {source}" for source, name in incoming if source not in referenced_by]
+    blocking += [f"view {view}" for view in dependent_views if view not in views]
+    if blocking:
+        raise ValueError(f"Cannot partition {table}, other objects depend on it: {', '.join(blocking)}")
+
+    legacy = f"{table}_unpartitioned"
+    cr.execute(f"SELECT min({column}), max({column}), count(*) FROM {table}")
+    min_value, max_value, row_count = cr.fetchone()
+    _logger.info(f"Partitioning {table} by {column}: {row_count} rows")
+
+    cr.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE contype = 'f' AND conrelid = %s::regclass AND confrelid <> %s::regclass
+        """,
+        (table, table),
+    )
+    outgoing = cr.fetchall()
+    cr.execute(
+        """
+        SELECT pg_get_indexdef(indexrelid), indisunique
+        FROM pg_index
+        WHERE indrelid = %s::regclass AND NOT indisprimary
+        """,
+        (table,),
+    )
+    # A unique index on a partitioned table has to include the partition column.
+    indexes = [
+        _with_key_column(definition, column) if unique else definition for definition, unique in cr.fetchall()
+    ]
+    cr.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+    legacy_sequence = cr.fetchone()[0]
+
+    cr.execute(f"UPDATE {table} SET {column} = now() WHERE {column} IS NULL")
+    if cr.rowcount:
+        _logger.warning(f"Set {column} of {cr.rowcount} {table} rows without one to the current time")
+
+    for view in dependent_views:
+        cr.execute(f"DROP VIEW {view}")
+        _logger.info(f"Dropped view {view} to partition {table}, it has to be rebuilt")
+    for referencing_table, constraint in incoming:
+        cr.execute(f"ALTER TABLE {referencing_table} DROP CONSTRAINT {constraint}")
+        _logger.warning(f"Dropped foreign key {constraint} on {referencing_table}: {table} is now partitioned")
+
+    cr.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    cr.execute(
+        f"""
+        CREATE TABLE {table} (
+            LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY INCLUDING GENERATED
+        ) PARTITION BY RANGE ({column})
+        """
+    )
+    cr.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL, ALTER COLUMN {column} SET DEFAULT now()")
+    cr.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+    current = timezone.now().year
+    first = min_value.year if min_value else current
+    last = max(max_value.year if max_value else current, current + years_ahead)
+    ensure_partitions(cr, table, range(first, last + 1))
+
+    cr.execute(f"INSERT INTO {table} OVERRIDING SYSTEM VALUE SELECT * FROM {legacy}")
+
+    cr.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+    new_sequence = cr.fetchone()[0]
+    if new_sequence:
+        cr.execute(f"SELECT setval(%s, COALESCE((SELECT max(id) FROM {table}), 0) + 1, false)", (new_sequence,))
+    elif legacy_sequence:
+        cr.execute(f"ALTER SEQUENCE {legacy_sequence} OWNED BY {table}.id")
+
+    cr.execute(f"DROP TABLE {legacy}")
+
+    cr.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, {column})")
+    for definition in indexes:
+        cr.execute(_retarget(definition, table))
+    for constraint, definition in outgoing:
+        cr.execute(f"ALTER TABLE {table} ADD CONSTRAINT {constraint} {definition}")
+
+    _logger.info(f"Partitioned {table} by {column}")
+    return True
+
+
+def pending(model, model_name):
+    """Whether ``model`` is enabled in the config but its table is not partitioned yet."""
+    return bool(getattr(model, '_partition_by', None)) and (
+        model_name in enabled_models(model.env) and not is_partitioned(model._cr, model._table)
+    )
+
+
+def convert(model, model_name):
+    """Partition ``model``'s table if it declares ``_partition_by`` and is enabled in the config.
+
+    ``model._partition_dependents()`` returns the referencing tables and views the conversion may
+    drop, see :func:`convert_to_partitioned`.
+    """
+    spec = getattr(model, '_partition_by', None)
+    if not spec or model_name not in enabled_models(model.env):
+        return False
+
+    column, interval = spec
+    if interval != 'year':
+        raise ValueError(f"Unsupported partition interval {interval!r}, only 'year' is implemented")
+
+    referenced_by, views = model._partition_dependents()
+    converted = convert_to_partitioned(model._cr, model._table, column, referenced_by=referenced_by, views=views)
+    ensure_future_partitions(model._cr, model._table)
+    return converted
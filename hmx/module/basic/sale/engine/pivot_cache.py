@@ -0,0 +1,144 @@
+"""Per-process cache of ``salereport`` aggregates, invalidated by writes to sales and lines.
+
+Results are kept in an LRU bounded both by entry count and by an approximate memory budget
+(the pickled size of each result). Invalidation is a generation number stored in the Django
+cache: every transaction writing ``sale`` or ``saleorderline`` bumps it when it commits, which
+makes every worker's entries stale at once without having to know their keys. Bumping any earlier
+would let a concurrent miss compute from the pre-commit snapshot and store it under the new
+generation. Until its commit, the writing transaction bypasses the cache so it still sees its own
+changes. With the local-memory backend the generation, like the cache itself, is per process.
+
+The same generation is part of the key used to coalesce pivot exports: identical export
+requests made while the data is unchanged share the first request's Celery task.
+"""
+
+import hashlib
+import json
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+
+GENERATION_KEY = 'sale:pivot:generation'
+MAX_ENTRIES = 256
+MAX_BYTES = 32 * 1024 * 1024
+COALESCE_TTL = 120
+COALESCE_WAIT = 2.0
+_PENDING = 'pending'
+
+
+def generation():
+    value = cache.get(GENERATION_KEY)
+    if value is None:
+        cache.add(GENERATION_KEY, 1, None)
+        value = cache.get(GENERATION_KEY) or 1
+    return value
+
+
+def _increment_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 2, None)
+
+
+def has_pending_writes():
+    """Whether the current transaction wrote sales or lines that are not committed yet."""
+    return any(entry[1] is _increment_generation for entry in connection.run_on_commit)
+
+
+def bump_generation():
+    """Mark every cached aggregate as stale once the current transaction commits.
+
+    Call after any write to sales or sale lines. Outside a transaction the bump is immediate.
+    """
+    if not has_pending_writes():
+        transaction.on_commit(_increment_generation)
+
+
+def make_key(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PivotCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, current_generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != current_generation:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Callers get their own copy, the cached result must not be mutated.
+            return pickle.loads(entry[1])
+
+    def set(self, key, current_generation, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self._entries[key] = (current_generation, data)
+            self.size += len(data)
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                _key, (_generation, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+pivot_cache = PivotCache()
+
+
+def cached_aggregate(key_parts, compute):
+    """Return the cached result for ``key_parts``, running ``compute()`` on a miss."""
+    if has_pending_writes():
+        return compute()
+    current = generation()
+    key = make_key(*key_parts)
+    result = pivot_cache.get(key, current)
+    if result is None:
+        result = compute()
+        pivot_cache.set(key, current, result)
+    return result
+
+
+def coalesce_task(key_parts, dispatch, ttl=COALESCE_TTL, wait=COALESCE_WAIT):
+    """Return the task id for ``key_parts``, calling ``dispatch()`` only if none is in flight.
+
+    ``dispatch`` must start the task and return its id. A concurrent caller that loses the race
+    waits up to ``wait`` seconds for the winner's task id before dispatching on its own.
+    """
+    key = 'sale:pivot:task:' + make_key(generation(), *key_parts)
+    if cache.add(key, _PENDING, ttl):
+        task_id = dispatch()
+        cache.set(key, task_id, ttl)
+        return task_id
+
+    deadline = time.monotonic() + wait
+    while True:
+        task_id = cache.get(key)
+        if task_id and task_id != _PENDING:
+            return task_id
+        if task_id is None or time.monotonic() >= deadline:
+            return dispatch()
+        time.sleep(0.05)
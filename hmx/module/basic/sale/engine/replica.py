@@ -0,0 +1,137 @@
+"""Route read-only sale reporting queries to a PostgreSQL replica.
+
+Configure a replica connection in ``DATABASES`` and enable the router::
+
+    DATABASES['replica'] = {...}
+    DATABASE_ROUTERS = ['sale.engine.replica.ReplicaRouter']
+    SALE_REPLICA_DATABASE = 'replica'   # default
+    SALE_REPLICA_MAX_LAG = 30           # seconds, default
+
+Only code running inside :func:`reporting` is routed, and only for :data:`REPORT_MODELS`: ORM
+reads go through :class:`ReplicaRouter`, raw SQL through :func:`read_cursor`. Everything falls
+back to the primary when no replica is configured, when it cannot be reached or lags more than
+``SALE_REPLICA_MAX_LAG`` seconds, and inside a transaction on the primary, whose own writes a
+replica would not see yet.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+
+_logger = logging.getLogger(__name__)
+
+REPORT_MODELS = {'salereport', 'saleorderline', 'sale', 'forecast'}
+LAG_CHECK_INTERVAL = 5
+
+_reporting = contextvars.ContextVar('sale_reporting', default=False)
+_lag_checks = {}
+_lag_lock = threading.Lock()
+
+
+def replica_alias():
+    alias = getattr(settings, 'SALE_REPLICA_DATABASE', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def max_lag():
+    return getattr(settings, 'SALE_REPLICA_MAX_LAG', 30)
+
+
+@contextmanager
+def reporting():
+    """Mark the enclosed reads as reporting queries that may be served by the replica."""
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind the primary.
+
+    0 when it is streaming and has replayed everything it received. A replica whose WAL receiver
+    is disconnected may look caught up while the primary moves on, so its lag is the age of the
+    last replayed transaction instead, and infinite if it never replayed one.
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming')
+                     AND pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+            END
+            """
+        )
+        lag = cursor.fetchone()[0]
+        return float('inf') if lag is None else float(lag)
+
+
+def replica_available(alias):
+    now = time.monotonic()
+    with _lag_lock:
+        checked = _lag_checks.get(alias)
+        if checked and now - checked[0] < LAG_CHECK_INTERVAL:
+            return checked[1]
+
+    try:
+        lag = replica_lag(alias)
+        available = lag <= max_lag()
+        if not available:
+            _logger.warning(f"[replica] {alias} is {lag:.1f}s behind, reporting from the primary")
+    except Exception as e:
+        _logger.warning(f"[replica] {alias} is unavailable, reporting from the primary: {e}")
+        available = False
+
+    with _lag_lock:
+        _lag_checks[alias] = (now, available)
+    return available
+
+
+def read_alias():
+    """Database alias the current reporting read should use."""
+    alias = replica_alias()
+    if not alias or not _reporting.get() or connection.in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return alias if replica_available(alias) else DEFAULT_DB_ALIAS
+
+
+def replica_serving():
+    """Whether reporting reads go to the replica right now.
+
+    Their results may lag the primary by up to ``SALE_REPLICA_MAX_LAG`` seconds, so they must not
+    be cached under the current pivot generation.
+    """
+    with reporting():
+        return read_alias() != DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def read_cursor():
+    """Cursor for raw reporting SQL, on the replica when :func:`read_alias` allows it."""
+    with connections[read_alias()].cursor() as cursor:
+        yield cursor
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.model_name in REPORT_MODELS and _reporting.get():
+            return read_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == replica_alias() else None
@@ -1,3 +1,5 @@
+import ast
+import contextvars
 import io
 import logging
 import random
@@ -12,14 +14,22 @@ from openpyxl.cell.cell import MergedCell
 from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
 from openpyxl.utils import get_column_letter
 
+from document_store.services.file_store import document_storage, release_unreferenced, stored_names
 from hmx import api
 from hmx.exceptions import UserError
 from hmx.tasks import generate_excel_report_task_template
 from hmx.tools.celery import require_celery_worker, use_task
 from hmx.tools.misc import profile
+from sale.engine import export, forecast, indexes, partitioning, pivot_cache
+from sale.engine.importer import SaleImporter
 
 
 _logger = logging.getLogger(__name__)
+# Config parameter set once amount_total has been backfilled from the order lines.
+AMOUNT_TOTAL_BACKFILLED = 'sale.amount_total_backfilled'
+
+# {status: [sale ids]} collected by _on_confirm_no_workflow while action_confirm_batch runs.
+_batch_transitions = contextvars.ContextVar('sale_batch_transitions', default=None)
 
 
 class Sale(models.Model):
@@ -112,6 +122,8 @@ class Sale(models.Model):
         decimal_ref='sale.product_price:digits_amount',
     )
     subtotal = models.FloatField(null=True, compute='_compute_subtotal', store=True, verbose_name=("Subtotal"))
+    # Sum of the lines' subtotals, kept up to date by delta updates from SaleOrderLine and the bulk loaders.
+    amount_total = models.FloatField(null=True, default=0, verbose_name=_("Total"))
 
     # Status field - choices will be set by Meta.inherit from ApprovalMixin
     # Or define your own choices here:
@@ -138,30 +150,267 @@ class Sale(models.Model):
         related_name="sale_order",
     )
 
-    document = models.FileField(upload_to='documents/', null=True, blank=True)
+    document = models.FileField(upload_to='documents/', storage=document_storage, null=True, blank=True)
     date = models.DateField(_("Date"), null=True, blank=True)
     datetime = models.DateTimeField(_("Datetime"), null=True, blank=True)
 
     restricted_field = models.CharField(max_length=255, null=True)
 
+    # Opt-in through the sale.partitioned_models config parameter, see sale/engine/partitioning.py
+    _partition_by = ('created_at', 'year')
+
+    def init(self):
+        if partitioning.pending(self, 'sale'):
+            _logger.warning("[Sale] sale is enabled for partitioning, run Sale._partition_tables() to convert it")
+        partitioning.ensure_future_partitions(self._cr, self._table)
+        indexes.ensure_indexes(self, 'sale')
+        self._backfill_amount_total()
+
+    def _partition_dependents(self):
+        """Referencing tables and views partitioning may drop; ``_unlink_dependents`` does their cascades."""
+        products = self._meta.get_field('product_ids')
+        referenced_by = {self.env['saleorderline']._table, self.env['criteria']._table, products.m2m_db_table()}
+        return referenced_by, {self.env['salereport']._table}
+
+    @api.model
+    def _partition_tables(self):
+        """Partition the sale tables enabled in ``sale.partitioned_models``, see sale/engine/partitioning.py.
+
+        Each table is rewritten under an exclusive lock, so run this in a maintenance window rather
+        than on a module update. Returns the names of the converted models.
+        """
+        converted = [name for name in ('saleorderline', 'sale') if partitioning.convert(self.env[name], name)]
+        if converted:
+            self.env['salereport'].init()
+        return converted
+
+    def _backfill_amount_total(self):
+        """Fill amount_total of orders created before it existed, once per database."""
+        Param = self.env['baseconfigparameter'].sudo()
+        if Param.search([('key', '=', AMOUNT_TOTAL_BACKFILLED)], limit=1):
+            return
+        lines = self.env['saleorderline']
+        sale_column = lines._meta.get_field('sale_id').column
+        self._cr.execute(
+            f"""
+            UPDATE {self._table} s SET amount_total = COALESCE(t.total, 0)
+            FROM {self._table} o
+            LEFT JOIN (
+                SELECT {sale_column} AS sale_id, SUM(subtotal) AS total FROM {lines._table} GROUP BY {sale_column}
+            ) t ON t.sale_id = o.id
+            WHERE o.id = s.id
+            """
+        )
+        Param.create({'key': AMOUNT_TOTAL_BACKFILLED, 'value': 'True'})
+
+    @api.model
+    def cron_ensure_partitions(self):
+        for model_name in ('sale', 'saleorderline'):
+            partitioning.ensure_future_partitions(self._cr, self.env[model_name]._table)
+        return True
+
     # Override _on_confirm_no_workflow if you want custom behavior when no workflow
     def _on_confirm_no_workflow(self):
         """Called when action_confirm is triggered but no workflow is applicable."""
+        transitions = _batch_transitions.get()
+        if transitions is not None:
+            # Inside action_confirm_batch: written once per status when the batch ends.
+            transitions.setdefault('approved', []).extend(self.ids)
+            return
         # Default: just approve directly
-        self.status = 'approved'
-        _logger.info(f"[Sale._on_confirm_no_workflow] {self.id} directly approved (no workflow)")
+        self.write({'status': 'approved'})
+        _logger.info(f"[Sale._on_confirm_no_workflow] {self.ids} directly approved (no workflow)")
+
+    def action_confirm_batch(self):
+        """Confirm many draft orders at once, e.g. at period close.
+
+        Unlike a per-record ``action_confirm``, the query count does not grow with the number of
+        orders: the applicable workflows are resolved for the whole recordset with one query, the
+        approval instances are created with one multi-create and linked with one UPDATE, and the
+        status transitions, including those of ``_on_confirm_no_workflow``, are applied with one
+        ``write`` per target status.
+        """
+        drafts = self.search([('id', 'in', self.ids), ('status', '=', 'draft')])
+        workflows = drafts._resolve_workflows_batch()
+        with_workflow = drafts.filtered(lambda order: order.id in workflows)
+        transitions = {}
+        token = _batch_transitions.set(transitions)
+        try:
+            if drafts - with_workflow:
+                (drafts - with_workflow)._on_confirm_no_workflow()
+        finally:
+            _batch_transitions.reset(token)
+
+        if with_workflow:
+            instances = (
+                self.env['approvalworkflowinstance']
+                .sudo()
+                .create([order._approval_instance_vals(workflows[order.id]) for order in with_workflow])
+            )
+            self._cr.execute(
+                f"""
+                UPDATE {self._table} s SET {self._meta.get_field('approval_workflow_instance').column} = d.instance_id
+                FROM unnest(%s::integer[], %s::integer[]) AS d(id, instance_id)
+                WHERE s.id = d.id
+                """,
+                (with_workflow.ids, instances.ids),
+            )
+            with_workflow.invalidate_cache()
+            transitions.setdefault('waiting_approval', []).extend(with_workflow.ids)
+
+        for status, ids in transitions.items():
+            self.browse(ids).write({'status': status})
+        summary = ', '.join(f"{len(ids)} {status}" for status, ids in transitions.items()) or 'none'
+        _logger.info(f"[Sale.action_confirm_batch] Confirmed {len(drafts)} orders: {summary}")
+        return True
+
+    def _resolve_workflows_batch(self):
+        """``{sale id: workflow}`` for these orders, from one query over the active sale workflows.
+
+        Like ``action_confirm``, the first workflow whose domain matches an order applies to it;
+        domains are evaluated on the already loaded records.
+        """
+        workflows = (
+            self.env['approvalworkflow']
+            .sudo()
+            .search([('model.model', '=', self._meta.model_name), ('active', '=', True)])
+        )
+        resolved = {}
+        remaining = self
+        for workflow in workflows:
+            if not remaining:
+                break
+            domain = workflow.domain or []
+            if isinstance(domain, str):
+                domain = ast.literal_eval(domain.strip() or '[]')
+            matched = remaining.filtered_domain(domain) if domain else remaining
+            resolved.update((order.id, workflow) for order in matched)
+            remaining -= matched
+        return resolved
+
+    def _approval_instance_vals(self, workflow):
+        """Values of the approval instance ``action_confirm`` would start for this order."""
+        self.ensure_one()
+        return {'workflow_id': workflow.id, 'res_model': self._meta.model_name, 'res_id': self.id}
 
     @api.model
-    def create(self, vals):
-        # hotfix kecil: pastikan price ada (agar tidak melanggar NOT NULL DB)
-        if 'price' not in vals or vals.get('price') is None:
-            vals['price'] = 0  # atau Decimal('0') sesuai kebutuhan
-        res = super(Sale, self).create(vals)
-        base_sequence = self.env['basesequence'].next_by_code('sale.order')
-        if base_sequence:
-            res.name = base_sequence
+    def _reserve_order_names(self, count):
+        """Draw ``count`` order numbers from the ``sale.order`` sequence before anything is inserted.
+
+        The numbers are reserved with one UPDATE that advances the counter by ``count`` steps and
+        returns where it stood; the names are then formatted locally from the sequence prefix,
+        padding and suffix.
+        """
+        if not count:
+            return []
+        sequence = (
+            self.env['basesequence']
+            .sudo()
+            .search([('code', '=', 'sale.order'), ('company', 'in', [self.env.company.id, False])], order='company')
+        )[:1]
+        if not sequence:
+            return [False] * count
+        counter = self._order_sequence_counter(sequence)
+        self._cr.execute(
+            f"""
+            UPDATE {counter._table} SET number_next = number_next + number_increment * %s
+            WHERE id = %s
+            RETURNING number_next - number_increment * %s, number_increment
+            """,
+            (count, counter.id, count),
+        )
+        first, step = self._cr.fetchone()
+        counter.invalidate_cache()
+        prefix, suffix = sequence._get_prefix_suffix()
+        return [f"{prefix}{first + i * step:0{sequence.padding}d}{suffix}" for i in range(count)]
+
+    @api.model
+    def _order_sequence_counter(self, sequence):
+        """The record holding ``number_next`` for ``sequence``; override for per-range counters."""
+        return sequence
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        names = self._reserve_order_names(len(vals_list))
+        for vals, name in zip(vals_list, names):
+            # hotfix kecil: pastikan price ada (agar tidak melanggar NOT NULL DB)
+            if 'price' not in vals or vals.get('price') is None:
+                vals['price'] = 0  # atau Decimal('0') sesuai kebutuhan
+            if name:
+                vals['name'] = name
+        records = super(Sale, self).create(vals_list)
+        pivot_cache.bump_generation()
+        return records
+
+    def write(self, vals):
+        replaced = stored_names(self, 'document') if 'document' in vals else set()
+        res = super(Sale, self).write(vals)
+        if replaced:
+            release_unreferenced(self.browse(), 'document', replaced)
+        pivot_cache.bump_generation()
+        return res
+
+    def unlink(self):
+        self.check_access_rights('unlink')
+        self.check_access_rule('unlink')
+        files = stored_names(self, 'document')
+        self._unlink_dependents()
+        res = super(Sale, self).unlink()
+        release_unreferenced(self.browse(), 'document', files)
+        pivot_cache.bump_generation()
         return res
 
+    def _unlink_dependents(self):
+        """Delete the lines (with nested children), criteria and product links of these orders.
+
+        This is what the foreign key cascades did before; partitioning drops the foreign keys that
+        point at a partitioned table, see sale/engine/partitioning.py.
+        """
+        if not self.ids:
+            return
+        lines = self.env['saleorderline']
+        criteria = self.env['criteria']
+        products = self._meta.get_field('product_ids')
+        line_sale_column = lines._meta.get_field('sale_id').column
+        line_parent_column = lines._meta.get_field('parent_id').column
+
+        self._cr.execute(
+            f"""
+            WITH RECURSIVE doomed AS (
+                SELECT id FROM {lines._table} WHERE {line_sale_column} = ANY(%s)
+                UNION
+                SELECT child.id FROM {lines._table} child JOIN doomed ON child.{line_parent_column} = doomed.id
+            )
+            DELETE FROM {lines._table} WHERE id IN (SELECT id FROM doomed)
+            """,
+            (self.ids,),
+        )
+        self._cr.execute(
+            f"DELETE FROM {criteria._table} WHERE {criteria._meta.get_field('sale_id').column} = ANY(%s)",
+            (self.ids,),
+        )
+        self._cr.execute(
+            f"DELETE FROM {products.m2m_db_table()} WHERE {products.m2m_column_name()} = ANY(%s)",
+            (self.ids,),
+        )
+
+    @api.model
+    def _apply_amount_deltas(self, deltas):
+        """Add ``{sale_id: delta}`` to the stored order totals in a single UPDATE."""
+        deltas = {sale_id: delta for sale_id, delta in deltas.items() if sale_id and delta}
+        if not deltas:
+            return
+        self._cr.execute(
+            f"""
+            UPDATE {self._table} s SET amount_total = COALESCE(s.amount_total, 0) + d.delta
+            FROM unnest(%s::integer[], %s::double precision[]) AS d(id, delta)
+            WHERE s.id = d.id
+            """,
+            (list(deltas), list(deltas.values())),
+        )
+        # The UPDATE bypassed the ORM, drop the totals it may have cached.
+        self.browse(list(deltas)).invalidate_cache()
+
     @api.depends('quantity', 'price')
     def _compute_subtotal(self):
         for record in self:
@@ -172,14 +421,87 @@ class Sale(models.Model):
             raise UserError('Sample raise error')
         return True
 
+    UNLINK_BATCH_SIZE = 1000
+    UNLINK_TASK_THRESHOLD = 5000
+
     def action_unlink(self):
-        for record in self:
-            record.unlink()
+        if len(self) > self.UNLINK_TASK_THRESHOLD:
+            return self.action_unlink_task()
+        return self._unlink_in_batches()
+
+    @use_task(name='Delete Sale Orders', fallback_to_sync=True)
+    def action_unlink_task(self, log=None):
+        return self._unlink_in_batches(log=log)
+
+    def _unlink_in_batches(self, batch_size=None, log=None):
+        """Delete the orders set-wise instead of one ``unlink()`` per record.
+
+        Each batch goes through a single ORM ``unlink()``. It checks unlink access rights and record
+        rules on the orders first, then removes their lines (including nested children), criteria
+        and product links with one raw DELETE each, which skips the line and criteria ``unlink()``
+        overrides like the foreign key cascades did.
+        """
+        batch_size = batch_size or self.UNLINK_BATCH_SIZE
+        ids = self.ids
+        total = len(ids)
+        if not total:
+            return True
+
+        for start in range(0, total, batch_size):
+            self.browse(ids[start : start + batch_size]).unlink()
+
+            done = min(start + batch_size, total)
+            if log:
+                log(progress=done * 100 // total, text=f"Deleted {done:,} of {total:,} sale orders")
+
+        _logger.info(f"[Sale._unlink_in_batches] Deleted {total} sale orders in batches of {batch_size}")
         return True
 
     def action_export_data(self):
         return self.action_export()
 
+    def export_csv_chunks(self, lines=False, fields=None, compress=False):
+        """Stream the orders in ``self`` (or their lines) as CSV through COPY, see sale/engine/export.py.
+
+        Unlike ``action_export_data`` this only covers the flat columns declared in
+        ``export.DATASETS``, but it never loads records into Python.
+        """
+        return self._export_csv_chunks(self.ids, lines, fields, compress)
+
+    @api.model
+    def export_all_csv_chunks(self, lines=False, fields=None, compress=False):
+        """Like :meth:`export_csv_chunks` for all orders of the allowed companies.
+
+        The orders are selected by a company subselect in the COPY instead of an id list.
+        """
+        self.check_access_rights('read')
+        return self._export_csv_chunks(None, lines, fields, compress, company_ids=self.env.companies.ids)
+
+    @api.model
+    def _export_csv_chunks(self, ids, lines, fields, compress, company_ids=None):
+        return export.export_chunks(
+            self.env,
+            'saleorderline' if lines else 'sale',
+            ids=ids,
+            fields=fields,
+            compress=compress,
+            filter_field='sale_id' if lines else 'id',
+            company_ids=company_ids,
+        )
+
+    @api.model
+    def get_sale_forecast(self, config_ref='sale.sale_forecast_data'):
+        """Forecast from a ``forecast`` configuration with the vectorized engine in sale/engine/forecast.py."""
+        return forecast.forecast_from_config(self.env, self.env.ref(config_ref))
+
+    @api.model
+    def import_sales(self, fileobj, filename, log=None):
+        """Bulk import orders and lines from a CSV/XLSX file, see sale/engine/importer.py.
+
+        Returns the created order and line counts plus the rejected rows as ``{'row', 'error'}``.
+        """
+        return SaleImporter(self.env, log=log).run(fileobj, filename)
+
     @use_task(name='Generate 1M Records', fallback_to_sync=False)
     def action_generate_1m_records(self, log=None):
         """
@@ -318,6 +640,7 @@ class Sale(models.Model):
 
         line_count = 0
         line_buf = io.StringIO()
+        amount_deltas = {}
 
         for idx, (order_id, order_name) in enumerate(order_ids):
             if idx % (total_orders // 20) == 0 and idx > 0:
@@ -333,6 +656,7 @@ class Sale(models.Model):
                 qty = random.randint(1, 10)
                 price = random.choice([10000, 20000, 30000, 40000, 50000])
                 subtotal = qty * price
+                amount_deltas[order_id] = amount_deltas.get(order_id, 0) + subtotal
                 line_buf.write(
                     f"{order_id}\t{order_name}\t{product_id}\t{qty}\t{price}\t{subtotal}\t{now}\t{now}\t{user_id}\t{user_id}\n"
                 )
@@ -376,6 +700,8 @@ class Sale(models.Model):
                 'edited_by',
             ],
         )
+        self._apply_amount_deltas(amount_deltas)
+        pivot_cache.bump_generation()
 
         if log:
             log(state="SUCCESS", progress=100, text="Orders generated")
@@ -561,7 +887,7 @@ class Sale(models.Model):
         for i, order_data in enumerate(orders_data):
             order_buf.write(
                 f"{order_data['name']}\t{company_id}\t{order_data['partner_id']}\t"
-                f"{order_data['total_price']}\t{order_data['total_quantity']}\t"
+                f"{order_data['total_price']}\t{order_data['total_quantity']}\t{order_data['total_price']}\t"
                 f"{order_data['created_at']}\t{now}\t{user_id}\t{user_id}\tdraft\n"
             )
 
@@ -580,6 +906,7 @@ class Sale(models.Model):
                         'partner_id_id',
                         'price',
                         'quantity',
+                        'amount_total',
                         'created_at',
                         'updated_at',
                         'created_by',
@@ -599,6 +926,7 @@ class Sale(models.Model):
                 'partner_id_id',
                 'price',
                 'quantity',
+                'amount_total',
                 'created_at',
                 'updated_at',
                 'created_by',
@@ -681,6 +1009,7 @@ class Sale(models.Model):
                 'edited_by',
             ],
         )
+        pivot_cache.bump_generation()
 
         if log:
             log(state="SUCCESS", progress=100, text="Orders generated with realistic patterns")
@@ -773,7 +1102,7 @@ class Sale(models.Model):
         sheet[f"A{total_row}"].value = str(_("Total"))
         sheet[f"A{total_row}"].font = style_total
 
-        sheet[f"D{total_row}"].value = sum(self.lines.values_list("subtotal", flat=True))
+        sheet[f"D{total_row}"].value = self.amount_total or 0
         sheet[f"D{total_row}"].font = style_total
         sheet[f"D{total_row}"].alignment = Alignment(horizontal="right")
 
@@ -836,6 +1165,11 @@ class Sale(models.Model):
         return res
 
 
+CLIENT_KEY_FIELDS = ('clientKey', 'client_key')
+# Line fields whose change moves Sale.amount_total.
+AMOUNT_FIELDS = {'quantity', 'price', 'sale_id'}
+
+
 class SaleOrderLine(models.Model):
     sale_id = models.ForeignKey(
         "sale", verbose_name=_("Sale"), related_name="lines", on_delete=models.CASCADE, null=True
@@ -853,6 +1187,20 @@ class SaleOrderLine(models.Model):
         'self', verbose_name=_("Parent Line"), on_delete=models.CASCADE, null=True, blank=True, related_name='child_ids'
     )
 
+    _partition_by = ('created_at', 'year')
+
+    def init(self):
+        if partitioning.pending(self, 'saleorderline'):
+            _logger.warning(
+                "[SaleOrderLine] saleorderline is enabled for partitioning, run Sale._partition_tables() to convert it"
+            )
+        partitioning.ensure_future_partitions(self._cr, self._table)
+        indexes.ensure_indexes(self, 'saleorderline')
+
+    def _partition_dependents(self):
+        """Referencing tables and views partitioning may drop; the parent_id cascade moves to ``unlink``."""
+        return set(), {self.env['salereport']._table}
+
     @api.depends('quantity', 'price')
     def _compute_subtotal(self):
         for record in self:
@@ -862,54 +1210,149 @@ class SaleOrderLine(models.Model):
     def create(self, vals_list, **kwargs):
         """
         Override create to handle self-parent relationships with clientKey references.
-        When child has parent_id set to a clientKey string, we resolve it after batch create.
-        """
-        import logging
-
-        _logger = logging.getLogger(__name__)
-
-        needs_parent_resolution = []
 
+        A child may point ``parent_id`` at the clientKey of another line in the same batch. Keys are
+        matched against the lines' own ``clientKey`` values; a key that is not in the batch falls back
+        to the nearest preceding top-level line, which is how pasted nested rows are laid out.
+        References are resolved in linear time and lines are inserted level by level, parents first,
+        so ``parent_id`` is already set at INSERT time. Records are returned in input order.
+        """
+        key_index = {}
+        for idx, vals in enumerate(vals_list):
+            client_key = None
+            for key_field in CLIENT_KEY_FIELDS:
+                client_key = vals.pop(key_field, None) or client_key
+            if client_key is not None:
+                key_index[str(client_key)] = idx
+
+        parent_index = [None] * len(vals_list)
+        unresolved = 0
+        last_root = None
         for idx, vals in enumerate(vals_list):
             parent_id_value = vals.get('parent_id')
             if parent_id_value and isinstance(parent_id_value, str) and not parent_id_value.isdigit():
-                needs_parent_resolution.append(
-                    {
-                        'index': idx,
-                        'clientKey': parent_id_value,
-                        'original_vals': vals,
-                    }
-                )
-                _logger.info(f'[SaleOrderLine] Child at index {idx} has clientKey parent: {parent_id_value}')
                 vals['parent_id'] = None
+                resolved = key_index.get(parent_id_value, last_root)
+                if resolved is None or resolved == idx:
+                    unresolved += 1
+                else:
+                    parent_index[idx] = resolved
+            elif not parent_id_value:
+                last_root = idx
+
+        if not any(index is not None for index in parent_index):
+            if unresolved:
+                _logger.warning(f'[SaleOrderLine] Could not resolve the parent of {unresolved} lines')
+            records = super(SaleOrderLine, self).create(vals_list, **kwargs)
+            self.env['sale']._apply_amount_deltas(records._amount_by_sale())
+            pivot_cache.bump_generation()
+            return records
+
+        levels = self._client_key_levels(parent_index)
+        created = [None] * len(vals_list)
+        for level in levels:
+            for idx in level:
+                if parent_index[idx] is not None:
+                    vals_list[idx]['parent_id'] = created[parent_index[idx]].id
+            records = super(SaleOrderLine, self).create([vals_list[idx] for idx in level], **kwargs)
+            for idx, record in zip(level, records):
+                created[idx] = record
+
+        _logger.debug(
+            f'[SaleOrderLine] Created {len(vals_list)} lines in {len(levels)} levels, '
+            f'{sum(1 for index in parent_index if index is not None)} with clientKey parents'
+        )
+        if unresolved:
+            _logger.warning(f'[SaleOrderLine] Could not resolve the parent of {unresolved} lines')
 
-        records = super(SaleOrderLine, self).create(vals_list, **kwargs)
+        records = self.browse([record.id for record in created])
+        self.env['sale']._apply_amount_deltas(records._amount_by_sale())
+        pivot_cache.bump_generation()
+        return records
 
-        if needs_parent_resolution:
-            _logger.info(f'[SaleOrderLine] Resolving {len(needs_parent_resolution)} children with clientKey parents')
-            records_list = list(records)
+    def write(self, vals):
+        affects_totals = bool(AMOUNT_FIELDS & set(vals))
+        before = self._amount_by_sale() if affects_totals else {}
+        res = super(SaleOrderLine, self).write(vals)
+        if affects_totals:
+            deltas = self._amount_by_sale()
+            for sale_id, amount in before.items():
+                deltas[sale_id] = deltas.get(sale_id, 0) - amount
+            self.env['sale']._apply_amount_deltas(deltas)
+        pivot_cache.bump_generation()
+        return res
 
-            for resolution_info in needs_parent_resolution:
-                child_idx = resolution_info['index']
-                parent_clientKey = resolution_info['clientKey']
-                child_record = records_list[child_idx]
+    def unlink(self):
+        self.check_access_rights('unlink')
+        self.check_access_rule('unlink')
+        lines = self._with_descendants()
+        removed = lines._amount_by_sale()
+        # Child lines are deleted here rather than by the parent_id cascade, which partitioning drops.
+        own_ids = set(self.ids)
+        children = [line_id for line_id in lines.ids if line_id not in own_ids]
+        if children:
+            self._cr.execute(f"DELETE FROM {self._table} WHERE id = ANY(%s)", (children,))
+        res = super(SaleOrderLine, self).unlink()
+        self.env['sale']._apply_amount_deltas({sale_id: -amount for sale_id, amount in removed.items()})
+        pivot_cache.bump_generation()
+        return res
 
-                parent_record = None
-                for parent_idx in range(child_idx):
-                    candidate = records_list[parent_idx]
-                    if not candidate.parent_id:
-                        parent_record = candidate
+    def _with_descendants(self):
+        """These lines plus all their nested children."""
+        if not self.ids:
+            return self
+        parent_column = self._meta.get_field('parent_id').column
+        self._cr.execute(
+            f"""
+            WITH RECURSIVE tree AS (
+                SELECT id FROM {self._table} WHERE id = ANY(%s)
+                UNION
+                SELECT child.id FROM {self._table} child JOIN tree ON child.{parent_column} = tree.id
+            )
+            SELECT id FROM tree
+            """,
+            (self.ids,),
+        )
+        return self.browse([row[0] for row in self._cr.fetchall()])
 
-                if parent_record:
-                    child_record.write({'parent_id': parent_record.id})
-                    _logger.info(
-                        f'[SaleOrderLine] Resolved parent_id for child {child_record.id}: '
-                        f'parent={parent_record.id}, clientKey={parent_clientKey}'
-                    )
-                else:
-                    _logger.warning(f'[SaleOrderLine] Could not find parent for child {child_record.id}')
+    def _amount_by_sale(self):
+        """``{sale_id: sum(quantity * price)}`` of these lines.
 
-        return records
+        Computed from the ORM values rather than the stored subtotal, which may not be flushed yet.
+        """
+        amounts = {}
+        for line in self:
+            if line.sale_id:
+                amounts[line.sale_id.id] = amounts.get(line.sale_id.id, 0) + (line.quantity or 0) * (line.price or 0)
+        return amounts
+
+    @api.model
+    def _client_key_levels(self, parent_index):
+        """Group line indexes by depth in the clientKey tree; references that form a cycle become roots."""
+        depth = [None] * len(parent_index)
+        for start in range(len(parent_index)):
+            path = []
+            seen = set()
+            idx = start
+            while idx is not None and depth[idx] is None and idx not in seen:
+                path.append(idx)
+                seen.add(idx)
+                idx = parent_index[idx]
+
+            if idx is not None and depth[idx] is None:
+                _logger.warning(f'[SaleOrderLine] clientKey cycle at line {idx}, creating it without parent')
+                parent_index[idx] = None
+                depth[idx] = 0
+                path = path[: path.index(idx)]
+
+            base = depth[idx] + 1 if idx is not None else 0
+            for offset, node in enumerate(reversed(path)):
+                depth[node] = base + offset
+
+        levels = [[] for _level in range(max(depth) + 1)]
+        for idx, level in enumerate(depth):
+            levels[level].append(idx)
+        return levels
 
 
 class Criteria(models.Model):
@@ -925,3 +1368,6 @@ class Criteria(models.Model):
         null=True,
     )
     quantity = models.FloatField(blank=True, null=True, verbose_name=_("Quantity"))
+
+    def init(self):
+        indexes.ensure_indexes(self, 'criteria')
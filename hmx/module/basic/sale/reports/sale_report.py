@@ -9,6 +9,7 @@ from hmx.tasks import (
     generate_pivot_spreadsheet_task_v2,
 )
 from hmx.tools.celery import require_celery_worker, use_task
+from sale.engine import indexes, pivot_cache, replica
 
 
 class SaleReport(models.Model):
@@ -24,6 +25,8 @@ class SaleReport(models.Model):
     partner = models.ForeignKey("partners.partner", verbose_name=_("Partner"), on_delete=models.CASCADE, null=True)
     quantity = models.FloatField(blank=True, null=True, verbose_name=_("Total Quantity"))
     amount = models.FloatField(blank=True, null=True, verbose_name=_("Total Amount"))
+    # Line creation time; filtering on it lets PostgreSQL prune partitions of sale_saleorderline.
+    date = models.DateTimeField(null=True, verbose_name=_("Date"))
 
     @api.model
     def _query(self):
@@ -34,7 +37,8 @@ class SaleReport(models.Model):
                 line.product_id_id AS product_id,
                 so.partner_id_id AS partner_id,
                 line.quantity AS quantity,
-                line.subtotal AS amount
+                line.subtotal AS amount,
+                line.created_at AS date
             FROM
                 sale_saleorderline line
             LEFT JOIN
@@ -44,41 +48,69 @@ class SaleReport(models.Model):
     def init(self):
         tools.drop_view_if_exists(self.env.cr, self._table)
         self._cr.execute("""CREATE or REPLACE VIEW %s AS (%s)""" % (self._table, self._query()))
+        indexes.missing_report_indexes(self.env)
+
+    @api.model
+    def read_group(self, domain, fields, groupby, *args, **kwargs):
+        """Serve identical aggregates from the pivot cache until a sale or line is written.
+
+        Entries are per user, allowed companies and language (see ``_cache_scope``), since access
+        rules, the company switcher and translated labels all change the result. While a
+        replica serves reporting reads, aggregates are read from it and not cached, as they may lag.
+        """
+        if replica.replica_serving():
+            with replica.reporting():
+                return super(SaleReport, self).read_group(domain, fields, groupby, *args, **kwargs)
+
+        key = ('read_group', domain, fields, groupby, args, kwargs) + self._cache_scope()
+        return pivot_cache.cached_aggregate(
+            key, lambda: super(SaleReport, self).read_group(domain, fields, groupby, *args, **kwargs)
+        )
+
+    def _cache_scope(self):
+        """What besides the arguments decides an aggregate or export: user, companies and language."""
+        return (
+            self.env.user.id,
+            self.env.company.id,
+            sorted(self.env.context.get('allowed_company_ids') or self.env.companies.ids),
+            self.env.context.get('lang'),
+        )
+
+    def _coalesced_task(self, task, vals):
+        """Start ``task`` for ``vals`` unless the same scope (see ``_cache_scope``) already runs it."""
+        key = (task.name, vals) + self._cache_scope()
+        return pivot_cache.coalesce_task(key, lambda: task.delay(vals).id)
 
     @use_task(name='Export pivot table', fallback_to_sync=False)
     def action_export_pivot_table(self, vals):
-        task = generate_pivot_export_task.delay(vals)
-        return {'task_id': task.id}
+        return {'task_id': self._coalesced_task(generate_pivot_export_task, vals)}
 
     @require_celery_worker
     def action_generate_pivot_xlsx(self, vals):
-        task = generate_pivot_report_xlsx_task.delay(vals)
         return {
             "success": True,
             "name": "Open static report",
             "type": "static",
-            "task_id": task.id,
+            "task_id": self._coalesced_task(generate_pivot_report_xlsx_task, vals),
             "message": "Static report task started",
         }
 
     @require_celery_worker
     def action_generate_pivot_spreadsheet(self, vals):
-        task = generate_pivot_spreadsheet_task.delay(vals)
         return {
             "success": True,
             "name": "Open spreadsheet pivot table",
             "type": "spreadsheet",
-            "task_id": task.id,
+            "task_id": self._coalesced_task(generate_pivot_spreadsheet_task, vals),
             "message": "Open spreadsheet task started",
         }
 
     @require_celery_worker
     def action_generate_pivot_spreadsheet_v2(self, vals):
-        task = generate_pivot_spreadsheet_task_v2.delay(vals)
         return {
             "success": True,
             "name": "Open spreadsheet pivot table",
             "type": "spreadsheet",
-            "task_id": task.id,
+            "task_id": self._coalesced_task(generate_pivot_spreadsheet_task_v2, vals),
             "message": "Open spreadsheet task started",
         }
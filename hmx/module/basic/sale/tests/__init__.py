@@ -1 +1 @@
-from . import test_crud
+from . import test_crud, test_sale_bulk
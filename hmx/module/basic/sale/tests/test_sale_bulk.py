@@ -0,0 +1,500 @@
+import gzip
+import io
+from datetime import date
+from unittest import mock, skipUnless
+
+import numpy as np
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from document_store.services import file_store
+from hmx.exceptions import UserError
+from hmx.tests.common import TransactionCase
+from sale.engine import export, forecast, indexes, partitioning, pivot_cache, replica
+
+
+class TestSaleBulk(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env['partner'].create(
+            {
+                'name': 'Bulk Partner',
+                'email': 'bulk.partner@example.com',
+                'user_id': cls.env.user.pk,
+                'company': cls.env.company.pk,
+            }
+        )
+
+    def test_multi_create_assigns_names_before_insert(self):
+        records = self.env['sale'].create(
+            [{'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 10} for _i in range(3)]
+        )
+
+        self.assertEqual(len(records), 3)
+        names = records.mapped('name')
+        self.assertTrue(all(names))
+        self.assertEqual(len(set(names)), 3)
+
+    def test_order_names_are_reserved_with_one_sequence_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            names = self.env['sale']._reserve_order_names(4)
+
+        self.assertEqual(len([q for q in queries if q['sql'].lstrip().startswith('UPDATE')]), 1)
+        self.assertEqual(len(set(names)), 4)
+        self.assertNotIn(self.env['basesequence'].next_by_code('sale.order'), names)
+
+    def test_create_defaults_missing_price(self):
+        record = self.env['sale'].create({'company': self.env.company.pk, 'partner_id': self.partner.pk})
+        self.assertEqual(record.price, 0)
+        self.assertTrue(record.name)
+
+    def test_line_client_key_parents_are_set_at_insert(self):
+        order = self.env['sale'].create({'company': self.env.company.pk, 'partner_id': self.partner.pk})
+
+        def line(name, **vals):
+            return dict(vals, sale_id=order.id, name=name, quantity=1, price=1)
+
+        lines = self.env['saleorderline'].create(
+            [
+                line('Root A', clientKey='a'),
+                line('Root B', clientKey='b'),
+                line('Child of A', parent_id='a'),
+                line('Grandchild', clientKey='c', parent_id='d'),
+                line('Child of B', clientKey='d', parent_id='b'),
+                line('Fallback', parent_id='unknown'),
+            ]
+        )
+
+        self.assertEqual(
+            lines.mapped('name'), ['Root A', 'Root B', 'Child of A', 'Grandchild', 'Child of B', 'Fallback']
+        )
+        root_a, root_b, child_a, grandchild, child_b, fallback = lines
+        self.assertFalse(root_a.parent_id)
+        self.assertEqual(child_a.parent_id.id, root_a.id)
+        self.assertEqual(child_b.parent_id.id, root_b.id)
+        self.assertEqual(grandchild.parent_id.id, child_b.id)
+        self.assertEqual(fallback.parent_id.id, root_b.id)
+
+    def test_action_unlink_removes_orders_lines_and_criteria(self):
+        orders = self.env['sale'].create(
+            [{'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 5} for _i in range(5)]
+        )
+        for order in orders:
+            self.env['saleorderline'].create(
+                [
+                    {'sale_id': order.id, 'name': 'Parent', 'clientKey': 'p', 'quantity': 1, 'price': 1},
+                    {'sale_id': order.id, 'name': 'Child', 'parent_id': 'p', 'quantity': 1, 'price': 1},
+                ]
+            )
+            self.env['criteria'].create({'sale_id': order.id, 'name': 'Criteria'})
+
+        orders._unlink_in_batches(batch_size=2)
+
+        self.assertFalse(self.env['sale'].search([('id', 'in', orders.ids)]))
+        self.assertFalse(self.env['saleorderline'].search([('sale_id', 'in', orders.ids)]))
+        self.assertFalse(self.env['criteria'].search([('sale_id', 'in', orders.ids)]))
+
+    def test_action_unlink_checks_access_before_raw_deletes(self):
+        order = self.env['sale'].create({'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 5})
+        line = self.env['saleorderline'].create({'sale_id': order.id, 'name': 'Line', 'quantity': 1, 'price': 1})
+
+        with mock.patch.object(type(order), 'check_access_rule', side_effect=UserError('No unlink access')):
+            with self.assertRaises(UserError):
+                order._unlink_in_batches()
+
+        self.assertTrue(self.env['sale'].search([('id', '=', order.id)]))
+        self.assertTrue(self.env['saleorderline'].search([('id', '=', line.id)]))
+
+    def test_partitioning_keeps_a_primary_key_on_id_and_partition_column(self):
+        cr = self.env.cr
+        cr.execute("CREATE TABLE sale_partition_probe (id serial PRIMARY KEY, created_at timestamptz, name varchar)")
+        cr.execute(
+            "CREATE TABLE sale_partition_probe_ref (id serial PRIMARY KEY, "
+            "probe_id integer REFERENCES sale_partition_probe (id) ON DELETE CASCADE)"
+        )
+        cr.execute("CREATE UNIQUE INDEX sale_partition_probe_name_uniq ON sale_partition_probe (name)")
+        cr.execute("CREATE VIEW sale_partition_probe_view AS SELECT id FROM sale_partition_probe")
+        cr.execute(
+            "INSERT INTO sale_partition_probe (created_at, name) VALUES ('2023-05-01', 'dated'), (NULL, 'undated')"
+        )
+
+        # Dependents the caller did not declare abort the conversion before anything changes.
+        with self.assertRaises(ValueError):
+            partitioning.convert_to_partitioned(
+                cr, 'sale_partition_probe', 'created_at', referenced_by={'sale_partition_probe_ref'}
+            )
+        self.assertFalse(partitioning.is_partitioned(cr, 'sale_partition_probe'))
+        cr.execute("DROP VIEW sale_partition_probe_view")
+
+        self.assertTrue(
+            partitioning.convert_to_partitioned(
+                cr, 'sale_partition_probe', 'created_at', referenced_by={'sale_partition_probe_ref'}
+            )
+        )
+
+        self.assertTrue(partitioning.is_partitioned(cr, 'sale_partition_probe'))
+        cr.execute(
+            "SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = 'sale_partition_probe'::regclass AND contype = 'p'"
+        )
+        self.assertEqual(cr.fetchone()[0], 'PRIMARY KEY (id, created_at)')
+        cr.execute("SELECT pg_get_indexdef('sale_partition_probe_name_uniq'::regclass)")
+        definition = cr.fetchone()[0]
+        self.assertIn('UNIQUE INDEX', definition)
+        self.assertTrue(definition.endswith('(name, created_at)'))
+        cr.execute(
+            "SELECT attnotnull FROM pg_attribute WHERE attrelid = 'sale_partition_probe'::regclass "
+            "AND attname = 'created_at'"
+        )
+        self.assertTrue(cr.fetchone()[0])
+        cr.execute("SELECT name FROM sale_partition_probe WHERE created_at IS NOT NULL ORDER BY id")
+        self.assertEqual([row[0] for row in cr.fetchall()], ['dated', 'undated'])
+        cr.execute("SELECT to_regclass('sale_partition_probe_y2023')")
+        self.assertTrue(cr.fetchone()[0])
+        # The incoming foreign key cannot point at a partitioned table anymore.
+        cr.execute(
+            "SELECT count(*) FROM pg_constraint WHERE conrelid = 'sale_partition_probe_ref'::regclass AND contype = 'f'"
+        )
+        self.assertEqual(cr.fetchone()[0], 0)
+
+    def test_unlink_cascades_on_partitioned_tables(self):
+        with mock.patch.object(partitioning, 'enabled_models', return_value={'sale', 'saleorderline'}):
+            self.assertEqual(self.env['sale']._partition_tables(), ['saleorderline', 'sale'])
+
+        product = self.env['products'].create({'name': 'Partition Product', 'company': self.env.company.pk})
+        order = self.env['sale'].create(
+            {
+                'company': self.env.company.pk,
+                'partner_id': self.partner.pk,
+                'price': 5,
+                'product_ids': [(6, 0, [product.id])],
+            }
+        )
+        kept = self.env['sale'].create({'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 5})
+        Line = self.env['saleorderline']
+        root, child, grandchild = Line.create(
+            [
+                {'sale_id': kept.id, 'name': 'Root', 'clientKey': 'r', 'quantity': 1, 'price': 2},
+                {'sale_id': kept.id, 'name': 'Child', 'clientKey': 'c', 'parent_id': 'r', 'quantity': 1, 'price': 3},
+                {'sale_id': kept.id, 'name': 'Grandchild', 'parent_id': 'c', 'quantity': 1, 'price': 4},
+            ]
+        )
+        order_lines = Line.create(
+            [
+                {'sale_id': order.id, 'name': 'Parent', 'clientKey': 'p', 'quantity': 1, 'price': 1},
+                {'sale_id': order.id, 'name': 'Child', 'parent_id': 'p', 'quantity': 1, 'price': 1},
+            ]
+        )
+        self.env['criteria'].create({'sale_id': order.id, 'name': 'Criteria'})
+
+        child.unlink()
+        self.assertEqual(Line.search([('sale_id', '=', kept.id)]).ids, [root.id])
+        self.assertEqual(self.env['sale'].browse(kept.id).amount_total, 2)
+
+        order.unlink()
+        self.assertFalse(Line.search([('id', 'in', order_lines.ids)]))
+        self.assertFalse(self.env['criteria'].search([('sale_id', '=', order.id)]))
+        products = self.env['sale']._meta.get_field('product_ids')
+        self.env.cr.execute(
+            f"SELECT count(*) FROM {products.m2m_db_table()} WHERE {products.m2m_column_name()} = %s", (order.id,)
+        )
+        self.assertEqual(self.env.cr.fetchone()[0], 0)
+        self.assertFalse(Line.search([('id', '=', grandchild.id)]))
+
+    def test_report_joins_are_indexed(self):
+        self.assertEqual(indexes.missing_report_indexes(self.env), [])
+
+    def test_copy_export_resolves_related_names(self):
+        order = self.env['sale'].create({'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 10})
+        self.env['saleorderline'].create({'sale_id': order.id, 'name': 'Line', 'quantity': 2, 'price': 5})
+
+        content = b''.join(order.export_csv_chunks(fields=['id', 'partner'])).decode()
+        self.assertEqual(content.splitlines(), ['id,partner', f'{order.id},Bulk Partner'])
+
+        content = b''.join(order.export_csv_chunks(lines=True, fields=['sale', 'partner', 'quantity'])).decode()
+        self.assertEqual(content.splitlines(), ['sale,partner,quantity', f'{order.name},Bulk Partner,2'])
+
+        compressed = b''.join(order.export_csv_chunks(fields=['id'], compress=True))
+        self.assertEqual(gzip.decompress(compressed).decode().splitlines(), ['id', str(order.id)])
+
+    def test_unfiltered_export_is_limited_to_allowed_companies(self):
+        order = self.env['sale'].create({'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 10})
+        other_company = self.env['basecompany'].create({'name': 'Export Other Company'})
+        hidden = self.env['sale'].create({'company': other_company.pk, 'partner_id': self.partner.pk, 'price': 10})
+
+        query = export.build_select(self.env, 'sale', fields=['id'], company_ids=[self.env.company.id])
+        self.assertIn('IN (SELECT', query)
+        Sale = self.env['sale'].with_context(allowed_company_ids=[self.env.company.id])
+        content = b''.join(Sale.export_all_csv_chunks(fields=['id'])).decode()
+        self.assertIn(str(order.id), content.splitlines()[1:])
+        self.assertNotIn(str(hidden.id), content.splitlines()[1:])
+
+    def test_bulk_import_merges_rows_and_reports_errors(self):
+        product = self.env['products'].create({'name': 'Bulk Import Product', 'company': self.env.company.pk})
+        content = (
+            "order,partner,product,quantity,price\n"
+            "IMP-1,Bulk Partner,Bulk Import Product,2,5\n"
+            "IMP-1,bulk partner,Bulk Import Product,3,1.5\n"
+            "IMP-2,Unknown Partner,Bulk Import Product,1,1\n"
+            "IMP-3,Bulk Partner,Bulk Import Product,many,1\n"
+        )
+
+        result = self.env['sale'].import_sales(io.BytesIO(content.encode()), 'sales.csv')
+
+        self.assertEqual((result['orders_created'], result['lines_created'], result['error_count']), (1, 2, 2))
+        self.assertEqual([error['row'] for error in result['errors']], [4, 5])
+        order = self.env['sale'].search([('name', '=', 'IMP-1')])
+        self.assertEqual(order.partner_id, self.partner)
+        self.assertEqual(order.amount_total, 14.5)
+        lines = self.env['saleorderline'].search([('sale_id', '=', order.id)], order='id')
+        self.assertEqual(lines.mapped('subtotal'), [10.0, 4.5])
+        self.assertEqual(lines.mapped('product_id'), product)
+
+    def test_bulk_import_only_extends_own_draft_orders(self):
+        self.env['products'].create({'name': 'Guarded Import Product', 'company': self.env.company.pk})
+        other_company = self.env['basecompany'].create({'name': 'Import Other Company'})
+        approved = self.env['sale'].create({'company': self.env.company.pk, 'partner_id': self.partner.pk})
+        foreign = self.env['sale'].create({'company': other_company.pk, 'partner_id': self.partner.pk})
+        approved.write({'name': 'IMP-APPROVED', 'status': 'approved'})
+        foreign.write({'name': 'IMP-FOREIGN'})
+        content = (
+            "order,partner,product,quantity,price\n"
+            "IMP-APPROVED,Bulk Partner,Guarded Import Product,1,1\n"
+            "IMP-FOREIGN,Bulk Partner,Guarded Import Product,1,1\n"
+        )
+
+        result = self.env['sale'].import_sales(io.BytesIO(content.encode()), 'sales.csv')
+
+        self.assertEqual(result['orders_created'], 2)
+        self.assertFalse(self.env['saleorderline'].search([('sale_id', 'in', [approved.id, foreign.id])]))
+        self.assertEqual(self.env['sale'].browse(approved.id).amount_total, 0)
+
+        with mock.patch.object(
+            type(self.env['saleorderline']), 'check_access_rights', side_effect=UserError('No create access')
+        ):
+            with self.assertRaises(UserError):
+                self.env['sale'].import_sales(io.BytesIO(content.encode()), 'sales.csv')
+
+    def test_pivot_cache_serves_repeats_and_invalidates_on_commit(self):
+        order = self.env['sale'].create({'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 10})
+        line = self.env['saleorderline'].create({'sale_id': order.id, 'name': 'Line', 'quantity': 2, 'price': 5})
+        domain = [('sale', '=', order.id)]
+        report = self.env['salereport']
+        pivot_cache.pivot_cache.clear()
+
+        # A transaction always sees its own uncommitted writes.
+        report.read_group(domain, ['quantity'], ['sale'])
+        line.write({'quantity': 3})
+        self.assertEqual(report.read_group(domain, ['quantity'], ['sale'])[0]['quantity'], 3)
+
+        with mock.patch.object(pivot_cache, 'has_pending_writes', return_value=False):
+            pivot_cache.pivot_cache.clear()
+            first = report.read_group(domain, ['quantity'], ['sale'])
+            hits = pivot_cache.pivot_cache.hits
+            self.assertEqual(report.read_group(domain, ['quantity'], ['sale']), first)
+            self.assertEqual(pivot_cache.pivot_cache.hits, hits + 1)
+
+            # Other transactions only see a new generation once the writer commits.
+            before = pivot_cache.generation()
+            with mock.patch.object(pivot_cache.transaction, 'on_commit') as on_commit:
+                line.write({'quantity': 4})
+            self.assertEqual(pivot_cache.generation(), before)
+            on_commit.assert_called_with(pivot_cache._increment_generation)
+            on_commit.call_args.args[0]()
+            self.assertEqual(pivot_cache.generation(), before + 1)
+            self.assertEqual(report.read_group(domain, ['quantity'], ['sale'])[0]['quantity'], 4)
+            self.assertEqual(pivot_cache.pivot_cache.hits, hits + 1)
+
+    def test_pivot_cache_entries_are_per_user_companies_and_language(self):
+        Report = self.env['salereport']
+        other = self.env['basecompany'].create({'name': 'Pivot Scope Company'})
+        with mock.patch.object(pivot_cache, 'cached_aggregate', return_value=[]) as cached:
+            Report.read_group([], ['quantity'], ['sale'])
+            Report.with_context(lang='id_ID').read_group([], ['quantity'], ['sale'])
+            allowed = [self.env.company.id, other.id]
+            Report.with_context(allowed_company_ids=allowed).read_group([], ['quantity'], ['sale'])
+        keys = [call.args[0] for call in cached.call_args_list]
+        self.assertIn(self.env.user.id, keys[0])
+        self.assertEqual(len({pivot_cache.make_key(*key) for key in keys}), 3)
+
+    def test_pivot_cache_evicts_past_memory_budget(self):
+        cache = pivot_cache.PivotCache(max_entries=10, max_bytes=600)
+        for i in range(5):
+            cache.set(i, 1, 'x' * 200)
+        self.assertLessEqual(cache.size, 600)
+        self.assertIsNone(cache.get(0, 1))
+        self.assertEqual(cache.get(4, 1), 'x' * 200)
+        self.assertIsNone(cache.get(4, 2))
+
+    def test_replica_served_aggregates_are_not_cached(self):
+        pivot_cache.pivot_cache.clear()
+        with mock.patch.object(replica, 'replica_serving', return_value=True), mock.patch.object(
+            pivot_cache, 'has_pending_writes', return_value=False
+        ):
+            self.env['salereport'].read_group([], ['quantity'], ['sale'])
+        self.assertEqual(pivot_cache.pivot_cache.size, 0)
+
+    def test_export_by_ids_reads_rows_where_the_ids_were_picked(self):
+        with mock.patch.object(export, 'copy_chunks', return_value=iter(())) as copy_chunks:
+            export.export_chunks(self.env, 'sale', ids=[1])
+            self.assertFalse(copy_chunks.call_args.kwargs['use_replica'])
+            export.export_chunks(self.env, 'sale')
+            self.assertTrue(copy_chunks.call_args.kwargs['use_replica'])
+
+    def test_reporting_reads_stay_on_primary_inside_a_transaction(self):
+        with replica.reporting():
+            self.assertEqual(replica.read_alias(), 'default')
+
+    @skipUnless(replica.replica_alias(), "needs a replica connection in DATABASES, see sale/engine/replica.py")
+    def test_reporting_reads_use_the_replica_unless_it_lags(self):
+        alias = replica.replica_alias()
+        model = type(self.env['salereport'])
+        router = replica.ReplicaRouter()
+        replica._lag_checks.clear()
+
+        with mock.patch.object(replica, 'connection', mock.Mock(in_atomic_block=False)):
+            self.assertIsNone(router.db_for_read(model))
+            with replica.reporting():
+                self.assertEqual(router.db_for_read(model), alias)
+                with mock.patch.object(replica, 'replica_lag', return_value=replica.max_lag() + 1):
+                    replica._lag_checks.clear()
+                    self.assertEqual(router.db_for_read(model), 'default')
+
+    def test_seasonal_forecast_recovers_trend_and_season(self):
+        months = np.arange(36)
+        values = np.column_stack([100 + 5 * months + 50 * (months % 12 == 11), np.full(36, 7.0)])
+
+        fitted, predicted = forecast.fit_predict(values, 12, 'seasonal', season_length=12)
+
+        np.testing.assert_allclose(fitted, values, atol=1e-6)
+        np.testing.assert_allclose(predicted[:, 0], 100 + 5 * np.arange(36, 48) + 50 * (np.arange(36, 48) % 12 == 11))
+        np.testing.assert_allclose(predicted[:, 1], 7.0)
+
+    def test_forecast_periods_follow_the_grain(self):
+        self.assertEqual(
+            forecast.period_range(date(2024, 2, 15), date(2024, 12, 31), 'quarter'),
+            [date(2024, 1, 1), date(2024, 4, 1), date(2024, 7, 1), date(2024, 10, 1)],
+        )
+        self.assertEqual(forecast.add_periods(date(2024, 11, 1), 'month', 3), date(2025, 2, 1))
+
+    def test_forecast_domain_translates_to_sql(self):
+        Line, Sale = self.env['saleorderline'], self.env['sale']
+        sale_column = Line._meta.get_field('sale_id').column
+        company_column = Sale._meta.get_field('company').column
+
+        sql, params = forecast.domain_sql(
+            Line, ['|', ('name', '=', 'A'), '!', ('quantity', '>', 2), ('sale_id.company', '=', 7)]
+        )
+
+        self.assertEqual(
+            sql,
+            f'("name" = %s OR NOT ("quantity" > %s)) AND "{sale_column}" IN '
+            f'(SELECT "id" FROM {Sale._table} WHERE "{company_column}" = %s)',
+        )
+        self.assertEqual(params, ['A', 2, 7])
+        self.assertEqual(forecast.domain_sql(Line, [('name', 'in', [])]), ('FALSE', []))
+        with self.assertRaises(ValueError):
+            forecast.domain_sql(Line, [('name', 'child_of', 1)])
+
+    def test_forecast_from_config_applies_domain_and_company(self):
+        order = self.env['sale'].create({'company': self.env.company.pk, 'partner_id': self.partner.pk})
+        self.env['saleorderline'].create(
+            [
+                {'sale_id': order.id, 'name': 'Forecast Keep', 'quantity': 3, 'price': 1},
+                {'sale_id': order.id, 'name': 'Forecast Skip', 'quantity': 5, 'price': 1},
+            ]
+        )
+        config = self.env.ref('sale.sale_forecast_data')
+        config.write({'domain': "[('name', '=', 'Forecast Keep')]", 'end_date': date.today().replace(month=12, day=31)})
+
+        history = forecast.forecast_from_config(self.env, config)['history']
+
+        self.assertEqual(history['quantity'][-1], 3)
+        self.assertEqual(
+            forecast.config_domain(self.env, config),
+            [('sale_id.company', '=', self.env.company.id), ('name', '=', 'Forecast Keep')],
+        )
+
+    def test_amount_total_follows_line_changes(self):
+        order = self.env['sale'].create({'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 10})
+        other = self.env['sale'].create({'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 10})
+        Line = self.env['saleorderline']
+        lines = Line.create(
+            [
+                {'sale_id': order.id, 'name': 'Parent', 'clientKey': 'p', 'quantity': 2, 'price': 5},
+                {'sale_id': order.id, 'name': 'Child', 'parent_id': 'p', 'quantity': 1, 'price': 3},
+                {'sale_id': order.id, 'name': 'Single', 'quantity': 4, 'price': 1},
+            ]
+        )
+
+        def totals():
+            # Read through the cached records, so the raw total UPDATEs must invalidate them.
+            return [record.amount_total for record in (order, other)]
+
+        self.assertEqual(totals(), [17, 0])
+        lines[2].write({'quantity': 5})
+        self.assertEqual(totals(), [18, 0])
+        lines[2].write({'sale_id': other.id})
+        self.assertEqual(totals(), [13, 5])
+        lines[0].unlink()
+        self.assertEqual(totals(), [0, 5])
+
+    def test_shared_document_is_released_with_its_last_record(self):
+        Sale = self.env['sale']
+        first, second = Sale.create(
+            [{'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 1} for _i in range(2)]
+        )
+        column = Sale._meta.get_field('document').column
+        # As left behind by copy(): two orders storing the same path.
+        self.env.cr.execute(
+            f"UPDATE {Sale._table} SET {column} = %s WHERE id = ANY(%s)",
+            ('documents/shared.pdf', [first.id, second.id]),
+        )
+        (first | second).invalidate_cache()
+
+        with mock.patch.object(file_store, 'release_on_commit') as release:
+            first.unlink()
+            self.assertEqual(release.call_args.args[0], set())
+            second.unlink()
+            self.assertEqual(release.call_args.args[0], {'documents/shared.pdf'})
+
+    def test_amount_total_backfill_runs_once(self):
+        order = self.env['sale'].create({'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 10})
+        self.env['saleorderline'].create({'sale_id': order.id, 'name': 'Line', 'quantity': 2, 'price': 3})
+        Param = self.env['baseconfigparameter'].sudo()
+        Param.search([('key', '=', 'sale.amount_total_backfilled')]).unlink()
+        self.env.cr.execute(f"UPDATE {order._table} SET amount_total = NULL WHERE id = %s", (order.id,))
+
+        order._backfill_amount_total()
+        self.env.cr.execute(f"SELECT amount_total FROM {order._table} WHERE id = %s", (order.id,))
+        self.assertEqual(self.env.cr.fetchone()[0], 6)
+        self.assertTrue(Param.search([('key', '=', 'sale.amount_total_backfilled')]))
+
+        self.env.cr.execute(f"UPDATE {order._table} SET amount_total = 1 WHERE id = %s", (order.id,))
+        order._backfill_amount_total()
+        self.env.cr.execute(f"SELECT amount_total FROM {order._table} WHERE id = %s", (order.id,))
+        self.assertEqual(self.env.cr.fetchone()[0], 1)
+
+    def test_batch_confirm_writes_each_status_once(self):
+        orders = self.env['sale'].create(
+            [{'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 10} for _i in range(3)]
+        )
+        Sale = type(self.env['sale'])
+        with mock.patch.object(Sale, 'write', autospec=True, side_effect=Sale.write) as write:
+            orders.action_confirm_batch()
+
+        status_writes = [call for call in write.call_args_list if 'status' in call.args[1]]
+        self.assertEqual(len(status_writes), 1)
+        self.assertEqual(set(self.env['sale'].browse(orders.ids).mapped('status')), {'approved'})
+
+    def test_batch_confirm_query_count_does_not_grow_with_orders(self):
+        def confirm(count):
+            orders = self.env['sale'].create(
+                [{'company': self.env.company.pk, 'partner_id': self.partner.pk, 'price': 10} for _i in range(count)]
+            )
+            with CaptureQueriesContext(connection) as queries:
+                orders.action_confirm_batch()
+            return len(queries)
+
+        self.assertEqual(confirm(3), confirm(6))